@@ -1,8 +1,9 @@
+import hashlib
 import streamlit as st
 from PIL import Image
 import pandas as pd
 import awswrangler as wr
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 
 # get the streamlit app modules
@@ -17,21 +18,28 @@ import src.streamlit_app.pages_in_dashboard.visitors.other_information as other_
 
 # imports for the sourcing and preprocessing pipeline
 from src.prediction_pipeline.sourcing_data.source_visitor_center_data import source_preprocessed_hourly_visitor_center_data
-from src.prediction_pipeline.sourcing_data.source_historic_visitor_count import source_historic_visitor_count 
-from src.prediction_pipeline.pre_processing.preprocess_historic_visitor_count_data import preprocess_visitor_count_data
-from src.prediction_pipeline.sourcing_data.source_visitor_center_data import source_visitor_center_data
+from src.prediction_pipeline.sourcing_data.source_historic_visitor_count import source_historic_visitor_count, stream_historic_visitor_count, visitor_counts_path
+from src.prediction_pipeline.pre_processing.preprocess_historic_visitor_count_data import preprocess_visitor_count_data, preprocess_visitor_count_data_chunked
+from src.prediction_pipeline.sourcing_data.source_visitor_center_data import source_visitor_center_data, visitor_center_data_path
 from src.prediction_pipeline.pre_processing.preprocess_visitor_center_data import process_visitor_center_data
 from src.prediction_pipeline.sourcing_data.source_weather import source_weather_data
 from src.prediction_pipeline.pre_processing.preprocess_weather_data import process_weather_data
 from src.prediction_pipeline.pre_processing.join_sensor_weather_visitorcenter import get_joined_dataframe
-from src.prediction_pipeline.pre_processing.features_zscoreweather_distanceholidays import get_zscores_and_nearest_holidays
+from src.prediction_pipeline.pre_processing.features_zscoreweather_distanceholidays import get_zscores_and_nearest_holidays, window_size
+from src.prediction_pipeline.pre_processing.column_schema import column_schema_version
 
 # imports for training pipeline
-from src.prediction_pipeline.modeling.source_and_feature_selection import get_features
+from src.prediction_pipeline.modeling.source_and_feature_selection import (
+    get_engineered_features, transform_engineered_features, engineered_feature_columns, target_vars_et
+)
+from src.prediction_pipeline.modeling.feature_store import get_or_compute_features
 from src.prediction_pipeline.modeling.train_regressor import train_regressor
 
-# imports for inference pipeline
-from src.prediction_pipeline.modeling.run_inference import run_inference
+# imports for the published forecast (the inference pipeline runs in src.prediction_pipeline.modeling.publish_forecast)
+from src.prediction_pipeline.modeling.forecast_artifact import load_latest_forecast
+
+# Ingestion of the historic visitor counts for training: 'chunked' parses the CSV files in chunks, 'in_memory' loads them at once
+visitor_count_ingestion_mode = 'chunked'
 
 # Initialize language in session state if it doesn't exist
 if 'selected_language' not in st.session_state:
@@ -78,25 +86,32 @@ def create_dashboard_main_page(inference_predictions):
         other_info.get_other_information()
 
 
-def run_training():
+def compute_training_features(start_time, end_time):
 
     """
-    Runs the training pipeline. This includes sourcing and preprocessing the data, training the model, and saving the model.
+    Sources and preprocesses the data and computes the engineered features of the training hours.
+
+    Args:
+        start_time (datetime): The first hour.
+        end_time (datetime): The last hour (included).
+
+    Returns:
+        pd.DataFrame: The engineered features and targets with the 'Time' column.
     """
 
     # source and preprocess the historic visitor count data
-    sourced_visitor_count_df = source_historic_visitor_count()
-    processed_visitor_count_df = preprocess_visitor_count_data(sourced_visitor_count_df)
+    if visitor_count_ingestion_mode == 'chunked':
+        processed_visitor_count_df = preprocess_visitor_count_data_chunked(stream_historic_visitor_count())
+    else:
+        sourced_visitor_count_df = source_historic_visitor_count()
+        processed_visitor_count_df = preprocess_visitor_count_data(sourced_visitor_count_df)
 
     # source and preprocess the visitor center data
     sourced_vc_data_df = source_visitor_center_data()
     processed_vc_df_hourly,_ = process_visitor_center_data(sourced_vc_data_df)
 
-     # get the weather data for training and inference
-    # training data
-    train_start_date = datetime(2023, 1, 1)
-    train_end_date = datetime(2024, 7, 21)
-    weather_data = source_weather_data(start_time=train_start_date, end_time=train_end_date)
+    # get the weather data for training, with the days before the first hour that are in the window of its z-scores
+    weather_data = source_weather_data(start_time=start_time - timedelta(days=window_size), end_time=end_time)
     processed_weather_df = process_weather_data(weather_data)
 
     # join the dataframes
@@ -106,19 +121,75 @@ def run_training():
     weather_columns_for_zscores = [ 'Temperature (°C)','Relative Humidity (%)','Wind Speed (km/h)']
     with_zscores_and_nearest_holidays_df = get_zscores_and_nearest_holidays(joined_df, weather_columns_for_zscores)
 
-    # get the features for training
-    feature_df = get_features(with_zscores_and_nearest_holidays_df,train_start_date, train_end_date)
+    return get_engineered_features(with_zscores_and_nearest_holidays_df, start_time, end_time).reset_index()
 
-    # train the model
-    train_regressor(feature_df)
 
+def get_s3_files_version(path):
+
+    """
+    Gets a version of S3 files from their ETags, which change whenever a file is replaced.
+
+    Args:
+        path (str): The S3 path of the files, may contain wildcards.
+
+    Returns:
+        str: The version of the files.
+    """
+    objects = wr.s3.describe_objects(path=path)
+    etags = sorted((object_path, description['ETag']) for object_path, description in objects.items())
+
+    return hashlib.sha256(repr(etags).encode('utf-8')).hexdigest()[:12]
+
+
+def get_training_source_version(start_time, end_time):
+
+    """
+    Gets the version of the source data of the training features: the column schema, the visitor count and visitor center
+    files and the weather data of the training hours. The stored training features are computed again when it changes.
+
+    Args:
+        start_time (datetime): The first hour.
+        end_time (datetime): The last hour (included).
+
+    Returns:
+        str: The version of the source data.
+    """
+
+    # the weather data is served from the weather cache, only the hours that are not final are fetched again
+    weather_data = source_weather_data(start_time=start_time - timedelta(days=window_size), end_time=end_time)
+    weather_version = int(pd.util.hash_pandas_object(weather_data, index=False).sum())
+
+    return f"{column_schema_version}-{get_s3_files_version(visitor_counts_path)}-{get_s3_files_version(visitor_center_data_path)}-{weather_version}"
 
-if __name__ == "__main__":
 
-    preprocessed_hourly_visitor_center_data = source_preprocessed_hourly_visitor_center_data()
+def run_training():
+
+    """
+    Runs the training pipeline. This includes sourcing and preprocessing the data, training the model, and saving the model.
+    The engineered features are read from the feature store, only the hours that are not stored yet are computed.
+    The stored features are computed again when the column schema or the source data change.
+    """
+
+    # training data
+    train_start_date = datetime(2023, 1, 1)
+    train_end_date = datetime(2024, 7, 21)
+
+    engineered_features_df = get_or_compute_features(
+        'training', train_start_date, train_end_date, compute_training_features,
+        columns=engineered_feature_columns + target_vars_et, version=get_training_source_version(train_start_date, train_end_date)
+    )
+
+    # get the features for training and the feature transformer that the inference applies
+    feature_df, feature_transformer = transform_engineered_features(engineered_features_df.set_index('Time'))
+
+    # train the model, the feature transformer is saved next to the models
+    train_regressor(feature_df, feature_transformer=feature_transformer)
+
+
+if __name__ == "__main__":
 
-    # call the sourcing and processing pipeline
-    inference_predictions = run_inference(preprocessed_hourly_visitor_center_data)
+    # load the latest forecast published by the forecast service
+    inference_predictions = load_latest_forecast()
 
     # create the dashboard
     create_dashboard_main_page(inference_predictions)
\ No newline at end of file
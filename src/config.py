@@ -8,4 +8,17 @@ regions = {
     'Scheuereck-Schachten-Trinkwassertalsperre': ['Scheuereck-Schachten-Trinkwassertalsperre IN', 'Scheuereck-Schachten-Trinkwassertalsperre OUT'],
     'Lusen-Mauth-Finsterau': ['Lusen-Mauth-Finsterau IN', 'Lusen-Mauth-Finsterau OUT'],
     'Rachel-Spiegelau': ['Rachel-Spiegelau IN', 'Rachel-Spiegelau OUT'],
-}
\ No newline at end of file
+}
+
+# Coordinates (latitude, longitude) of the parking sensors, shared by the dashboard map and the multi-point weather
+parking_sensor_coordinates = {
+    "parkplatz-graupsaege-1": (48.92414, 13.44515),
+    "p-r-spiegelau-1": (48.9178, 13.35544),
+    "parkplatz-zwieslerwaldhaus-1": (49.08837, 13.24707),
+    "parkplatz-nationalparkzentrum-falkenstein-2": (49.06042, 13.23583),
+    "scheidt-bachmann-parkplatz-1": (48.9346, 13.32418),
+    "parkplatz-nationalparkzentrum-lusen-p2": (48.8907, 13.48924),
+    "parkplatz-waldhaeuser-kirche-1": (48.92842, 13.4624),
+    "parkplatz-waldhaeuser-ausblick-1": (48.92796, 13.47076),
+    "parkplatz-skisportzentrum-finsterau-1": (48.94129, 13.57491),
+}
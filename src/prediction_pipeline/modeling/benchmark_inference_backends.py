@@ -0,0 +1,156 @@
+"""
+Benchmark the two inference backends of the Extra Trees Regressors: the scikit-learn `predict` of the loaded
+models ('sklearn') against the batched tree-ensemble evaluator ('compiled').
+
+Usage:
+- Run `python -m src.prediction_pipeline.modeling.benchmark_inference_backends` from the root of the repository.
+
+Output:
+- A table with the inference latency of both backends for the forecast horizon and for the whole test period,
+  for both training modes, and whether the predictions of both backends are identical, also when features are missing.
+  The table is printed and saved under outputs/benchmarks.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import awswrangler as wr
+from sklearn.ensemble import ExtraTreesRegressor
+from src.prediction_pipeline.modeling.source_and_feature_selection import get_features
+from src.prediction_pipeline.modeling.compiled_forest import CompiledForestRegressor
+from src.prediction_pipeline.modeling.benchmark_model_modes import features_path, forecast_horizon_hours, measure_prediction_latency
+from src.prediction_pipeline.modeling.train_regressor import (
+    fit_multi_output_regressor, numeric_features, categorical_features, target_vars_et,
+    train_start, train_end, test_start, test_end, random_seed
+)
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+output_path = os.path.join('outputs', 'benchmarks', 'inference_backends_benchmark.csv')
+
+# Share of the numeric feature values that are set to NaN for the check with missing values
+missing_value_fraction = 0.3
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def have_identical_predictions(models: list, compiled_models: list, df_features: pd.DataFrame) -> bool:
+    """Check that the compiled models give exactly the same predictions as the scikit-learn models.
+
+    The scikit-learn models are run on one thread for the check, because the trees are then added up
+    in a fixed order.
+
+    Args:
+        models (list): The trained models.
+        compiled_models (list): The compiled models in the same order.
+        df_features (pd.DataFrame): The features to predict.
+
+    Returns:
+        bool: True if all predictions are identical.
+    """
+    for model, compiled_model in zip(models, compiled_models):
+        n_jobs = model.n_jobs
+        model.set_params(n_jobs=1)
+        identical = np.array_equal(model.predict(df_features), compiled_model.predict(df_features))
+        model.set_params(n_jobs=n_jobs)
+
+        if not identical:
+            return False
+
+    return True
+
+def inject_missing_values(df_features: pd.DataFrame) -> pd.DataFrame:
+    """Set a random share of the numeric feature values to NaN.
+
+    The compiled models have to send the missing values to the same child as the scikit-learn models,
+    which learn the direction per split.
+
+    Args:
+        df_features (pd.DataFrame): The features to predict.
+
+    Returns:
+        pd.DataFrame: A copy of the features with missing values.
+    """
+    df_missing = df_features.copy()
+    rng = np.random.default_rng(random_seed)
+
+    for column in numeric_features:
+        mask = rng.random(len(df_missing)) < missing_value_fraction
+        df_missing.loc[mask, column] = np.nan
+
+    return df_missing
+
+def benchmark_backends(mode: str, models: list, df_test: pd.DataFrame, df_horizon: pd.DataFrame) -> dict:
+    """Benchmark both inference backends for the models of one training mode.
+
+    Args:
+        mode (str): The training mode of the models.
+        models (list): The trained models that are needed for one inference run.
+        df_test (pd.DataFrame): The features of the test period.
+        df_horizon (pd.DataFrame): The features of one forecast horizon.
+
+    Returns:
+        dict: The benchmark results of the training mode.
+    """
+    compiled_models = [CompiledForestRegressor(model) for model in models]
+
+    return {
+        'mode': mode,
+        'sklearn_horizon_latency_ms': measure_prediction_latency(models, df_horizon),
+        'compiled_horizon_latency_ms': measure_prediction_latency(compiled_models, df_horizon),
+        'sklearn_test_latency_ms': measure_prediction_latency(models, df_test),
+        'compiled_test_latency_ms': measure_prediction_latency(compiled_models, df_test),
+        'identical_predictions': have_identical_predictions(models, compiled_models, df_test),
+        'identical_predictions_with_nan': have_identical_predictions(
+            models, compiled_models, inject_missing_values(df_test)
+        )
+    }
+
+def run_benchmark(feature_dataframe: pd.DataFrame) -> pd.DataFrame:
+    """Train the models of both training modes and benchmark both inference backends on them.
+
+    Args:
+        feature_dataframe (pd.DataFrame): The feature DataFrame returned by get_features.
+
+    Returns:
+        pd.DataFrame: One row per training mode.
+    """
+    features = numeric_features + categorical_features
+    df_model = feature_dataframe[features + target_vars_et].dropna(subset=target_vars_et)
+    df_train = df_model.loc[train_start:train_end]
+    df_test = df_model.loc[test_start:test_end, features]
+    df_horizon = df_test.iloc[:forecast_horizon_hours]
+
+    per_target_models = []
+    for target in target_vars_et:
+        model = ExtraTreesRegressor(random_state=random_seed, n_jobs=-1)
+        model.fit(df_train[features], df_train[target])
+        per_target_models.append(model)
+
+    results = [
+        benchmark_backends('per_target', per_target_models, df_test, df_horizon),
+        benchmark_backends('multi_output', [fit_multi_output_regressor(df_train)], df_test, df_horizon)
+    ]
+
+    return pd.DataFrame(results).set_index('mode')
+
+def main():
+
+    df = wr.s3.read_csv(path=features_path, low_memory=False)
+    df['Time'] = pd.to_datetime(df['Time'])
+
+    feature_dataframe, _ = get_features(df, pd.Timestamp(train_start), pd.Timestamp(test_end))
+
+    benchmark_df = run_benchmark(feature_dataframe)
+    print(benchmark_df)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    benchmark_df.to_csv(output_path)
+    print(f"Benchmark saved under {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark the two training modes of the Extra Trees Regressor: one model per target ('per_target')
+against one native multi-output model for all targets ('multi_output').
+
+Usage:
+- Run `python -m src.prediction_pipeline.modeling.benchmark_model_modes` from the root of the repository.
+
+Output:
+- A table with the inference latency for the forecast horizon, the serialized model size (the size of
+  the pickles uploaded to AWS S3) and the accuracy (MAE, RMSE, R2) on the test period for both modes.
+  The table is printed and saved under outputs/benchmarks.
+"""
+
+import io
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import awswrangler as wr
+from sklearn.ensemble import ExtraTreesRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from src.config import aws_s3_bucket
+from src.prediction_pipeline.modeling.source_and_feature_selection import get_features
+from src.prediction_pipeline.modeling.train_regressor import (
+    fit_multi_output_regressor, numeric_features, categorical_features, target_vars_et,
+    train_start, train_end, test_start, test_end, random_seed
+)
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Dataset with the z-score and holiday features written by get_zscores_and_nearest_holidays
+features_path = f"s3://{aws_s3_bucket}/preprocessed_data/holidays_deltaweather_features_df.csv"
+
+output_path = os.path.join('outputs', 'benchmarks', 'model_modes_benchmark.csv')
+
+# The dashboard predicts 7 days ahead in hourly steps
+forecast_horizon_hours = 7 * 24
+n_latency_repeats = 20
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_serialized_size_mb(model) -> float:
+    """Get the size of a model pickled with joblib, which is the size of the file uploaded to AWS S3.
+
+    Args:
+        model: The trained model.
+
+    Returns:
+        float: The size of the serialized model in MB.
+    """
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+def measure_prediction_latency(models: list, df_features: pd.DataFrame) -> float:
+    """Measure the median time needed to predict the features with all models.
+
+    Args:
+        models (list): The trained models that are needed for one inference run.
+        df_features (pd.DataFrame): The features to predict.
+
+    Returns:
+        float: The median latency of one inference run in milliseconds.
+    """
+    latencies = []
+    for _ in range(n_latency_repeats):
+        start = time.perf_counter()
+        for model in models:
+            model.predict(df_features)
+        latencies.append(time.perf_counter() - start)
+
+    return float(np.median(latencies) * 1000)
+
+def get_accuracy_metrics(y_true: pd.DataFrame, y_pred: np.ndarray) -> dict:
+    """Compute the accuracy metrics averaged over all targets.
+
+    Args:
+        y_true (pd.DataFrame): The true values with one column per target.
+        y_pred (np.ndarray): The predicted values with one column per target.
+
+    Returns:
+        dict: The mean MAE, RMSE and R2 over all targets.
+    """
+    mae = [mean_absolute_error(y_true.iloc[:, i], y_pred[:, i]) for i in range(y_true.shape[1])]
+    rmse = [np.sqrt(mean_squared_error(y_true.iloc[:, i], y_pred[:, i])) for i in range(y_true.shape[1])]
+    r2 = [r2_score(y_true.iloc[:, i], y_pred[:, i]) for i in range(y_true.shape[1])]
+
+    return {'MAE': np.mean(mae), 'RMSE': np.mean(rmse), 'R2': np.mean(r2)}
+
+def benchmark_per_target(df_train: pd.DataFrame, df_test: pd.DataFrame, df_horizon: pd.DataFrame) -> dict:
+    """Benchmark one Extra Trees Regressor per target.
+
+    Args:
+        df_train (pd.DataFrame): The training data.
+        df_test (pd.DataFrame): The test data.
+        df_horizon (pd.DataFrame): The features of one forecast horizon.
+
+    Returns:
+        dict: The benchmark results of the per-target mode.
+    """
+    features = numeric_features + categorical_features
+    models = []
+    for target in target_vars_et:
+        model = ExtraTreesRegressor(random_state=random_seed, n_jobs=-1)
+        model.fit(df_train[features], df_train[target])
+        models.append(model)
+
+    y_pred = np.column_stack([model.predict(df_test[features]) for model in models])
+
+    return {
+        'mode': 'per_target',
+        'latency_ms': measure_prediction_latency(models, df_horizon[features]),
+        'model_size_mb': sum(get_serialized_size_mb(model) for model in models),
+        **get_accuracy_metrics(df_test[target_vars_et], y_pred)
+    }
+
+def benchmark_multi_output(df_train: pd.DataFrame, df_test: pd.DataFrame, df_horizon: pd.DataFrame) -> dict:
+    """Benchmark one multi-output Extra Trees Regressor for all targets.
+
+    Args:
+        df_train (pd.DataFrame): The training data.
+        df_test (pd.DataFrame): The test data.
+        df_horizon (pd.DataFrame): The features of one forecast horizon.
+
+    Returns:
+        dict: The benchmark results of the multi-output mode.
+    """
+    features = numeric_features + categorical_features
+    model = fit_multi_output_regressor(df_train)
+
+    y_pred = np.asarray(model.predict(df_test[features]))
+
+    return {
+        'mode': 'multi_output',
+        'latency_ms': measure_prediction_latency([model], df_horizon[features]),
+        'model_size_mb': get_serialized_size_mb(model),
+        **get_accuracy_metrics(df_test[target_vars_et], y_pred)
+    }
+
+def run_benchmark(feature_dataframe: pd.DataFrame) -> pd.DataFrame:
+    """Run the benchmark of both training modes on the same train and test split.
+
+    Args:
+        feature_dataframe (pd.DataFrame): The feature DataFrame returned by get_features.
+
+    Returns:
+        pd.DataFrame: One row per training mode.
+    """
+    # Both modes are trained on the rows where all targets are available, so the accuracy is comparable
+    df_model = feature_dataframe[numeric_features + categorical_features + target_vars_et].dropna(subset=target_vars_et)
+    df_train = df_model.loc[train_start:train_end]
+    df_test = df_model.loc[test_start:test_end]
+    df_horizon = df_test.iloc[:forecast_horizon_hours]
+
+    results = [
+        benchmark_per_target(df_train, df_test, df_horizon),
+        benchmark_multi_output(df_train, df_test, df_horizon)
+    ]
+
+    return pd.DataFrame(results).set_index('mode')
+
+def main():
+
+    df = wr.s3.read_csv(path=features_path, low_memory=False)
+    df['Time'] = pd.to_datetime(df['Time'])
+
+    feature_dataframe, _ = get_features(df, pd.Timestamp(train_start), pd.Timestamp(test_end))
+
+    benchmark_df = run_benchmark(feature_dataframe)
+    print(benchmark_df)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    benchmark_df.to_csv(output_path)
+    print(f"Benchmark saved under {output_path}")
+
+
+if __name__ == '__main__':
+    main()
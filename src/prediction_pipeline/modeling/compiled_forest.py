@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+from src.prediction_pipeline.modeling.flat_forest import FlatForestRegressor, export_flat_forest, TREE_LEAF
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Number of samples traversed together; bounds the (trees x samples) node index array
+default_batch_size = 4096
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_flat_forest(model) -> dict:
+    """
+    Get the flat node arrays of a scikit-learn tree ensemble or of a FlatForestRegressor.
+
+    Args:
+        model: The fitted tree ensemble regressor or FlatForestRegressor.
+
+    Returns:
+        dict: The flat node arrays and the metadata of the model.
+    """
+    if isinstance(model, FlatForestRegressor):
+        return {
+            'tree_offsets': model.tree_offsets,
+            'children_left': model.children_left,
+            'children_right': model.children_right,
+            'feature': model.feature,
+            'threshold': model.threshold,
+            'missing_go_to_left': model.missing_go_to_left,
+            'value': model.value,
+            'n_outputs': model.n_outputs_,
+            'feature_names': model.feature_names_in_,
+            'target_names': getattr(model, 'target_names_', []),
+        }
+
+    return export_flat_forest(model)
+
+
+class CompiledForestRegressor:
+    """
+    Tree ensemble regressor compiled into node arrays laid out for batched traversal.
+
+    All trees and all samples move down the trees together, one level per step, with a few array operations
+    on the (tree, sample) pairs that have not reached a leaf yet and no Python call per tree. The node arrays
+    are used as they are, so the memory maps of a FlatForestRegressor stay shared between processes. Missing
+    values follow the direction every split learned in scikit-learn, so the predictions are identical to the
+    ones of the scikit-learn model, also for features with NaN.
+    """
+
+    def __init__(self, model, batch_size: int = default_batch_size):
+        flat_forest = get_flat_forest(model)
+
+        self.roots = np.asarray(flat_forest['tree_offsets'], dtype=np.intp)
+        self.children_left = np.asarray(flat_forest['children_left'], dtype=np.intp)
+        self.children_right = np.asarray(flat_forest['children_right'], dtype=np.intp)
+        self.feature = np.asarray(flat_forest['feature'], dtype=np.intp)
+        self.threshold = np.asarray(flat_forest['threshold'], dtype=np.float64)
+        self.missing_go_to_left = np.asarray(flat_forest['missing_go_to_left'], dtype=bool)
+        self.value = np.asarray(flat_forest['value'], dtype=np.float64)
+        self.batch_size = batch_size
+
+        self.n_outputs_ = flat_forest['n_outputs']
+        self.feature_names_in_ = list(flat_forest['feature_names'])
+        if len(flat_forest['target_names']) > 0:
+            self.target_names_ = list(flat_forest['target_names'])
+
+    def _get_feature_array(self, X) -> np.ndarray:
+        # Use the column order of the training data and the same float32 cast as scikit-learn trees
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_:
+            X = X[self.feature_names_in_]
+
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Get the leaf reached by every sample in every tree.
+
+        Args:
+            X (np.ndarray): The features as a float32 array.
+
+        Returns:
+            np.ndarray: The (trees x samples) array of leaf indices.
+        """
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        nodes = np.repeat(self.roots, n_samples)
+        feature_offsets = np.tile(np.arange(n_samples) * n_features, len(self.roots))
+
+        # Move all (tree, sample) pairs that are not in a leaf yet one level down. Like scikit-learn, a value goes
+        # left if it is <= the threshold, and NaN goes to the child the split learned for missing values
+        active = np.flatnonzero(self.children_left[nodes] != TREE_LEAF)
+        while active.size > 0:
+            active_nodes = nodes[active]
+            values = X_flat[feature_offsets[active] + self.feature[active_nodes]]
+            go_left = (values <= self.threshold[active_nodes]) | (np.isnan(values) & self.missing_go_to_left[active_nodes])
+            active_nodes = np.where(go_left, self.children_left[active_nodes], self.children_right[active_nodes])
+            nodes[active] = active_nodes
+            active = active[self.children_left[active_nodes] != TREE_LEAF]
+
+        return nodes.reshape(len(self.roots), n_samples)
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predict the target values as the mean of the leaf values of all trees.
+
+        Args:
+            X (pd.DataFrame or np.ndarray): The features.
+
+        Returns:
+            np.ndarray: The predictions, 1-D for a single output and (samples x outputs) otherwise.
+        """
+        X = self._get_feature_array(X)
+        predictions = np.zeros((X.shape[0], self.n_outputs_), dtype=np.float64)
+
+        for start in range(0, X.shape[0], self.batch_size):
+            leaves = self.apply(X[start:start + self.batch_size])
+            leaf_values = self.value[leaves]
+
+            # Add up the trees in order, the same way scikit-learn does
+            batch_predictions = predictions[start:start + self.batch_size]
+            for tree_values in leaf_values:
+                batch_predictions += tree_values
+
+        predictions /= len(self.roots)
+
+        if self.n_outputs_ == 1:
+            return predictions[:, 0]
+
+        return predictions
+
+
+def compile_models(loaded_models: dict, batch_size: int = default_batch_size) -> dict:
+    """
+    Compile the loaded models for the batched evaluator. Models that are not tree ensembles are kept as they are.
+
+    Args:
+        loaded_models (dict): A dictionary of models where keys are model names and values are the trained models.
+        batch_size (int): Number of samples traversed together.
+
+    Returns:
+        dict: A dictionary with the same keys and the compiled models as values.
+    """
+    compiled_models = {}
+    for model_name, model in loaded_models.items():
+        if isinstance(model, FlatForestRegressor) or hasattr(model, 'estimators_'):
+            compiled_models[model_name] = CompiledForestRegressor(model, batch_size)
+        else:
+            print(f"{model_name} is not a tree ensemble, it is used without compiling. It is of type {type(model)}")
+            compiled_models[model_name] = model
+
+    return compiled_models
@@ -1,17 +1,24 @@
-import awswrangler as wr
 import pandas as pd
+import numpy as np
 import streamlit as st
-import boto3
-import joblib
-import io
-from pycaret.regression import load_model
-from sklearn.preprocessing import MinMaxScaler
+from botocore.exceptions import BotoCoreError, ClientError
 from src.config import regions, aws_s3_bucket
+from src.prediction_pipeline.modeling.model_store import load_models_concurrently, get_run_id_from_folder_prefix
+from src.prediction_pipeline.modeling.model_registry import (
+    ModelRegistryWatcher, load_feature_transformer, get_run_manifest, select_manifest_models, load_registered_models
+)
+from src.prediction_pipeline.modeling.compiled_forest import compile_models
+from src.prediction_pipeline.modeling.inference_output_sink import get_inference_output_sink
+from src.prediction_pipeline.modeling.pipeline_profiler import profile_stage, mark_cache_miss
 
 
-# Your AWS bucket and folder details where models are stored
+# The models are resolved from the model registry (see model_registry). Until a training run is registered,
+# the models are loaded from this folder
 folder_prefix = 'models/models_trained/1483317c-343a-4424-88a6-bd57459901d1/'  # If you have a specific folder
 
+# Folder of the training runs, every run saves its models and its feature transformer under <trained_models_prefix>/<uuid>/
+trained_models_prefix = 'models/models_trained'
+
 
 target_vars_et  = ['traffic_abs', 'sum_IN_abs', 'sum_OUT_abs', 
                     'Lusen-Mauth-Finsterau IN', 'Lusen-Mauth-Finsterau OUT', 
@@ -25,122 +32,301 @@ target_vars_et  = ['traffic_abs', 'sum_IN_abs', 'sum_OUT_abs',
 # model names 
 model_names = [f'extra_trees_{var}' for var in target_vars_et]
 
+# Inference mode of the fallback folder: 'per_target' uses one model per target variable, 'multi_output' uses one model for all target variables
+model_mode = 'per_target'
+multi_output_model_name = 'extra_trees_multi_output'
+
+# Inference backend: 'sklearn' predicts with the loaded models, 'compiled' with the batched tree-ensemble evaluator
+inference_backend = 'compiled'
+
+
+def get_model_names(model_mode):
+    """
+    Get the names of the models to load for the given inference mode.
+
+    Parameters:
+    - model_mode (str): 'per_target' or 'multi_output'.
+
+    Returns:
+    - list: List of model names.
+    """
+    if model_mode == 'multi_output':
+        return [multi_output_model_name]
+
+    return model_names
+
+@profile_stage('load_latest_models', cached=True)
 @st.cache_resource(max_entries=1)
+@mark_cache_miss
 def load_latest_models(bucket_name, folder_prefix, models_names):
     """
-    Load the latest files from an S3 folder based on the model names, 
-    and dynamically create variables with 'loaded_' as prefix.
+    Load the latest models from an S3 folder based on the model names.
+
+    The models are downloaded and deserialized at the same time over one pooled S3 client and
+    are kept in a local cache keyed by run UUID and checksum, so a restarted container loads them from disk.
+    If the folder has a manifest, its checksums are used and no HEAD request is sent; older runs without
+    a manifest are checked with one HEAD request per model and keyed by the ETag.
+    Models exported in the flat node-array format are memory-mapped read-only from that cache, so all
+    worker processes share the same pages; older runs fall back to the pickle.
 
     Parameters:
     - bucket_name (str): The name of the S3 bucket.
     - folder_prefix (str): The folder path within the bucket.
-    - models (list): List of model names without the 'extra_trees_' prefix.
+    - models_names (list): List of model names with the 'extra_trees_' prefix.
 
     Returns:
-    - dict: A dictionary containing the loaded models with keys prefixed by 'loaded_'.
+    - dict: A dictionary containing the loaded models with the model names as keys.
     """
 
-    # Dictionary to store loaded models
-    loaded_models = {}
+    try:
+        manifest = get_run_manifest(folder_prefix, bucket_name)
+    except (BotoCoreError, ClientError) as e:
+        # fetch_model falls back to the cached copies if S3 cannot be reached
+        print(f"Could not read the manifest under {folder_prefix}: {e}")
+        manifest = None
 
-    # Loop through each model to get the latest pickle (.pkl) file
-    for model in models_names:
-        
-        # Create an S3 client
-        s3 = boto3.client('s3')
+    if manifest is not None:
+        manifest = select_manifest_models(manifest, models_names)
 
-        s3_key = folder_prefix + model + '.pkl'
-        print(f"Retrieving the trained model {model} saved under AWS S3 in bucket {bucket_name} with key {s3_key}")
+    if manifest is not None:
+        loaded_models = load_registered_models(manifest, bucket_name)
+    else:
+        loaded_models = load_models_concurrently(bucket_name, folder_prefix, models_names)
 
-        # Get the object from S3
-        response = s3.get_object(Bucket=bucket_name, Key=s3_key)
-
-        # Load the pickled model from the response object using joblib
-        loaded_regressor_model = joblib.load(io.BytesIO(response['Body'].read()))
-        
-        # Store the loaded model in the dictionary
-        loaded_models[f'{model}'] = loaded_regressor_model
-    
     return loaded_models
 
 
+@st.cache_resource(max_entries=1)
+def load_compiled_models(bucket_name, folder_prefix, models_names):
+    """
+    Load the latest models and compile them for the batched tree-ensemble evaluator.
+
+    The compiled models give the same predictions as the loaded ones and are built once per process.
+
+    Parameters:
+    - bucket_name (str): The name of the S3 bucket.
+    - folder_prefix (str): The folder path within the bucket.
+    - models_names (list): List of model names with the 'extra_trees_' prefix.
+
+    Returns:
+    - dict: A dictionary containing the compiled models with the model names as keys.
+    """
+
+    return compile_models(load_latest_models(bucket_name, folder_prefix, models_names))
+
+
+@st.cache_resource
+def get_model_registry_watcher(backend):
+    """
+    Get the watcher that keeps the latest registered models loaded for the given backend.
+
+    New training runs registered by `train_regressor` are loaded, compiled and warmed up in the
+    background and then swapped in, without a redeploy.
+
+    Parameters:
+    - backend (str): 'sklearn' or 'compiled'.
+
+    Returns:
+    - ModelRegistryWatcher: The watcher of the backend.
+    """
+    if backend not in ('sklearn', 'compiled'):
+        raise ValueError(f"Unknown inference backend '{backend}', expected 'sklearn' or 'compiled'")
+
+    def prepare_models(loaded_models):
+        return compile_models(loaded_models) if backend == 'compiled' else loaded_models
+
+    def load_fallback_models():
+        print(f"No training run is registered, loading the models from {folder_prefix}")
+        load_models = load_compiled_models if backend == 'compiled' else load_latest_models
+
+        return get_run_id_from_folder_prefix(folder_prefix), load_models(aws_s3_bucket, folder_prefix, get_model_names(model_mode))
+
+    return ModelRegistryWatcher(prepare_models, load_fallback_models)
+
+
+def get_inference_models(backend):
+    """
+    Get the models used for inference with the given backend.
+
+    Parameters:
+    - backend (str): 'sklearn' or 'compiled'.
+
+    Returns:
+    - dict: A dictionary containing the models with the model names as keys.
+    """
+    _, models = get_model_registry_watcher(backend).get_models()
+
+    return models
+
+
+def get_active_model_version(backend):
+    """
+    Get the training run UUID of the models used for inference with the given backend.
+
+    Parameters:
+    - backend (str): 'sklearn' or 'compiled'.
+
+    Returns:
+    - str: The training run UUID.
+    """
+    version, _ = get_model_registry_watcher(backend).get_models()
+
+    return version
+
+
+@st.cache_resource(max_entries=1)
+def get_inference_feature_transformer(model_version):
+    """
+    Get the feature transformer saved with the models of a training run.
+
+    Parameters:
+    - model_version (str): The training run UUID of the active models.
+
+    Returns:
+    - FeatureTransformer: The transformer fitted on the training features, or None for older training runs,
+      whose features are scaled with the statistics of the inference data.
+    """
+    feature_transformer = load_feature_transformer(f"{trained_models_prefix}/{model_version}/")
+
+    if feature_transformer is None:
+        print(f"The training run {model_version} has no feature transformer, the features are scaled on the inference data")
+
+    return feature_transformer
+
+
+def get_model_targets(model_name, model):
+    """
+    Get the target variables predicted by a model.
+
+    A per-target model predicts one target, which is part of the model name. A multi-output model
+    predicts one column per target in the order stored in its `target_names_` attribute.
+
+    Parameters:
+    - model_name (str): The name of the model.
+    - model: The trained model.
+
+    Returns:
+    - list: The target variables in the order of the model outputs.
+    """
+    if getattr(model, 'n_outputs_', 1) > 1:
+        return list(getattr(model, 'target_names_', target_vars_et))
+
+    return [model_name.split('extra_trees_')[1]]
+
 
-def predict_with_models(loaded_models, df_features):
+@profile_stage('predict_with_models')
+def predict_with_models(loaded_models, df_features, store_predictions=True):
     """
     Given a dictionary of models and a DataFrame of features, this function predicts the target
-    values using each model and saves the inference predictions to AWS S3 (to be further loaded from Streamlit).
+    values using each model and queues the inference predictions to be saved to AWS S3 in the background.
+
+    All predictions are written into one preallocated (hours x targets) array, so no DataFrame is copied per model.
     
     Parameters:
     - loaded_models (dict): A dictionary of models where keys are model names and values are the trained models.
     - df_features (pd.DataFrame): A DataFrame containing the features to make predictions on.
+    - store_predictions (bool): Whether to queue the predictions for AWS S3. False when only part of a run is predicted.
 
     Returns:
-    - pd.DataFrame: A DataFrame containing the predictions of all models per region.
+    - pd.DataFrame: A DataFrame indexed by 'Time' with one column of predictions per target.
     """
 
-    overall_predictions = pd.DataFrame()
-
-    # Iterate through the loaded models
+    # Keep only the valid models
+    valid_models = {}
     for model_name, model in loaded_models.items():
         # Check if the model has a predict method
         if hasattr(model, 'predict'):
-            # Make predictions
-            predictions = model.predict(df_features)
-            
-            # Create a new DataFrame for the predictions with the time column
-            df_predictions = pd.DataFrame(predictions, columns=['predictions'])
-
-            # Make the index column 'Time'
-            df_predictions['Time'] = df_features.index
+            valid_models[model_name] = model
+        else:
+           print(f"Error: {model_name} is not a valid model. It is of type {type(model)}")
 
-            # Make sure predictions are integers and not floats
-            df_predictions['predictions'] = df_predictions['predictions'].astype(int)
-    
-            # save the prediction dataframe as a parquet file in aws
-            wr.s3.to_parquet(df_predictions,path = f"s3://{aws_s3_bucket}/models/inference_data_outputs/{model_name}.parquet")
+    # Preallocate the array of predictions
+    model_targets = {model_name: get_model_targets(model_name, model) for model_name, model in valid_models.items()}
+    targets = [target for targets_per_model in model_targets.values() for target in targets_per_model]
+    predictions_array = np.empty((len(df_features), len(targets)), dtype=np.int64)
 
-            print(f"Predictions for {model_name} stored successfully")
-            df_predictions["region"] = model_name.split('extra_trees_')[1].split('.parquet')[0]
+    column = 0
+    for model_name, model in valid_models.items():
+        # Make predictions, the integer array truncates them the same way as astype(int)
+        n_outputs = len(model_targets[model_name])
+        predictions_array[:, column:column + n_outputs] = np.asarray(model.predict(df_features)).reshape(len(df_features), n_outputs)
+        column += n_outputs
 
-            # Append the predictions to the overall_predictions DataFrame
-            overall_predictions = pd.concat([overall_predictions, df_predictions])
+    overall_predictions = pd.DataFrame(predictions_array, index=pd.Index(df_features.index, name='Time'), columns=targets)
 
-        else:
-           print(f"Error: {model_name} is not a valid model. It is of type {type(model)}")
+    # Store the predictions in AWS S3 in the background, so the dashboard does not wait for the upload
+    if store_predictions:
+        get_inference_output_sink().submit(overall_predictions)
     
     return overall_predictions
 
+@profile_stage('preprocess_overall_inference_predictions', cached=True)
 @st.cache_data(max_entries=1)
+@mark_cache_miss
 def preprocess_overall_inference_predictions(overall_predictions: pd.DataFrame) -> pd.DataFrame:
-    # Pivot the dataframe to wide format
-    overall_predictions_wide = overall_predictions.pivot(index='Time', columns='region', values='predictions').reset_index()
+    """
+    Compute the traffic per region, the weekly relative traffic and the traffic colors from the predictions.
 
-    # Convert the 'Time' column to datetime format
-    overall_predictions_wide['Time'] = pd.to_datetime(overall_predictions_wide['Time'], errors='coerce')
+    The region sums, the min-max scaling and the color buckets are computed on the whole (hours x regions)
+    array at once.
 
-    # Create a new column to combine both date and day for radio buttons
-    overall_predictions_wide['day_date'] = overall_predictions_wide['Time'].dt.strftime('%d-%m-%Y')
+    Parameters:
+    - overall_predictions (pd.DataFrame): The predictions indexed by 'Time' with one column per target.
+
+    Returns:
+    - pd.DataFrame: The predictions with the columns 'Time', 'day_date' and, per region, the traffic,
+      the weekly relative traffic and the traffic color.
+    """
+    # Convert the 'Time' index to datetime format
+    times = pd.to_datetime(overall_predictions.index, errors='coerce')
+    predictions = overall_predictions.to_numpy()
+    column_positions = {column: i for i, column in enumerate(overall_predictions.columns)}
+
+    # Calculate the traffic per region (IN + OUT)
+    in_positions = [column_positions[value[0]] for value in regions.values()]
+    out_positions = [column_positions[value[1]] for value in regions.values()]
+    region_traffic = predictions[:, in_positions] + predictions[:, out_positions]
+
+    # Weekly relative traffic with min-max scaling per region; a constant region is scaled to 0 like MinMaxScaler does
+    region_min = region_traffic.min(axis=0)
+    region_range = region_traffic.max(axis=0) - region_min
+    region_range = np.where(region_range == 0, 1, region_range)
+    weekly_relative_traffic = (region_traffic - region_min) / region_range
 
-        # Calculate the traffic rate per region
-    for key, value in regions.items():
-        overall_predictions_wide[key] = overall_predictions_wide[value[0]] + overall_predictions_wide[value[1]]
+    # Color coding based on traffic thresholds
+    traffic_color = np.select([weekly_relative_traffic > 0.40, weekly_relative_traffic < 0.05], ['red', 'green'], default='blue')
+
+    columns = {'Time': times}
+    columns.update({column: predictions[:, i] for column, i in column_positions.items()})
+
+    # Create a new column to combine both date and day for radio buttons
+    columns['day_date'] = times.strftime('%d-%m-%Y')
 
-        # Create a weekly relative traffic column with sklearn min-max scaling
-        scaler = MinMaxScaler()
-        overall_predictions_wide[f'weekly_relative_traffic_{key}'] = scaler.fit_transform(overall_predictions_wide[[key]])
+    for j, key in enumerate(regions.keys()):
+        columns[key] = region_traffic[:, j]
+        columns[f'weekly_relative_traffic_{key}'] = weekly_relative_traffic[:, j]
+        columns[f'traffic_color_{key}'] = traffic_color[:, j]
 
-        # Create a new column for color coding based on traffic thresholds
-        overall_predictions_wide[f'traffic_color_{key}'] = overall_predictions_wide[f'weekly_relative_traffic_{key}'].apply(
-            lambda x: 'red' if x > 0.40 else 'green' if x < 0.05 else 'blue'
-        )
+    overall_predictions_wide = pd.DataFrame(columns)
 
     return overall_predictions_wide
 
 
 @st.cache_data(max_entries=1)
-def visitor_predictions(inference_data):
+def visitor_predictions(inference_data, model_version=None):
+    """
+    Predict the visitor counts for the inference data and preprocess the predictions for the dashboard.
+
+    Parameters:
+    - inference_data (pd.DataFrame): The preprocessed inference features indexed by 'Time'.
+    - model_version (str): The training run UUID of the active models. It is only part of the cache key,
+      so the predictions are recomputed after the models are swapped.
+
+    Returns:
+    - pd.DataFrame: The preprocessed visitor predictions per region.
+    """
 
-    loaded_models = load_latest_models(aws_s3_bucket, folder_prefix, model_names)
+    loaded_models = get_inference_models(inference_backend)
 
     print("Models loaded successfully")
     
@@ -0,0 +1,286 @@
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+from src.prediction_pipeline.pre_processing.column_schema import get_column_dtype
+from src.prediction_pipeline.sourcing_data.weather_cache import get_missing_ranges
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Local Parquet store of the engineered features, keyed by hour and partitioned by month:
+# <FEATURE_STORE_DIR>/<feature set>/month=<YYYY-MM>/features.parquet
+FEATURE_STORE_DIR = os.path.join('outputs', 'feature_store')
+
+# Per feature set: the categorical columns, the hour ranges that were computed and the version of their source data.
+# Files starting with '_' or '.' are not read as part of the Parquet dataset.
+METADATA_FILE = '_feature_store.json'
+
+time_column = 'Time'
+
+# One lock per feature set, so the training and the inference write at the same time
+_locks_lock = threading.Lock()
+_feature_set_locks = {}
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_feature_set_lock(feature_set_dir: str) -> threading.Lock:
+    """
+    Get the lock of a feature set.
+
+    Args:
+        feature_set_dir (str): The folder of the feature set.
+
+    Returns:
+        threading.Lock: The lock of the feature set.
+    """
+    with _locks_lock:
+        return _feature_set_locks.setdefault(feature_set_dir, threading.Lock())
+
+
+def load_metadata(feature_set_dir: str) -> dict:
+    """
+    Load the metadata of a feature set.
+
+    Args:
+        feature_set_dir (str): The folder of the feature set.
+
+    Returns:
+        dict: The keys 'version', 'categorical_columns' and 'covered_ranges' (a list of [first hour, last hour] in ISO format).
+    """
+    metadata_path = os.path.join(feature_set_dir, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        return {'version': None, 'categorical_columns': [], 'covered_ranges': []}
+
+    with open(metadata_path) as file:
+        return json.load(file)
+
+
+def save_metadata(metadata: dict, feature_set_dir: str) -> None:
+    """
+    Save the metadata of a feature set. The file is replaced at once, so a crash never leaves broken metadata.
+
+    Args:
+        metadata (dict): The metadata returned by load_metadata.
+        feature_set_dir (str): The folder of the feature set.
+    """
+    os.makedirs(feature_set_dir, exist_ok=True)
+
+    metadata_path = os.path.join(feature_set_dir, METADATA_FILE)
+    temporary_path = f"{metadata_path}.part"
+    with open(temporary_path, 'w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(temporary_path, metadata_path)
+
+
+def get_uncovered_hours(hours: pd.DatetimeIndex, covered_ranges: list) -> pd.DatetimeIndex:
+    """
+    Get the hours that are not in any of the computed hour ranges.
+
+    Args:
+        hours (pd.DatetimeIndex): The requested hours.
+        covered_ranges (list): The computed hour ranges as [first hour, last hour] in ISO format.
+
+    Returns:
+        pd.DatetimeIndex: The hours that were never computed.
+    """
+    is_covered = pd.Series(False, index=hours)
+    for first_hour, last_hour in covered_ranges:
+        is_covered |= (hours >= pd.Timestamp(first_hour)) & (hours <= pd.Timestamp(last_hour))
+
+    return hours[~is_covered.to_numpy()]
+
+
+def add_covered_range(covered_ranges: list, first_hour: pd.Timestamp, last_hour: pd.Timestamp) -> list:
+    """
+    Add a computed hour range and merge it with the ranges it overlaps or touches.
+
+    Args:
+        covered_ranges (list): The computed hour ranges as [first hour, last hour] in ISO format.
+        first_hour (pd.Timestamp): The first computed hour.
+        last_hour (pd.Timestamp): The last computed hour.
+
+    Returns:
+        list: The merged hour ranges, sorted by their first hour.
+    """
+    ranges = sorted([(pd.Timestamp(first), pd.Timestamp(last)) for first, last in covered_ranges] + [(first_hour, last_hour)])
+
+    merged_ranges = [list(ranges[0])]
+    for first, last in ranges[1:]:
+        if first <= merged_ranges[-1][1] + pd.Timedelta(hours=1):
+            merged_ranges[-1][1] = max(merged_ranges[-1][1], last)
+        else:
+            merged_ranges.append([first, last])
+
+    return [[first.isoformat(), last.isoformat()] for first, last in merged_ranges]
+
+
+def to_stored_dtypes(features_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace the categorical columns by their values, so partitions written at different times have the same
+    column types. The categories are restored when the features are read.
+
+    Args:
+        features_df (pd.DataFrame): The features.
+
+    Returns:
+        pd.DataFrame: The features without categorical columns.
+    """
+    categorical_columns = features_df.select_dtypes(include='category').columns
+
+    return features_df.astype({column: features_df[column].cat.categories.dtype for column in categorical_columns})
+
+
+def get_category_dtype(column: str):
+    """
+    Get the dtype of a stored categorical column.
+
+    Args:
+        column (str): The name of the column.
+
+    Returns:
+        The categorical dtype of the schema, or 'category' if the schema does not declare one.
+    """
+    dtype = get_column_dtype(column)
+
+    return dtype if isinstance(dtype, pd.CategoricalDtype) else 'category'
+
+
+def write_features(features_df: pd.DataFrame, feature_set: str, first_hour=None, last_hour=None, store_dir: str = FEATURE_STORE_DIR) -> None:
+    """
+    Write the features of an hour range to the store, one file per month. The stored rows of the range are replaced.
+
+    Args:
+        features_df (pd.DataFrame): The features with the 'Time' column, one row per hour.
+        feature_set (str): The name of the feature set, e.g. 'training' or 'inference'.
+        first_hour (datetime): The first hour of the range. Defaults to the first hour of the features.
+        last_hour (datetime): The last hour of the range. Defaults to the last hour of the features.
+        store_dir (str): The folder of the feature store.
+    """
+    feature_set_dir = os.path.join(store_dir, feature_set)
+    first_hour = pd.Timestamp(first_hour if first_hour is not None else features_df[time_column].min())
+    last_hour = pd.Timestamp(last_hour if last_hour is not None else features_df[time_column].max())
+
+    features_df = to_stored_dtypes(features_df)
+    months = features_df[time_column].dt.strftime('%Y-%m')
+
+    for month in pd.period_range(first_hour, last_hour, freq='M').strftime('%Y-%m'):
+        partition_dir = os.path.join(feature_set_dir, f'month={month}')
+        partition_path = os.path.join(partition_dir, 'features.parquet')
+        month_df = features_df[months == month]
+
+        if os.path.exists(partition_path):
+            stored_df = pd.read_parquet(partition_path)
+            stored_df = stored_df[(stored_df[time_column] < first_hour) | (stored_df[time_column] > last_hour)]
+            month_df = pd.concat([stored_df, month_df], ignore_index=True)
+
+        if month_df.empty:
+            if os.path.exists(partition_path):
+                os.remove(partition_path)
+            continue
+
+        # The file is replaced at once, so a reader never sees a partly written partition
+        os.makedirs(partition_dir, exist_ok=True)
+        temporary_path = os.path.join(partition_dir, f".features.{threading.get_ident()}.part")
+        month_df.sort_values(time_column).to_parquet(temporary_path, index=False)
+        os.replace(temporary_path, partition_path)
+
+
+def read_features(feature_set: str, start_time, end_time, columns: list = None, store_dir: str = FEATURE_STORE_DIR) -> pd.DataFrame:
+    """
+    Read the stored features of an hour range. Only the partitions of the range and the requested columns are read,
+    and the rows are filtered on the time while reading.
+
+    Args:
+        feature_set (str): The name of the feature set.
+        start_time (datetime): The first hour.
+        end_time (datetime): The last hour (included).
+        columns (list): The feature columns to read. Defaults to all columns.
+        store_dir (str): The folder of the feature store.
+
+    Returns:
+        pd.DataFrame: The features with the 'Time' column, sorted by time. Empty if nothing is stored.
+    """
+    feature_set_dir = os.path.join(store_dir, feature_set)
+    start_time, end_time = pd.Timestamp(start_time), pd.Timestamp(end_time)
+
+    stored_months = [entry for entry in os.listdir(feature_set_dir) if entry.startswith('month=')] if os.path.isdir(feature_set_dir) else []
+    if not stored_months:
+        return pd.DataFrame(columns=[time_column] + (columns or []))
+
+    features_df = pd.read_parquet(
+        feature_set_dir,
+        columns=None if columns is None else [time_column] + [column for column in columns if column != time_column],
+        filters=[
+            ('month', '>=', start_time.strftime('%Y-%m')), ('month', '<=', end_time.strftime('%Y-%m')),
+            (time_column, '>=', start_time), (time_column, '<=', end_time)
+        ]
+    )
+    features_df = features_df.drop(columns='month', errors='ignore').sort_values(time_column, ignore_index=True)
+
+    # Restore the categories of the categorical columns, the fixed categories of the schema where it declares them
+    categorical_columns = [column for column in load_metadata(feature_set_dir)['categorical_columns'] if column in features_df.columns]
+
+    return features_df.astype({column: get_category_dtype(column) for column in categorical_columns})
+
+
+def get_or_compute_features(feature_set: str, start_time, end_time, compute_features, columns: list = None,
+                            recompute_from=None, version=None, store_dir: str = FEATURE_STORE_DIR) -> pd.DataFrame:
+    """
+    Get the features of an hour range from the store and compute only the hours that were never computed.
+
+    Args:
+        feature_set (str): The name of the feature set, e.g. 'training' or 'inference'.
+        start_time (datetime): The first hour.
+        end_time (datetime): The last hour (included).
+        compute_features (callable): Called with the first and the last hour of every contiguous range of missing hours,
+            returns the features of (at least) these hours with the 'Time' column. Hours it does not return (e.g. dropped rows)
+            are not computed again.
+        columns (list): The feature columns to return. Defaults to all columns.
+        recompute_from (datetime): The hours from this hour on are always computed again, e.g. the hours with a weather forecast.
+        version: The version of the source data (e.g. a hash). The stored hours of another version are computed again.
+        store_dir (str): The folder of the feature store.
+
+    Returns:
+        pd.DataFrame: The features of the hour range with the 'Time' column, sorted by time.
+    """
+    feature_set_dir = os.path.join(store_dir, feature_set)
+    start_time, end_time = pd.Timestamp(start_time), pd.Timestamp(end_time)
+    hours = pd.date_range(start_time.ceil('h'), end_time.floor('h'), freq='h')
+
+    with get_feature_set_lock(feature_set_dir):
+        metadata = load_metadata(feature_set_dir)
+        if metadata['version'] != version:
+            # The source data changed, the stored features are computed again
+            shutil.rmtree(feature_set_dir, ignore_errors=True)
+            metadata = {'version': version, 'categorical_columns': [], 'covered_ranges': []}
+
+        missing_hours = get_uncovered_hours(hours, metadata['covered_ranges'])
+        if recompute_from is not None:
+            missing_hours = missing_hours.union(hours[hours >= pd.Timestamp(recompute_from)])
+
+        if len(missing_hours) == 0:
+            print(f"Features '{feature_set}' from {start_time} to {end_time} served from the feature store")
+            return read_features(feature_set, start_time, end_time, columns, store_dir)
+
+        # Only the missing ranges are computed, the stored hours between them are kept
+        for first_hour, last_hour in get_missing_ranges(missing_hours):
+            print(f"Computing the features '{feature_set}' from {first_hour} to {last_hour}...")
+
+            computed_df = compute_features(first_hour, last_hour)
+            computed_df = computed_df[(computed_df[time_column] >= first_hour) & (computed_df[time_column] <= last_hour)]
+
+            write_features(computed_df, feature_set, first_hour, last_hour, store_dir)
+
+            metadata['categorical_columns'] = sorted(set(metadata['categorical_columns']) | set(computed_df.select_dtypes(include='category').columns))
+            metadata['covered_ranges'] = add_covered_range(metadata['covered_ranges'], first_hour, last_hour)
+            save_metadata(metadata, feature_set_dir)
+
+        return read_features(feature_set, start_time, end_time, columns, store_dir)
@@ -0,0 +1,162 @@
+import json
+
+import numpy as np
+import pandas as pd
+from src.prediction_pipeline.pre_processing.column_schema import weekdays
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Periods of the cyclic features. They are fixed, so the encoding does not depend on the rows that are transformed
+# (the max of a 7-day inference window is not the max of the training data)
+cyclic_periods = {'Tag': 31, 'Hour': 24, 'Monat': 12, 'Wochentag': 7}
+
+# The weekdays of the visitor center data are German day names, numbered from Monday
+weekday_numbers = {weekday: number for number, weekday in enumerate(weekdays)}
+
+# Features standardized with the mean and standard deviation of the training data
+standardize_features = ['Temperature (°C)', 'Relative Humidity (%)', 'Wind Speed (km/h)',
+                        'Distance_to_Nearest_Holiday_Bayern', 'Distance_to_Nearest_Holiday_CZ']
+
+# The transformer is saved next to the models of its training run
+feature_transformer_file_name = 'feature_transformer.json'
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_cyclic_values(values: pd.Series) -> np.ndarray:
+    """
+    Get the numeric values of a cyclic feature. Weekday names are replaced by their number.
+
+    Args:
+        values (pd.Series): The values of the cyclic feature.
+
+    Returns:
+        np.ndarray: The values as float64, NaN for unknown weekday names.
+    """
+    value_dtype = values.cat.categories.dtype if isinstance(values.dtype, pd.CategoricalDtype) else values.dtype
+
+    if not pd.api.types.is_numeric_dtype(value_dtype):
+        # A categorical column is mapped once per category
+        values = values.map(weekday_numbers)
+
+    return values.to_numpy(dtype='float64', na_value=np.nan)
+
+
+class FeatureTransformer:
+    """
+    The sine and cosine encoding of the cyclic features and the standardization of the numeric features,
+    fitted once on the training data.
+
+    The inference applies the same fixed periods and the same mean and standard deviation as the training,
+    whatever window of hours it transforms, so its features are deterministic and computed in one array step.
+    """
+
+    def __init__(self, mean_std_values: dict = None, periods: dict = None):
+        """
+        Args:
+            mean_std_values (dict): The mean and standard deviation of every standardized feature.
+            periods (dict): The period of every cyclic feature. Defaults to `cyclic_periods`.
+        """
+        self.mean_std_values = dict(mean_std_values or {})
+        self.periods = dict(periods or cyclic_periods)
+
+    def fit(self, df: pd.DataFrame) -> 'FeatureTransformer':
+        """
+        Compute the mean and standard deviation of the standardized features.
+
+        Args:
+            df (pd.DataFrame): The engineered features of the training data.
+
+        Returns:
+            FeatureTransformer: The fitted transformer.
+        """
+        self.mean_std_values = {
+            feature: [float(df[feature].mean()), float(df[feature].std())]
+            for feature in standardize_features if feature in df.columns
+        }
+
+        return self
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace the cyclic features by their sine and cosine and standardize the numeric features.
+
+        Args:
+            df (pd.DataFrame): The engineered features.
+
+        Returns:
+            pd.DataFrame: The features with the '<feature>_sin' and '<feature>_cos' columns instead of the cyclic features.
+        """
+        cyclic_columns = [feature for feature in self.periods if feature in df.columns]
+        standardized_columns = [feature for feature in self.mean_std_values if feature in df.columns]
+
+        for feature in [*self.periods, *self.mean_std_values]:
+            if feature not in df.columns:
+                print(f"Warning: Feature '{feature}' not found in DataFrame")
+
+        # All cyclic features at once: one (hours x features) array of angles
+        periods = np.array([self.periods[feature] for feature in cyclic_columns], dtype='float64')
+        cyclic_values = np.array([get_cyclic_values(df[feature]) for feature in cyclic_columns], dtype='float64')
+        angles = 2 * np.pi * cyclic_values.reshape(len(cyclic_columns), len(df)).T / periods
+
+        mean_values, std_values = np.array([self.mean_std_values[feature] for feature in standardized_columns], dtype='float64').reshape(-1, 2).T
+        standardized_values = (df[standardized_columns].to_numpy(dtype='float64', na_value=np.nan) - mean_values) / std_values
+
+        df = df.drop(columns=cyclic_columns)
+        df[standardized_columns] = standardized_values
+
+        cyclic_names = [f'{feature}_{function}' for feature in cyclic_columns for function in ('sin', 'cos')]
+        cyclic_values = np.stack([np.sin(angles), np.cos(angles)], axis=2).reshape(len(df), -1)
+
+        return pd.concat([df, pd.DataFrame(cyclic_values, index=df.index, columns=cyclic_names)], axis=1)
+
+    def to_dict(self) -> dict:
+        """
+        Get the parameters of the transformer.
+
+        Returns:
+            dict: The keys 'periods' and 'mean_std_values'.
+        """
+        return {'periods': self.periods, 'mean_std_values': self.mean_std_values}
+
+    @classmethod
+    def from_dict(cls, parameters: dict) -> 'FeatureTransformer':
+        """
+        Create a transformer from the parameters of `to_dict`.
+
+        Args:
+            parameters (dict): The keys 'periods' and 'mean_std_values'.
+
+        Returns:
+            FeatureTransformer: The transformer.
+        """
+        return cls(mean_std_values=parameters['mean_std_values'], periods=parameters['periods'])
+
+    def save(self, path: str) -> None:
+        """
+        Save the transformer as JSON.
+
+        Args:
+            path (str): The path of the JSON file.
+        """
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'FeatureTransformer':
+        """
+        Load a transformer saved with `save`.
+
+        Args:
+            path (str): The path of the JSON file.
+
+        Returns:
+            FeatureTransformer: The transformer.
+        """
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
@@ -0,0 +1,190 @@
+import joblib
+import numpy as np
+import pandas as pd
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+flat_model_file_extension = '.flat.joblib'
+
+# Marker of a leaf in the children arrays, the same value scikit-learn uses
+TREE_LEAF = -1
+
+
+class OutdatedFlatForestError(ValueError):
+    """
+    Raised when a flat forest file was exported without the direction of the missing values of every split,
+    so it cannot predict like its scikit-learn model. The pickle of the model is used instead.
+    """
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_fitted_estimator(model):
+    """
+    Get the fitted estimator of a model. A pipeline (e.g. the result of pycaret's `finalize_model`) is unwrapped
+    to its last step, like `save_model(..., model_only=True)` does.
+
+    Args:
+        model: The fitted estimator or pipeline.
+
+    Returns:
+        The fitted estimator.
+    """
+    return model[-1] if hasattr(model, 'steps') else model
+
+
+def export_flat_forest(model) -> dict:
+    """
+    Export a fitted tree ensemble (e.g. an ExtraTreesRegressor) into flat node arrays.
+
+    The nodes of all trees are concatenated into one set of arrays. The children indices are shifted by the
+    offset of their tree, so they point into the concatenated arrays, and `tree_offsets` holds the root of every tree.
+
+    Args:
+        model: The fitted tree ensemble regressor, or a pipeline that ends with it.
+
+    Returns:
+        dict: The flat node arrays and the metadata of the model.
+    """
+    model = get_fitted_estimator(model)
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    node_counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    tree_offsets = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.int64)
+
+    def shift_children(children, offset):
+        return np.where(children == TREE_LEAF, TREE_LEAF, children + offset)
+
+    flat_forest = {
+        'tree_offsets': tree_offsets,
+        'children_left': np.concatenate([shift_children(tree.children_left, offset) for tree, offset in zip(trees, tree_offsets)]).astype(np.int64),
+        'children_right': np.concatenate([shift_children(tree.children_right, offset) for tree, offset in zip(trees, tree_offsets)]).astype(np.int64),
+        'feature': np.concatenate([tree.feature for tree in trees]).astype(np.int64),
+        'threshold': np.concatenate([tree.threshold for tree in trees]).astype(np.float64),
+        # scikit-learn >= 1.3 stores per split whether NaN goes to the left child; before, NaN was rejected
+        'missing_go_to_left': np.concatenate([
+            getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)) for tree in trees
+        ]).astype(bool),
+        'value': np.concatenate([tree.value[:, :, 0] for tree in trees]).astype(np.float64),
+        'n_outputs': int(model.n_outputs_),
+        'feature_names': list(getattr(model, 'feature_names_in_', [])),
+        'target_names': list(getattr(model, 'target_names_', [])),
+    }
+
+    return flat_forest
+
+
+def save_flat_forest(model, path: str) -> None:
+    """
+    Save a fitted tree ensemble in the flat node-array format.
+
+    The file is written with joblib without compression, so every array is stored as raw bytes and can be
+    memory-mapped when it is loaded.
+
+    Args:
+        model: The fitted tree ensemble regressor, or a pipeline that ends with it.
+        path (str): The local path of the file.
+
+    Returns:
+        None
+    """
+    joblib.dump(export_flat_forest(model), path, compress=0)
+
+
+class FlatForestRegressor:
+    """
+    Tree ensemble regressor that predicts from flat node arrays.
+
+    When it is loaded with `mmap_mode='r'`, the node arrays are read-only memory maps of the model file,
+    so all processes that load the same file share the same memory pages.
+    """
+
+    def __init__(self, flat_forest: dict):
+        if 'missing_go_to_left' not in flat_forest:
+            raise OutdatedFlatForestError("The flat forest was exported without the direction of the missing values")
+
+        self.tree_offsets = flat_forest['tree_offsets']
+        self.children_left = flat_forest['children_left']
+        self.children_right = flat_forest['children_right']
+        self.feature = flat_forest['feature']
+        self.threshold = flat_forest['threshold']
+        self.missing_go_to_left = flat_forest['missing_go_to_left']
+        self.value = flat_forest['value']
+        self.n_outputs_ = flat_forest['n_outputs']
+        self.feature_names_in_ = flat_forest['feature_names']
+        if flat_forest['target_names']:
+            self.target_names_ = flat_forest['target_names']
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = 'r'):
+        """
+        Load a model saved with `save_flat_forest`.
+
+        Args:
+            path (str): The local path of the file.
+            mmap_mode (str): The memory-map mode passed to joblib; None reads the arrays into memory.
+
+        Returns:
+            FlatForestRegressor: The loaded model.
+        """
+        return cls(joblib.load(path, mmap_mode=mmap_mode))
+
+    def _get_feature_array(self, X) -> np.ndarray:
+        # Use the column order of the training data and the same float32 cast as scikit-learn trees
+        if isinstance(X, pd.DataFrame) and self.feature_names_in_:
+            X = X[self.feature_names_in_]
+
+        return np.asarray(X, dtype=np.float32)
+
+    def apply_tree(self, X: np.ndarray, root: int) -> np.ndarray:
+        """
+        Get the leaf reached by every sample in one tree.
+
+        Args:
+            X (np.ndarray): The features as a float32 array.
+            root (int): The index of the root of the tree in the flat arrays.
+
+        Returns:
+            np.ndarray: The index of the leaf of every sample.
+        """
+        rows = np.arange(X.shape[0])
+        nodes = np.full(X.shape[0], root, dtype=np.int64)
+
+        # Move all samples that are not in a leaf yet one level down. Like scikit-learn, a value goes left if it
+        # is <= the threshold, and NaN goes to the child the split learned for missing values
+        active = self.children_left[nodes] != TREE_LEAF
+        while active.any():
+            active_nodes = nodes[active]
+            values = X[rows[active], self.feature[active_nodes]]
+            go_left = (values <= self.threshold[active_nodes]) | (np.isnan(values) & self.missing_go_to_left[active_nodes])
+            nodes[active] = np.where(go_left, self.children_left[active_nodes], self.children_right[active_nodes])
+            active = self.children_left[nodes] != TREE_LEAF
+
+        return nodes
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Predict the target values as the mean of the leaf values of all trees.
+
+        Args:
+            X (pd.DataFrame or np.ndarray): The features.
+
+        Returns:
+            np.ndarray: The predictions, 1-D for a single output and (samples x outputs) otherwise.
+        """
+        X = self._get_feature_array(X)
+        predictions = np.zeros((X.shape[0], self.n_outputs_), dtype=np.float64)
+
+        # Add up the trees in order, the same way scikit-learn does
+        for root in self.tree_offsets:
+            predictions += self.value[self.apply_tree(X, root)]
+        predictions /= len(self.tree_offsets)
+
+        if self.n_outputs_ == 1:
+            return predictions[:, 0]
+
+        return predictions
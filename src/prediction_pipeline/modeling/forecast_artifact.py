@@ -0,0 +1,209 @@
+import json
+import os
+from datetime import datetime, timedelta
+import awswrangler as wr
+import boto3
+import pandas as pd
+import streamlit as st
+from botocore.exceptions import ClientError
+from src.config import aws_s3_bucket
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Every published forecast is kept as its own version; the pointer names the latest one
+forecast_folder = 'models/forecasts'
+forecast_versions_folder = f'{forecast_folder}/versions'
+forecast_profiles_folder = f'{forecast_folder}/profiles'
+latest_forecast_pointer_key = f'{forecast_folder}/latest.json'
+
+# The dashboard only runs the inference itself if this is enabled, e.g. for a local setup without the forecast service.
+# The inference pipeline is then imported on first use, so the dashboard replicas do not import it by default.
+local_forecast_fallback = os.getenv('LOCAL_FORECAST_FALLBACK', 'false').lower() in ('1', 'true', 'yes')
+local_forecast_ttl = "3h"
+
+# The service publishes every 3 hours, so an older forecast means that at least two runs failed
+max_forecast_age = timedelta(hours=9)
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def create_forecast_version() -> str:
+    """
+    Create the version name of a forecast from the current time.
+
+    Returns:
+        str: The version name, e.g. '2024-10-18T09-00-00'.
+    """
+    return datetime.now().strftime('%Y-%m-%dT%H-%M-%S')
+
+
+def publish_forecast_artifact(forecast_df: pd.DataFrame, version: str, profile_records: list = None) -> str:
+    """
+    Publish a forecast to AWS S3 as a versioned Parquet file and point the latest forecast pointer to it.
+
+    The Parquet file is written first, so the pointer never names a forecast that does not exist yet.
+
+    Args:
+        forecast_df (pd.DataFrame): The preprocessed visitor predictions per region.
+        version (str): The version name of the forecast.
+        profile_records (list): The pipeline stage records of the run (see pipeline_profiler), stored next to the forecast.
+
+    Returns:
+        str: The S3 path of the published forecast.
+    """
+    forecast_path = f"s3://{aws_s3_bucket}/{forecast_versions_folder}/{version}.parquet"
+    wr.s3.to_parquet(forecast_df, path=forecast_path, index=False)
+
+    pointer = {
+        'version': version,
+        'path': forecast_path,
+        'published_at': datetime.now().isoformat(),
+        'n_rows': len(forecast_df)
+    }
+
+    if profile_records is not None:
+        pointer['profile_key'] = f"{forecast_profiles_folder}/{version}.json"
+        boto3.client('s3').put_object(
+            Bucket=aws_s3_bucket,
+            Key=pointer['profile_key'],
+            Body=json.dumps(profile_records).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+    boto3.client('s3').put_object(
+        Bucket=aws_s3_bucket,
+        Key=latest_forecast_pointer_key,
+        Body=json.dumps(pointer).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+    print(f"Forecast version {version} published under {forecast_path}")
+    return forecast_path
+
+
+@st.cache_data(ttl="5min")
+def get_latest_forecast_pointer() -> dict:
+    """
+    Read the pointer to the latest published forecast.
+
+    Returns:
+        dict: The pointer with the keys 'version', 'path', 'published_at', 'n_rows' and, if the run was profiled, 'profile_key'.
+            None if no forecast was published yet.
+    """
+    try:
+        response = boto3.client('s3').get_object(Bucket=aws_s3_bucket, Key=latest_forecast_pointer_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+    return json.loads(response['Body'].read())
+
+
+@st.cache_data(max_entries=2)
+def load_forecast_version(forecast_path: str) -> pd.DataFrame:
+    """
+    Load one published forecast. A version never changes, so it is cached by its path.
+
+    Args:
+        forecast_path (str): The S3 path of the published forecast.
+
+    Returns:
+        pd.DataFrame: The preprocessed visitor predictions per region.
+    """
+    print(f"Loading the published forecast {forecast_path}")
+    return wr.s3.read_parquet(path=forecast_path)
+
+
+@st.cache_data(max_entries=2)
+def load_forecast_profile(profile_key: str) -> list:
+    """
+    Load the pipeline stage records of one published forecast.
+
+    Args:
+        profile_key (str): The key of the profile in the bucket.
+
+    Returns:
+        list: The pipeline stage records.
+    """
+    response = boto3.client('s3').get_object(Bucket=aws_s3_bucket, Key=profile_key)
+    return json.loads(response['Body'].read())
+
+
+def load_latest_forecast_profile() -> list:
+    """
+    Load the pipeline stage records of the latest published forecast.
+
+    Returns:
+        list: The pipeline stage records, empty if no forecast was published yet or the latest one was not profiled.
+    """
+    pointer = get_latest_forecast_pointer()
+
+    if pointer is None or 'profile_key' not in pointer:
+        return []
+
+    return load_forecast_profile(pointer['profile_key'])
+
+
+@st.cache_data(ttl=local_forecast_ttl, max_entries=1)
+def compute_local_forecast() -> pd.DataFrame:
+    """
+    Run the inference pipeline in the dashboard process, for when no forecast was published yet
+    and the local fallback is enabled.
+
+    Returns:
+        pd.DataFrame: The preprocessed visitor predictions per region for the next 7 days.
+    """
+    from src.prediction_pipeline.sourcing_data.source_visitor_center_data import source_preprocessed_hourly_visitor_center_data
+    from src.prediction_pipeline.modeling.run_inference import compute_inference_predictions
+
+    print(f"No forecast published under {latest_forecast_pointer_key} yet, running the inference locally...")
+    return compute_inference_predictions(source_preprocessed_hourly_visitor_center_data())
+
+
+def get_forecast_age(pointer: dict) -> timedelta:
+    """
+    Get the time since a forecast was published.
+
+    Args:
+        pointer (dict): The pointer to the published forecast.
+
+    Returns:
+        timedelta: The age of the forecast.
+    """
+    return datetime.now() - datetime.fromisoformat(pointer['published_at'])
+
+
+def load_latest_forecast() -> pd.DataFrame:
+    """
+    Load the latest published forecast for the dashboard.
+
+    A warning is shown if the forecast is older than `max_forecast_age`, i.e. the forecast service stopped
+    publishing. If no forecast was published yet (e.g. a new bucket), the forecast is computed locally when
+    `LOCAL_FORECAST_FALLBACK` is set, otherwise the page is stopped with an error.
+
+    Returns:
+        pd.DataFrame: The preprocessed visitor predictions per region for the next 7 days.
+    """
+    pointer = get_latest_forecast_pointer()
+
+    if pointer is None:
+        if local_forecast_fallback:
+            return compute_local_forecast()
+
+        print(f"No forecast published under {latest_forecast_pointer_key} yet and the local fallback is disabled")
+        st.error("No visitor forecast is available yet. Please try again later.")
+        st.stop()
+
+    forecast_age = get_forecast_age(pointer)
+    if forecast_age > max_forecast_age:
+        hours = int(forecast_age.total_seconds() // 3600)
+        print(f"The latest forecast {pointer['version']} was published {hours} hours ago, check the forecast service")
+        st.warning(f"The visitor forecast was last updated {hours} hours ago.")
+
+    return load_forecast_version(pointer['path'])
@@ -0,0 +1,229 @@
+import threading
+import pandas as pd
+from src.prediction_pipeline.pre_processing.weather_zscore_engine import OnlineWeatherZScores
+from src.prediction_pipeline.modeling.source_and_feature_selection import get_transformation_statistics
+from src.prediction_pipeline.modeling.preprocess_inference_features import (
+    join_inference_data, get_stored_inference_features, transform_inference_features, get_holiday_distance_calendar,
+    weather_columns_for_zscores, window_size_for_zscores
+)
+from src.prediction_pipeline.modeling.create_inference_dfs import (
+    get_model_registry_watcher, get_inference_feature_transformer, predict_with_models, preprocess_overall_inference_predictions,
+    inference_backend
+)
+from src.prediction_pipeline.modeling.inference_output_sink import get_inference_output_sink
+from src.prediction_pipeline.modeling.pipeline_profiler import profile_stage
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# State of the last inference run, shared by the whole process
+_state_lock = threading.Lock()
+_state = {}
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_calendar_hash(join_df: pd.DataFrame, weather_columns: list) -> int:
+    """
+    Hash the calendar columns (holidays, opening hours, ...) of the merged inference data.
+
+    Args:
+        join_df (pd.DataFrame): The merged weather and visitor centers data.
+        weather_columns (list): The columns that come from the weather data.
+
+    Returns:
+        int: The hash of the calendar columns.
+    """
+    calendar_columns = [column for column in join_df.columns if column not in weather_columns]
+
+    return int(pd.util.hash_pandas_object(join_df[calendar_columns], index=False).sum())
+
+
+def get_weather_inputs(join_df: pd.DataFrame, weather_data_inference: pd.DataFrame, weather_columns: list) -> pd.DataFrame:
+    """
+    Get the weather columns of the merged inference data in the window of the weather data, indexed by 'Time'.
+
+    Args:
+        join_df (pd.DataFrame): The merged weather and visitor centers data.
+        weather_data_inference (pd.DataFrame): The weather data of the inference run.
+        weather_columns (list): The columns that come from the weather data.
+
+    Returns:
+        pd.DataFrame: The weather inputs of the inference run.
+    """
+    in_window = (join_df['Time'] >= weather_data_inference['Time'].min()) & (join_df['Time'] <= weather_data_inference['Time'].max())
+
+    return join_df.loc[in_window, ['Time'] + weather_columns].set_index('Time')
+
+
+def find_changed_hours(previous_inputs: pd.DataFrame, inputs: pd.DataFrame) -> pd.DatetimeIndex:
+    """
+    Find the hours whose raw inputs differ from the previous run. Missing values are equal to each other.
+
+    Args:
+        previous_inputs (pd.DataFrame): The inputs of the previous run indexed by 'Time'.
+        inputs (pd.DataFrame): The inputs of the current run with the same index and columns.
+
+    Returns:
+        pd.DatetimeIndex: The changed hours.
+    """
+    changed = (previous_inputs != inputs) & ~(previous_inputs.isna() & inputs.isna())
+
+    return inputs.index[changed.any(axis=1).to_numpy()]
+
+
+def align_feature_rows(new_rows: pd.DataFrame, previous_features: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace the rows of the previous feature matrix with the recomputed ones.
+
+    The recomputed rows can miss dummy columns (e.g. a season that is not in them) and can have other
+    categories than the whole matrix, so they get the columns and dtypes of the previous matrix.
+
+    Args:
+        new_rows (pd.DataFrame): The recomputed feature rows indexed by 'Time'.
+        previous_features (pd.DataFrame): The feature matrix of the previous run.
+
+    Returns:
+        pd.DataFrame: The updated feature matrix.
+    """
+    new_rows = new_rows.reindex(columns=previous_features.columns, fill_value=0)
+    features = pd.concat([previous_features.drop(index=new_rows.index), new_rows]).sort_index()
+
+    for column, dtype in previous_features.dtypes.items():
+        features[column] = features[column].astype('category' if isinstance(dtype, pd.CategoricalDtype) else dtype)
+
+    return features
+
+
+def run_full_inference(join_df, inference_inputs, calendar_hash, holiday_distance_calendar, models, feature_transformer, start_time, end_time):
+    """
+    Compute all features and predictions of the inference window and keep them as the new state.
+
+    The features are transformed with the feature transformer of the models. Without one (older training runs),
+    the statistics of the transformations are computed on the inference data. The statistics, the holiday
+    distances and the daily max values of the weather are kept as well, so the next runs compute the changed rows the same way.
+
+    Returns:
+        pd.DataFrame: The predictions indexed by 'Time' with one column per target.
+    """
+    print("Incremental inference: computing all forecast hours...")
+
+    inference_data_with_new_features = get_stored_inference_features(join_df, holiday_distance_calendar)
+    statistics = get_transformation_statistics(inference_data_with_new_features) if feature_transformer is None else None
+
+    zscore_engine = OnlineWeatherZScores(weather_columns_for_zscores, window_size_for_zscores)
+    zscore_engine.update(join_df)
+
+    features = transform_inference_features(inference_data_with_new_features, start_time, end_time, statistics, feature_transformer)
+    predictions = predict_with_models(models, features, store_predictions=False)
+
+    _state.update({
+        'models': models,
+        'window': (start_time, end_time),
+        'calendar_hash': calendar_hash,
+        'inputs': inference_inputs,
+        'statistics': statistics,
+        'feature_transformer': feature_transformer,
+        'holiday_distances': holiday_distance_calendar,
+        'zscore_engine': zscore_engine,
+        'features': features,
+        'predictions': predictions
+    })
+
+    return predictions
+
+
+def run_partial_inference(join_df, inference_inputs, changed_hours, models, start_time, end_time):
+    """
+    Recompute the features and predictions of the hours that depend on the changed hours and update the state.
+
+    The daily max values of the changed dates are updated in the z-score engine of the last full run, which
+    computes the z-scores of the dates whose rolling window contains them again. The holiday distances and the
+    feature transformer or statistics of the last full run are used as well.
+
+    Returns:
+        pd.DataFrame: The predictions indexed by 'Time' with one column per target.
+    """
+    join_df = join_df.copy()
+    join_df['Date'] = join_df['Time'].dt.date
+
+    # The daily max values need all hours of the changed dates
+    changed_dates_df = join_df[join_df['Date'].isin(set(changed_hours.date))]
+    affected_days = _state['zscore_engine'].update(changed_dates_df)
+    print(f"Incremental inference: {len(changed_hours)} hours changed, recomputing {len(affected_days)} days...")
+
+    context_df = join_df[join_df['Time'].dt.floor('D').isin(affected_days)]
+    context_df = context_df.merge(_state['holiday_distances'], on='Date', how='left')
+    context_df = _state['zscore_engine'].add_zscores(context_df)
+
+    new_rows = transform_inference_features(context_df, start_time, end_time, _state['statistics'], _state['feature_transformer'])
+    features = align_feature_rows(new_rows, _state['features'])
+
+    predictions = _state['predictions'].copy()
+    if len(new_rows) > 0:
+        predictions.loc[new_rows.index] = predict_with_models(models, features.loc[new_rows.index], store_predictions=False)
+
+    _state.update({'inputs': inference_inputs, 'features': features, 'predictions': predictions})
+
+    return predictions
+
+
+@profile_stage('incremental_visitor_predictions')
+def incremental_visitor_predictions(weather_data_inference, hourly_visitor_center_data, start_time, end_time):
+    """
+    Make the visitor predictions of the inference window and only recompute the forecast hours whose
+    weather or calendar inputs changed since the previous run.
+
+    All hours are recomputed when there is no previous run, when the inference window moved, when the
+    models changed or when the calendar data changed. The features are transformed with the feature
+    transformer saved with the models; for older models, the statistics of the standardized and cyclic
+    features are fixed at that full run until the next one, so the hours that did not change keep their
+    features and predictions.
+
+    Args:
+        weather_data_inference (pd.DataFrame): The weather data of the inference run.
+        hourly_visitor_center_data (pd.DataFrame): The preprocessed hourly visitor center data.
+        start_time (datetime): The first hour of the inference window.
+        end_time (datetime): The end of the inference window (excluded).
+
+    Returns:
+        pd.DataFrame: The preprocessed visitor predictions per region.
+    """
+    model_version, models = get_model_registry_watcher(inference_backend).get_models()
+    feature_transformer = get_inference_feature_transformer(model_version)
+
+    join_df = join_inference_data(weather_data_inference, hourly_visitor_center_data)
+    weather_columns = [column for column in weather_data_inference.columns if column != 'Time']
+    calendar_hash = get_calendar_hash(join_df, weather_columns)
+    inference_inputs = get_weather_inputs(join_df, weather_data_inference, weather_columns)
+
+    with _state_lock:
+        is_full_run = (
+            not _state
+            or _state['models'] is not models
+            or _state['window'] != (start_time, end_time)
+            or _state['calendar_hash'] != calendar_hash
+            or not _state['inputs'].index.equals(inference_inputs.index)
+            or not _state['inputs'].columns.equals(inference_inputs.columns)
+        )
+
+        if is_full_run:
+            holiday_distance_calendar = get_holiday_distance_calendar(hourly_visitor_center_data)
+            predictions = run_full_inference(join_df, inference_inputs, calendar_hash, holiday_distance_calendar, models,
+                                             feature_transformer, start_time, end_time)
+        else:
+            changed_hours = find_changed_hours(_state['inputs'], inference_inputs)
+            if len(changed_hours) > 0:
+                predictions = run_partial_inference(join_df, inference_inputs, changed_hours, models, start_time, end_time)
+            else:
+                print("Incremental inference: no input changed, keeping the previous predictions")
+                predictions = _state['predictions']
+
+    # Every run is stored, as in the full inference
+    get_inference_output_sink().submit(predictions)
+
+    return preprocess_overall_inference_predictions(predictions)
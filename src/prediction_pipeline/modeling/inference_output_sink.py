@@ -0,0 +1,113 @@
+import queue
+import threading
+from datetime import datetime
+import awswrangler as wr
+import pandas as pd
+from src.config import aws_s3_bucket
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Parquet dataset with the predictions of every inference run, partitioned by run timestamp and region
+inference_outputs_path = f"s3://{aws_s3_bucket}/models/inference_data_outputs/predictions_dataset/"
+partition_columns = ['run_timestamp', 'region']
+
+# Maximum number of inference runs waiting to be written
+max_pending_writes = 16
+
+_sink_lock = threading.Lock()
+_sink = None
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def convert_predictions_to_long_format(overall_predictions: pd.DataFrame, run_timestamp: str) -> pd.DataFrame:
+    """
+    Convert the wide predictions (one column per target) into the long format of the predictions dataset.
+
+    Args:
+        overall_predictions (pd.DataFrame): The predictions indexed by 'Time' with one column per target.
+        run_timestamp (str): The timestamp of the inference run.
+
+    Returns:
+        pd.DataFrame: The predictions with the columns 'Time', 'region', 'predictions' and 'run_timestamp'.
+    """
+    predictions_long = overall_predictions.rename_axis(index='Time', columns='region').stack().rename('predictions').reset_index()
+    predictions_long['run_timestamp'] = run_timestamp
+
+    return predictions_long
+
+
+class InferenceOutputSink:
+    """
+    Writes the inference predictions to AWS S3 in a background thread.
+
+    `submit` only puts the predictions on a queue and returns right away, so the dashboard gets the predictions
+    without waiting for S3. Every inference run is written with one call as a partitioned Parquet dataset.
+    """
+
+    def __init__(self, path: str = inference_outputs_path, max_pending: int = max_pending_writes):
+        self.path = path
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._write_pending_predictions, name='inference-output-sink', daemon=True)
+        self._thread.start()
+
+    def submit(self, overall_predictions: pd.DataFrame, run_timestamp: str = None) -> None:
+        """
+        Queue the predictions of one inference run for writing.
+
+        Args:
+            overall_predictions (pd.DataFrame): The predictions indexed by 'Time' with one column per target.
+            run_timestamp (str): The timestamp of the inference run. Defaults to now.
+        """
+        if run_timestamp is None:
+            run_timestamp = datetime.now().strftime('%Y-%m-%dT%H-%M-%S')
+
+        try:
+            self._queue.put_nowait((overall_predictions.copy(), run_timestamp))
+        except queue.Full:
+            print(f"Predictions of the inference run {run_timestamp} were not stored, too many writes are pending")
+
+    def flush(self) -> None:
+        """
+        Block until all queued predictions are written.
+        """
+        self._queue.join()
+
+    def _write_pending_predictions(self) -> None:
+        while True:
+            overall_predictions, run_timestamp = self._queue.get()
+            try:
+                predictions_long = convert_predictions_to_long_format(overall_predictions, run_timestamp)
+                wr.s3.to_parquet(
+                    predictions_long,
+                    path=self.path,
+                    dataset=True,
+                    mode='append',
+                    partition_cols=partition_columns
+                )
+                print(f"Predictions of the inference run {run_timestamp} stored successfully under {self.path}")
+            except Exception as e:
+                print(f"Error while storing the predictions of the inference run {run_timestamp}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+def get_inference_output_sink() -> InferenceOutputSink:
+    """
+    Get the output sink shared by the whole process.
+
+    Returns:
+        InferenceOutputSink: The output sink.
+    """
+    global _sink
+
+    with _sink_lock:
+        if _sink is None:
+            _sink = InferenceOutputSink()
+
+    return _sink
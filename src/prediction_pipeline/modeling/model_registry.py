@@ -0,0 +1,377 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+from botocore.exceptions import ClientError
+from src.config import aws_s3_bucket
+from src.prediction_pipeline.modeling.model_store import (
+    get_s3_client, get_local_model_path, download_model_to_cache, model_file_formats,
+    default_file_formats, local_model_cache_dir, max_download_workers
+)
+from src.prediction_pipeline.modeling.pipeline_profiler import profile_stage
+from src.prediction_pipeline.modeling.feature_transformer import FeatureTransformer, feature_transformer_file_name
+from src.prediction_pipeline.modeling.flat_forest import OutdatedFlatForestError
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Every training run writes its manifest next to its models; a copy under the registry names the latest run,
+# so the inference resolves the models with one small GET
+manifest_file_name = 'manifest.json'
+latest_manifest_key = 'models/registry/latest.json'
+
+# How often the inference checks the registry for a new training run
+manifest_poll_interval_seconds = 5 * 60
+
+checksum_chunk_size = 8 * 1024 * 1024
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_file_checksum(local_file_path: str) -> str:
+    """
+    Compute the SHA-256 checksum of a local file.
+
+    Args:
+        local_file_path (str): The path of the file.
+
+    Returns:
+        str: The hexadecimal checksum.
+    """
+    checksum = hashlib.sha256()
+    with open(local_file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(checksum_chunk_size), b''):
+            checksum.update(chunk)
+
+    return checksum.hexdigest()
+
+
+def describe_model_file(local_file_path: str, s3_key: str) -> dict:
+    """
+    Describe a model file uploaded to AWS S3 for the manifest.
+
+    Args:
+        local_file_path (str): The local path of the uploaded file.
+        s3_key (str): The key of the file in the bucket.
+
+    Returns:
+        dict: The key, the SHA-256 checksum and the size in bytes of the file.
+    """
+    return {
+        'key': s3_key,
+        'sha256': get_file_checksum(local_file_path),
+        'size_bytes': os.path.getsize(local_file_path)
+    }
+
+
+def create_model_manifest(run_id: str, training_mode: str, folder_prefix: str, feature_schema: dict, model_entries: list,
+                          feature_transformer_file: dict = None) -> dict:
+    """
+    Create the manifest of a training run.
+
+    Args:
+        run_id (str): The UUID of the training run.
+        training_mode (str): 'per_target' or 'multi_output'.
+        folder_prefix (str): The folder of the models within the bucket.
+        feature_schema (dict): The numeric and categorical features the models are trained on, in training order.
+        model_entries (list): One dict per model with the keys 'model_name', 'targets', 'files' and 'metrics'.
+        feature_transformer_file (dict): The key, checksum and size of the saved feature transformer, if any.
+
+    Returns:
+        dict: The manifest.
+    """
+    return {
+        'run_id': run_id,
+        'created_at': datetime.now().isoformat(),
+        'training_mode': training_mode,
+        'folder_prefix': folder_prefix,
+        'feature_schema': feature_schema,
+        'feature_transformer': feature_transformer_file,
+        'models': model_entries
+    }
+
+
+def publish_model_manifest(manifest: dict, set_as_latest: bool = True) -> str:
+    """
+    Write the manifest of a training run next to its models and, optionally, as the latest registry entry.
+
+    The models are uploaded before the manifest, so the registry never names models that do not exist yet.
+
+    Args:
+        manifest (dict): The manifest created by `create_model_manifest`.
+        set_as_latest (bool): Whether the inference should switch to this training run.
+
+    Returns:
+        str: The key of the manifest of the training run.
+    """
+    s3 = get_s3_client()
+    body = json.dumps(manifest, indent=2).encode('utf-8')
+
+    manifest_key = f"{manifest['folder_prefix']}{manifest_file_name}"
+    s3.put_object(Bucket=aws_s3_bucket, Key=manifest_key, Body=body, ContentType='application/json')
+    print(f"Model manifest saved in AWS S3 under {manifest_key}")
+
+    if set_as_latest:
+        s3.put_object(Bucket=aws_s3_bucket, Key=latest_manifest_key, Body=body, ContentType='application/json')
+        print(f"Training run {manifest['run_id']} registered as the latest models")
+
+    return manifest_key
+
+
+def read_manifest(manifest_key: str, bucket_name: str = aws_s3_bucket):
+    """
+    Read a manifest from the bucket.
+
+    Args:
+        manifest_key (str): The key of the manifest in the bucket.
+        bucket_name (str): The name of the S3 bucket.
+
+    Returns:
+        dict: The manifest, or None if it does not exist.
+    """
+    try:
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=manifest_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+    return json.loads(response['Body'].read())
+
+
+def get_latest_manifest(bucket_name: str = aws_s3_bucket):
+    """
+    Read the manifest of the latest registered training run.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+
+    Returns:
+        dict: The manifest, or None if no training run is registered yet.
+    """
+    return read_manifest(latest_manifest_key, bucket_name)
+
+
+def get_run_manifest(folder_prefix: str, bucket_name: str = aws_s3_bucket):
+    """
+    Read the manifest saved next to the models of a training run.
+
+    Args:
+        folder_prefix (str): The folder of the models within the bucket, e.g. 'models/models_trained/<uuid>/'.
+        bucket_name (str): The name of the S3 bucket.
+
+    Returns:
+        dict: The manifest, or None for training runs saved without one.
+    """
+    return read_manifest(f"{folder_prefix}{manifest_file_name}", bucket_name)
+
+
+def select_manifest_models(manifest: dict, model_names: list):
+    """
+    Restrict a manifest to some of its models.
+
+    Args:
+        manifest (dict): The manifest of the training run.
+        model_names (list): The names of the models to keep, in the order in which they are loaded.
+
+    Returns:
+        dict: A copy of the manifest with only these models, or None if one of them is not in the manifest.
+    """
+    model_entries = {model_entry['model_name']: model_entry for model_entry in manifest['models']}
+    if any(model_name not in model_entries for model_name in model_names):
+        return None
+
+    return {**manifest, 'models': [model_entries[model_name] for model_name in model_names]}
+
+
+def load_feature_transformer(folder_prefix: str, bucket_name: str = aws_s3_bucket):
+    """
+    Read the feature transformer saved next to the models of a training run.
+
+    Args:
+        folder_prefix (str): The folder of the models within the bucket, e.g. 'models/models_trained/<uuid>/'.
+        bucket_name (str): The name of the S3 bucket.
+
+    Returns:
+        FeatureTransformer: The transformer, or None for training runs saved without one.
+    """
+    try:
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=f"{folder_prefix}{feature_transformer_file_name}")
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+    return FeatureTransformer.from_dict(json.loads(response['Body'].read()))
+
+
+def fetch_registered_model(bucket_name: str, run_id: str, model_entry: dict, cache_dir: str = local_model_cache_dir, file_formats: tuple = default_file_formats):
+    """
+    Fetch a model listed in a manifest, either from the local cache or from S3, and deserialize it.
+
+    The local copy is keyed by the checksum of the manifest, so no HEAD request is needed, and a
+    downloaded file is only kept if its checksum matches.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        run_id (str): The UUID of the training run.
+        model_entry (dict): The entry of the model in the manifest.
+        cache_dir (str): The local cache folder.
+        file_formats (tuple): The names of the file formats in `model_file_formats`, in order of preference.
+
+    Returns:
+        object: The deserialized model.
+    """
+    model_name = model_entry['model_name']
+
+    for file_format in file_formats:
+        model_file = model_entry['files'].get(file_format)
+        if model_file is None:
+            continue
+
+        file_extension, load_model_file = model_file_formats[file_format]
+        local_model_path = get_local_model_path(cache_dir, run_id, model_name, model_file['sha256'], file_extension)
+
+        if os.path.exists(local_model_path):
+            print(f"Loading the trained model {model_name} from the local cache {local_model_path}")
+        else:
+            print(f"Retrieving the trained model {model_name} saved under AWS S3 in bucket {bucket_name} with key {model_file['key']}")
+            download_model_to_cache(get_s3_client(), bucket_name, model_file['key'], local_model_path)
+
+            if get_file_checksum(local_model_path) != model_file['sha256']:
+                os.remove(local_model_path)
+                raise ValueError(f"The checksum of {model_file['key']} does not match the manifest of the training run {run_id}")
+
+        try:
+            return load_model_file(local_model_path)
+        except OutdatedFlatForestError as e:
+            print(f"Skipping the {file_format} file of the trained model {model_name}: {e}")
+
+    raise FileNotFoundError(f"No file of the formats {file_formats} in the manifest for the trained model {model_name}")
+
+
+@profile_stage('load_registered_models')
+def load_registered_models(manifest: dict, bucket_name: str = aws_s3_bucket, cache_dir: str = local_model_cache_dir) -> dict:
+    """
+    Fetch and deserialize all models of a manifest at the same time with a thread pool.
+
+    Args:
+        manifest (dict): The manifest of the training run.
+        bucket_name (str): The name of the S3 bucket.
+        cache_dir (str): The local cache folder.
+
+    Returns:
+        dict: A dictionary with the model names as keys and the loaded models as values, in the order of the manifest.
+    """
+    with ThreadPoolExecutor(max_workers=max_download_workers) as executor:
+        futures = {
+            model_entry['model_name']: executor.submit(fetch_registered_model, bucket_name, manifest['run_id'], model_entry, cache_dir)
+            for model_entry in manifest['models']
+        }
+
+        loaded_models = {model_name: future.result() for model_name, future in futures.items()}
+
+    return loaded_models
+
+
+def warm_up_models(models: dict, feature_schema: dict) -> None:
+    """
+    Run one prediction with every model, so memory-mapped pages and lazy initializations are loaded
+    before the models serve the first inference.
+
+    Args:
+        models (dict): A dictionary of models where keys are model names and values are the models.
+        feature_schema (dict): The numeric and categorical features of the manifest.
+    """
+    schema_features = feature_schema['numeric_features'] + feature_schema['categorical_features']
+
+    for model in models.values():
+        # feature_names_in_ is an array, so it is compared with None instead of tested for truth
+        model_feature_names = getattr(model, 'feature_names_in_', None)
+        feature_names = list(model_feature_names) if model_feature_names is not None else schema_features
+        model.predict(pd.DataFrame(0.0, index=[0], columns=feature_names))
+
+
+class ModelRegistryWatcher:
+    """
+    Keeps the models of the latest registered training run loaded and swaps them without a redeploy.
+
+    A background thread reads the latest manifest every `poll_interval_seconds`. When it names a new
+    training run, the new models are downloaded, prepared (e.g. compiled) and warmed up in that thread
+    while the current models keep serving, and are only then switched over. If no training run is
+    registered, the models are loaded with `load_fallback_models`.
+    """
+
+    def __init__(self, prepare_models, load_fallback_models, poll_interval_seconds: float = manifest_poll_interval_seconds):
+        """
+        Args:
+            prepare_models (callable): Turns the loaded models into the models used for inference.
+            load_fallback_models (callable): Returns the version and the models when no training run is registered.
+            poll_interval_seconds (float): How often the registry is checked.
+        """
+        self._prepare_models = prepare_models
+        self._load_fallback_models = load_fallback_models
+        self._poll_interval_seconds = poll_interval_seconds
+        self._refresh_lock = threading.Lock()
+        self._active = None
+        self._thread = threading.Thread(target=self._poll_registry, name='model-registry-watcher', daemon=True)
+        self._thread.start()
+
+    def get_models(self) -> tuple:
+        """
+        Get the active models. The first call loads them, and falls back to `load_fallback_models` if the
+        registered training run cannot be loaded.
+
+        Returns:
+            tuple: The version (training run UUID) and the dictionary of models.
+        """
+        if self._active is None:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error while loading the registered models, loading the fallback models: {e}")
+                with self._refresh_lock:
+                    if self._active is None:
+                        self._active = self._load_fallback_models()
+
+        return self._active
+
+    def refresh(self) -> None:
+        """
+        Switch to the latest registered training run if it is not the active one.
+        """
+        with self._refresh_lock:
+            manifest = get_latest_manifest()
+
+            if manifest is None:
+                if self._active is None:
+                    self._active = self._load_fallback_models()
+                return
+
+            if self._active is not None and self._active[0] == manifest['run_id']:
+                return
+
+            print(f"Loading the models of the training run {manifest['run_id']}...")
+            models = self._prepare_models(load_registered_models(manifest))
+            warm_up_models(models, manifest['feature_schema'])
+
+            # Replace the whole tuple at once, so readers get either the old or the new models
+            self._active = (manifest['run_id'], models)
+            print(f"Switched to the models of the training run {manifest['run_id']}")
+
+    def _poll_registry(self) -> None:
+        while True:
+            time.sleep(self._poll_interval_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error while checking the model registry, keeping the current models: {e}")
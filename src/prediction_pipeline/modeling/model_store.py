@@ -0,0 +1,240 @@
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import joblib
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from src.prediction_pipeline.modeling.flat_forest import FlatForestRegressor, OutdatedFlatForestError, flat_model_file_extension
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Local folder where downloaded models are kept between container restarts
+local_model_cache_dir = os.path.join('outputs', 'model_cache')
+
+# Number of models that are downloaded and deserialized at the same time
+max_download_workers = 8
+
+# Model file formats with their file extension and loader. The flat node-array format is memory-mapped
+# read-only, so several processes share the same pages; the pickle is the fallback for older training runs.
+model_file_formats = {
+    'flat': (flat_model_file_extension, FlatForestRegressor.load),
+    'pickle': ('.pkl', joblib.load),
+}
+default_file_formats = ('flat', 'pickle')
+
+# Lock and holder for the S3 client that is shared by all downloads of the process
+_s3_client_lock = threading.Lock()
+_s3_client = None
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_s3_client():
+    """
+    Get the S3 client shared by the whole process.
+
+    boto3 clients are thread-safe, so one client with a connection pool as large as the
+    number of download workers is reused for every model instead of creating a new client per model.
+
+    Returns:
+        botocore.client.S3: The pooled S3 client.
+    """
+    global _s3_client
+
+    with _s3_client_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                's3',
+                config=Config(max_pool_connections=max_download_workers, retries={'max_attempts': 5, 'mode': 'standard'})
+            )
+
+    return _s3_client
+
+
+def get_run_id_from_folder_prefix(folder_prefix: str) -> str:
+    """
+    Get the training run UUID from the S3 folder prefix of the models.
+
+    Args:
+        folder_prefix (str): The folder path within the bucket, e.g. 'models/models_trained/<uuid>/'.
+
+    Returns:
+        str: The run UUID (last folder of the prefix).
+    """
+    return folder_prefix.rstrip('/').split('/')[-1]
+
+
+def get_local_model_path(cache_dir: str, run_id: str, model_name: str, etag: str, file_extension: str = '.pkl') -> str:
+    """
+    Build the local cache path of a model. The path is keyed by the run UUID and the ETag of the S3 object
+    (or the checksum from the model manifest), so a model that is overwritten on S3 is never served from a stale local copy.
+
+    Args:
+        cache_dir (str): The local cache folder.
+        run_id (str): The training run UUID.
+        model_name (str): The name of the model.
+        etag (str): The ETag of the S3 object or the SHA-256 checksum of the file.
+        file_extension (str): The file extension of the model file.
+
+    Returns:
+        str: The local path of the cached model.
+    """
+    etag = etag.strip('"')
+    return os.path.join(cache_dir, run_id, f"{model_name}-{etag}{file_extension}")
+
+
+def download_model_to_cache(s3, bucket_name: str, s3_key: str, local_model_path: str) -> None:
+    """
+    Download a model file from S3 into the local cache. The file is first written under a temporary
+    name and renamed afterwards, so a crash during the download never leaves a broken model in the cache.
+
+    Args:
+        s3 (botocore.client.S3): The S3 client.
+        bucket_name (str): The name of the S3 bucket.
+        s3_key (str): The key of the model in the bucket.
+        local_model_path (str): The local path where the model is stored.
+
+    Returns:
+        None
+    """
+    os.makedirs(os.path.dirname(local_model_path), exist_ok=True)
+
+    temporary_path = f"{local_model_path}.{threading.get_ident()}.part"
+    s3.download_file(bucket_name, s3_key, temporary_path)
+    os.replace(temporary_path, local_model_path)
+
+
+def get_object_etag(s3, bucket_name: str, s3_key: str):
+    """
+    Get the ETag of an S3 object with a HEAD request.
+
+    Args:
+        s3 (botocore.client.S3): The S3 client.
+        bucket_name (str): The name of the S3 bucket.
+        s3_key (str): The key of the object in the bucket.
+
+    Returns:
+        str: The ETag of the object, or None if the object does not exist.
+    """
+    try:
+        return s3.head_object(Bucket=bucket_name, Key=s3_key)['ETag']
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+
+def get_newest_cached_model_path(cache_dir: str, run_id: str, model_name: str, file_extension: str):
+    """
+    Get the most recently cached copy of a model, whatever its ETag or checksum.
+
+    Args:
+        cache_dir (str): The local cache folder.
+        run_id (str): The training run UUID.
+        model_name (str): The name of the model.
+        file_extension (str): The file extension of the model file.
+
+    Returns:
+        str: The local path of the newest cached model, or None if the model was never cached.
+    """
+    cached_paths = glob.glob(os.path.join(glob.escape(os.path.join(cache_dir, run_id)), f"{glob.escape(model_name)}-*{file_extension}"))
+    if not cached_paths:
+        return None
+
+    return max(cached_paths, key=os.path.getmtime)
+
+
+def fetch_model(bucket_name: str, folder_prefix: str, model_name: str, cache_dir: str = local_model_cache_dir, file_formats: tuple = default_file_formats):
+    """
+    Fetch a single model, either from the local cache or from S3, and deserialize it.
+    The file formats are tried in order and the first one that exists on S3 and can be loaded is used.
+
+    Models listed in a manifest are loaded with `model_registry.fetch_registered_model` instead, which needs no HEAD request.
+    If the HEAD request fails (e.g. S3 cannot be reached), the newest cached copy of the model is used.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        folder_prefix (str): The folder path within the bucket.
+        model_name (str): The name of the model.
+        cache_dir (str): The local cache folder.
+        file_formats (tuple): The names of the file formats in `model_file_formats`, in order of preference.
+
+    Returns:
+        object: The deserialized model.
+    """
+    s3 = get_s3_client()
+    run_id = get_run_id_from_folder_prefix(folder_prefix)
+    head_error = None
+
+    for file_format in file_formats:
+        file_extension, load_model_file = model_file_formats[file_format]
+        s3_key = folder_prefix + model_name + file_extension
+
+        # A HEAD request is enough to know whether the local copy is still valid
+        try:
+            etag = get_object_etag(s3, bucket_name, s3_key)
+        except (BotoCoreError, ClientError) as e:
+            local_model_path = get_newest_cached_model_path(cache_dir, run_id, model_name, file_extension)
+            if local_model_path is None:
+                print(f"Could not check the {file_format} file of the trained model {model_name} on S3 and it is not cached: {e}")
+                head_error = e
+                continue
+
+            print(f"Could not check the {file_format} file of the trained model {model_name} on S3, using its newest cached copy: {e}")
+        else:
+            if etag is None:
+                print(f"No {file_format} file for the trained model {model_name} under {s3_key}")
+                continue
+
+            local_model_path = get_local_model_path(cache_dir, run_id, model_name, etag, file_extension)
+
+        if os.path.exists(local_model_path):
+            print(f"Loading the trained model {model_name} from the local cache {local_model_path}")
+        else:
+            print(f"Retrieving the trained model {model_name} saved under AWS S3 in bucket {bucket_name} with key {s3_key}")
+            download_model_to_cache(s3, bucket_name, s3_key, local_model_path)
+
+        try:
+            return load_model_file(local_model_path)
+        except OutdatedFlatForestError as e:
+            print(f"Skipping the {file_format} file of the trained model {model_name}: {e}")
+
+    if head_error is not None:
+        raise head_error
+
+    raise FileNotFoundError(f"No file of the formats {file_formats} found for the trained model {model_name} under {folder_prefix}")
+
+
+def load_models_concurrently(bucket_name: str, folder_prefix: str, models_names: list, cache_dir: str = local_model_cache_dir, file_formats: tuple = default_file_formats) -> dict:
+    """
+    Fetch and deserialize several models at the same time with a thread pool.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        folder_prefix (str): The folder path within the bucket.
+        models_names (list): List of model names.
+        cache_dir (str): The local cache folder.
+        file_formats (tuple): The names of the file formats in `model_file_formats`, in order of preference.
+
+    Returns:
+        dict: A dictionary with the model names as keys and the loaded models as values,
+              in the same order as `models_names`.
+    """
+    with ThreadPoolExecutor(max_workers=max_download_workers) as executor:
+        futures = {
+            model_name: executor.submit(fetch_model, bucket_name, folder_prefix, model_name, cache_dir, file_formats)
+            for model_name in models_names
+        }
+
+        # Keep the order of the model names so that the predictions are always built in the same order
+        loaded_models = {model_name: future.result() for model_name, future in futures.items()}
+
+    return loaded_models
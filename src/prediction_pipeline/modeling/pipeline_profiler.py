@@ -0,0 +1,222 @@
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Number of stage records kept in memory
+max_stage_records = 1000
+
+_records_lock = threading.Lock()
+_stage_records = deque(maxlen=max_stage_records)
+
+# Stack of the running stages of every thread, so the cache marker knows which stage it belongs to
+_local = threading.local()
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of the process since it started. It is a value of the whole process,
+    not of the stage that records it.
+
+    Returns:
+        float: The peak RSS in MB.
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak_rss / 1e6 if sys.platform == 'darwin' else peak_rss / 1e3
+
+
+def get_current_rss_mb() -> float:
+    """
+    Get the current resident set size of the process from /proc (Linux only).
+
+    Returns:
+        float: The current RSS in MB, or None if /proc is not available (e.g. macOS).
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def count_rows(result) -> int:
+    """
+    Count the rows processed by a stage from its result.
+
+    Args:
+        result: The result of the stage.
+
+    Returns:
+        int: The number of rows of a DataFrame, the number of entries of a dict (e.g. models), or None.
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series, dict, list)):
+        return len(result)
+
+    return None
+
+
+def profile_stage(stage_name: str, cached: bool = False):
+    """
+    Decorator that records the wall time, the change of the current RSS, the rows processed and, for cached functions,
+    the cache hit or miss of a pipeline stage. The change of the RSS includes the allocations of other threads running
+    at the same time; the peak RSS of the whole process is recorded next to it.
+
+    For a cached function, put this decorator above the cache decorator and `mark_cache_miss` below it:
+    the function body only runs on a cache miss.
+
+    Args:
+        stage_name (str): The name of the stage in the records.
+        cached (bool): Whether the function is cached with st.cache_data or st.cache_resource.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = getattr(_local, 'stack', None)
+            if stack is None:
+                stack = _local.stack = []
+
+            parent = stack[-1]['name'] if stack else None
+            stage = {'name': stage_name, 'cache': 'hit' if cached else None}
+            stack.append(stage)
+
+            started_at = time.time()
+            started_rss_mb = get_current_rss_mb()
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                stack.pop()
+
+            record = {
+                'stage': stage_name,
+                'parent': parent,
+                'started_at': datetime.fromtimestamp(started_at).isoformat(),
+                'start_us': int(started_at * 1e6),
+                'wall_time_ms': (time.perf_counter() - started) * 1000,
+                'rss_delta_mb': None if started_rss_mb is None else get_current_rss_mb() - started_rss_mb,
+                'process_peak_rss_mb': get_peak_rss_mb(),
+                'rows': count_rows(result),
+                'cache': stage['cache'],
+                'pid': os.getpid(),
+                'thread_id': threading.get_ident()
+            }
+            with _records_lock:
+                _stage_records.append(record)
+
+            # Structured log line, one JSON object per stage
+            print(json.dumps({'event': 'pipeline_stage', **record}))
+
+            return result
+        return wrapper
+    return decorator
+
+
+def mark_cache_miss(func):
+    """
+    Decorator for the body of a cached function: marks the running stage as a cache miss.
+
+    Args:
+        func (callable): The function body, below the cache decorator.
+
+    Returns:
+        callable: The decorated function.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = getattr(_local, 'stack', None)
+        if stack:
+            stack[-1]['cache'] = 'miss'
+
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def get_stage_records() -> list:
+    """
+    Get the stage records kept in memory, oldest first.
+
+    Returns:
+        list: The stage records.
+    """
+    with _records_lock:
+        return list(_stage_records)
+
+
+def clear_stage_records() -> None:
+    """
+    Remove all stage records kept in memory, e.g. at the start of a new forecast run.
+    """
+    with _records_lock:
+        _stage_records.clear()
+
+
+def to_chrome_trace(records: list) -> dict:
+    """
+    Convert stage records into the Chrome trace event format, which can be opened in chrome://tracing or Perfetto.
+
+    Args:
+        records (list): The stage records.
+
+    Returns:
+        dict: The Chrome trace.
+    """
+    trace_events = [
+        {
+            'name': record['stage'],
+            'cat': 'inference_pipeline',
+            'ph': 'X',
+            'ts': record['start_us'],
+            'dur': int(record['wall_time_ms'] * 1000),
+            'pid': record['pid'],
+            'tid': record['thread_id'],
+            'args': {key: record.get(key) for key in ('rows', 'cache', 'rss_delta_mb', 'process_peak_rss_mb')}
+        }
+        for record in records
+    ]
+
+    return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(path: str, records: list = None) -> str:
+    """
+    Write stage records as a Chrome trace JSON file.
+
+    Args:
+        path (str): The local path of the file.
+        records (list): The stage records. Defaults to the records kept in memory.
+
+    Returns:
+        str: The path of the file.
+    """
+    if records is None:
+        records = get_stage_records()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(to_chrome_trace(records), file)
+
+    print(f"Chrome trace of {len(records)} pipeline stages saved under {path}")
+    return path
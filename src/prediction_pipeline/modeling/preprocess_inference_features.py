@@ -1,6 +1,15 @@
-from src.prediction_pipeline.pre_processing.features_zscoreweather_distanceholidays import add_nearest_holiday_distance, add_daily_max_values, add_moving_z_scores 
+from src.prediction_pipeline.pre_processing.features_zscoreweather_distanceholidays import (
+    add_nearest_holiday_distance, get_holiday_distance_table, holiday_distance_columns
+)
+from src.prediction_pipeline.pre_processing.weather_zscore_engine import add_daily_max_zscores
+from src.prediction_pipeline.pre_processing.column_schema import enforce_column_schema, column_schema_version
 from src.prediction_pipeline.modeling.source_and_feature_selection import process_transformations
+from src.prediction_pipeline.modeling.pipeline_profiler import profile_stage, mark_cache_miss
+from src.prediction_pipeline.modeling.feature_store import get_or_compute_features
+from src.prediction_pipeline.modeling.create_inference_dfs import get_inference_feature_transformer
+from src.prediction_pipeline.sourcing_data.weather_cache import historical_delay
 
+import threading
 from datetime import datetime, timedelta
 import pandas as pd
 import streamlit as st
@@ -10,6 +19,15 @@ import streamlit as st
 weather_columns_for_zscores = ['Temperature (°C)', 'Relative Humidity (%)', 'Wind Speed (km/h)']
 window_size_for_zscores = 5
 
+# The columns you want to bring from visitor_centers_data
+visitor_center_columns = ['Time','Tag', 'Hour', 'Monat','Wochentag',  'Wochenende',  'Jahreszeit',  'Laubfärbung',
+                'Schulferien_Bayern', 'Schulferien_CZ','Feiertag_Bayern',  'Feiertag_CZ',
+                'HEH_geoeffnet',  'HZW_geoeffnet',  'WGM_geoeffnet', 'Lusenschutzhaus_geoeffnet',  'Racheldiensthuette_geoeffnet', 'Falkensteinschutzhaus_geoeffnet', 'Schwellhaeusl_geoeffnet']
+
+# Holiday distances of the whole visitor center calendar, computed again only when the calendar changes
+_holiday_calendar_lock = threading.Lock()
+_holiday_calendar = {}
+
 def join_inference_data(weather_data_inference, visitor_centers_data):
 
     """Merge weather data with visitor centers data.
@@ -19,49 +37,107 @@ def join_inference_data(weather_data_inference, visitor_centers_data):
         visitor_centers_data (pd.DataFrame): DataFrame containing visitor centers data.
 
     Returns:
-        pd.DataFrame: Merged DataFrame with selected columns from visitor centers data.
+        pd.DataFrame: Merged DataFrame with selected columns from visitor centers data, with the dtypes of the column schema.
     """
 
-    # Define the columns you want to bring from visitor_centers_data
-    columns_to_add = ['Time','Tag', 'Hour', 'Monat','Wochentag',  'Wochenende',  'Jahreszeit',  'Laubfärbung',
-                    'Schulferien_Bayern', 'Schulferien_CZ','Feiertag_Bayern',  'Feiertag_CZ',
-                    'HEH_geoeffnet',  'HZW_geoeffnet',  'WGM_geoeffnet', 'Lusenschutzhaus_geoeffnet',  'Racheldiensthuette_geoeffnet', 'Falkensteinschutzhaus_geoeffnet', 'Schwellhaeusl_geoeffnet']  
-
     # Perform the merge, keep the min and max values of the visitor center data
-    merged_data = visitor_centers_data[columns_to_add].merge(weather_data_inference, on='Time', how='left')
+    merged_data = visitor_centers_data[visitor_center_columns].merge(weather_data_inference, on='Time', how='left')
     
-    return merged_data
+    return enforce_column_schema(merged_data)
 
-@st.cache_data(max_entries=1)
-def source_preprocess_inference_data(weather_data_inference, hourly_visitor_center_data, start_time, end_time):
+def get_holiday_distance_calendar(visitor_centers_data):
 
-    """Source and preprocess inference data from weather and visitor center sources.
+    """Get the distances to the nearest holidays for every date of the visitor centers data.
 
-    This function fetches weather and visitor center data, merges them, and computes additional features
-    such as nearest holiday distance, daily max values, and moving z-scores.
+    The distances are computed on the whole calendar, like in the training data, and not only on the
+    inference window. The table is kept until the holidays of the calendar change.
+
+    Args:
+        visitor_centers_data (pd.DataFrame): DataFrame containing visitor centers data.
 
     Returns:
-        pd.DataFrame: DataFrame containing preprocessed inference data.
+        pd.DataFrame: One row per date with the column 'Date' and the holiday distance columns.
     """
-    print(f"Sourcing and preprocessing inference data at {datetime.now()}...")    
 
-    join_df = join_inference_data(weather_data_inference, hourly_visitor_center_data)
+    calendar = visitor_centers_data[['Time'] + list(holiday_distance_columns)]
+    calendar_hash = int(pd.util.hash_pandas_object(calendar, index=False).sum())
+
+    with _holiday_calendar_lock:
+        if _holiday_calendar.get('hash') != calendar_hash:
+            _holiday_calendar.update({'hash': calendar_hash, 'table': get_holiday_distance_table(calendar)})
+
+        return _holiday_calendar['table']
 
+def add_inference_features(join_df, holiday_distance_calendar=None):
+
+    """Add the nearest holiday distances, the daily max values and the moving z-scores of the weather columns.
+
+    Args:
+        join_df (pd.DataFrame): The merged weather and visitor centers data.
+        holiday_distance_calendar (pd.DataFrame): The table returned by get_holiday_distance_calendar.
+            If None, the distances are computed from the holidays of join_df.
+
+    Returns:
+        pd.DataFrame: DataFrame with the new features and a 'Date' column.
+    """
 
     # Get z scores for the weather columns
-    inference_data_with_distances = add_nearest_holiday_distance(join_df)
+    inference_data_with_distances = add_nearest_holiday_distance(join_df, holiday_distance_calendar)
 
 
-    inference_data_with_daily_max = add_daily_max_values(inference_data_with_distances, weather_columns_for_zscores)
+    inference_data_with_new_features = add_daily_max_zscores(inference_data_with_distances,
+                                                             weather_columns_for_zscores,
+                                                             window_size_for_zscores)
 
-    inference_data_with_new_features = add_moving_z_scores(inference_data_with_daily_max, 
-                                                           weather_columns_for_zscores, 
-                                                           window_size_for_zscores)
+    return inference_data_with_new_features
 
+def get_stored_inference_features(join_df, holiday_distance_calendar):
+
+    """Get the features of add_inference_features from the feature store and compute only the hours that are not final yet.
+
+    The hours older than the delay after which the weather is final are read from the store. The newer hours and the
+    hours that were never stored are computed with the days before them that are in the window of their z-scores.
+    The stored hours are computed again when the visitor centers data or the column schema changes.
+
+    Args:
+        join_df (pd.DataFrame): The merged weather and visitor centers data.
+        holiday_distance_calendar (pd.DataFrame): The table returned by get_holiday_distance_calendar.
+
+    Returns:
+        pd.DataFrame: The same DataFrame as add_inference_features.
+    """
+
+    def compute_features(first_hour, last_hour):
+        context_start = first_hour.floor('D') - timedelta(days=window_size_for_zscores)
+        context_df = join_df[(join_df['Time'] >= context_start) & (join_df['Time'] <= last_hour)].copy()
+
+        return add_inference_features(context_df, holiday_distance_calendar)
+
+    calendar_version = f"{column_schema_version}-{int(pd.util.hash_pandas_object(join_df[visitor_center_columns], index=False).sum())}"
+
+    return get_or_compute_features(
+        'inference', join_df['Time'].min(), join_df['Time'].max(), compute_features,
+        recompute_from=datetime.now() - historical_delay, version=calendar_version
+    )
+
+def transform_inference_features(inference_data_with_new_features, start_time, end_time, statistics=None, feature_transformer=None):
+
+    """Apply the transformations of the training dataset and keep the rows of the inference window.
+
+    Args:
+        inference_data_with_new_features (pd.DataFrame): DataFrame returned by add_inference_features.
+        start_time (datetime): The first hour of the inference window.
+        end_time (datetime): The end of the inference window (excluded).
+        statistics (dict): The statistics of the cyclic and standardized features (see get_transformation_statistics).
+            If None, they are computed on the given DataFrame. Only used without a feature transformer.
+        feature_transformer (FeatureTransformer): The transformer saved with the models (see get_inference_feature_transformer).
+
+    Returns:
+        pd.DataFrame: DataFrame containing preprocessed inference data indexed by 'Time'.
+    """
 
-    
     # Apply the cyclic and categorical trasformations from the training dataset (same as the training dataset)
-    inference_data_with_coco_encoding = process_transformations(inference_data_with_new_features)
+    inference_data_with_coco_encoding = process_transformations(inference_data_with_new_features, statistics, feature_transformer)
 
     # Slice the data to keep only rows within the next 10 days
     inference_data_with_coco_encoding = inference_data_with_coco_encoding[
@@ -76,4 +152,30 @@ def source_preprocess_inference_data(weather_data_inference, hourly_visitor_cent
     inference_data_with_coco_encoding = inference_data_with_coco_encoding.drop(columns=['Date'])
 
     
-    return inference_data_with_coco_encoding
\ No newline at end of file
+    return inference_data_with_coco_encoding
+
+@profile_stage('source_preprocess_inference_data', cached=True)
+@st.cache_data(max_entries=1)
+@mark_cache_miss
+def source_preprocess_inference_data(weather_data_inference, hourly_visitor_center_data, start_time, end_time, model_version=None):
+
+    """Source and preprocess inference data from weather and visitor center sources.
+
+    This function fetches weather and visitor center data, merges them, and computes additional features
+    such as nearest holiday distance, daily max values, and moving z-scores. The features are transformed
+    with the feature transformer of the models of `model_version`.
+
+    Returns:
+        pd.DataFrame: DataFrame containing preprocessed inference data.
+    """
+    print(f"Sourcing and preprocessing inference data at {datetime.now()}...")    
+
+    join_df = join_inference_data(weather_data_inference, hourly_visitor_center_data)
+
+    holiday_distance_calendar = get_holiday_distance_calendar(hourly_visitor_center_data)
+
+    inference_data_with_new_features = get_stored_inference_features(join_df, holiday_distance_calendar)
+
+    feature_transformer = get_inference_feature_transformer(model_version) if model_version is not None else None
+
+    return transform_inference_features(inference_data_with_new_features, start_time, end_time, feature_transformer=feature_transformer)
@@ -0,0 +1,94 @@
+"""
+Batch entry point of the forecast service. Runs the full inference pipeline (weather sourcing, feature building,
+model loading and prediction) outside of the Streamlit process and publishes a versioned forecast artifact to AWS S3.
+The dashboard pages only read the latest artifact.
+
+Usage:
+- Run `python -m src.prediction_pipeline.modeling.publish_forecast` from the root of the repository to publish
+  a new forecast every `refresh_interval_hours` hours.
+- Add `--once` to publish a single forecast, e.g. when the service is triggered by cron.
+
+While it runs, the service also records the real-time parking readings in the parking snapshot log every 15 minutes.
+It is the only writer of the log; the dashboard replicas only read it.
+"""
+
+import argparse
+import time
+from datetime import datetime
+from src.prediction_pipeline.sourcing_data.source_visitor_center_data import source_preprocessed_hourly_visitor_center_data
+from src.prediction_pipeline.modeling.run_inference import compute_inference_predictions
+from src.prediction_pipeline.modeling.inference_output_sink import get_inference_output_sink
+from src.prediction_pipeline.modeling.forecast_artifact import create_forecast_version, publish_forecast_artifact
+from src.prediction_pipeline.modeling.pipeline_profiler import clear_stage_records, get_stage_records
+from src.streamlit_app.parking_occupancy_poller import ParkingOccupancyPoller
+from src.streamlit_app.source_data import fetch_and_record_realtime_parking_data
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Same refresh interval as the former in-dashboard inference
+refresh_interval_hours = 3
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def run_forecast_once() -> str:
+    """
+    Run the inference pipeline once and publish the forecast.
+
+    Returns:
+        str: The version of the published forecast.
+    """
+    version = create_forecast_version()
+    print(f"Running the forecast service for version {version} at {datetime.now()}...")
+
+    # Keep only the stage records of this run, they are published with the forecast
+    clear_stage_records()
+
+    preprocessed_hourly_visitor_center_data = source_preprocessed_hourly_visitor_center_data()
+
+    forecast_df = compute_inference_predictions(preprocessed_hourly_visitor_center_data)
+
+    publish_forecast_artifact(forecast_df, version, profile_records=get_stage_records())
+
+    # Make sure the raw predictions are stored before the process can exit
+    get_inference_output_sink().flush()
+
+    return version
+
+def run_forecast_service(interval_hours: float) -> None:
+    """
+    Publish a new forecast every `interval_hours` hours. A failed run is logged and retried at the next interval.
+    The parking readings are recorded in a background thread in the meantime.
+
+    Args:
+        interval_hours (float): The interval between two forecasts in hours.
+    """
+    ParkingOccupancyPoller(fetch_and_record_realtime_parking_data)
+
+    while True:
+        started = time.monotonic()
+        try:
+            run_forecast_once()
+        except Exception as e:
+            print(f"Error while running the forecast service: {e}")
+
+        time.sleep(max(0.0, interval_hours * 3600 - (time.monotonic() - started)))
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Publish the visitor forecasts for the dashboard.")
+    parser.add_argument('--once', action='store_true', help="Publish one forecast and exit.")
+    parser.add_argument('--interval-hours', type=float, default=refresh_interval_hours, help="Hours between two forecasts.")
+    args = parser.parse_args()
+
+    if args.once:
+        run_forecast_once()
+    else:
+        run_forecast_service(args.interval_hours)
+
+
+if __name__ == '__main__':
+    main()
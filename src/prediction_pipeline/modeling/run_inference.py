@@ -5,50 +5,86 @@ from datetime import datetime
 
 # imports for inference dataframe
 from src.prediction_pipeline.modeling.preprocess_inference_features import source_preprocess_inference_data
-from src.prediction_pipeline.modeling.create_inference_dfs import visitor_predictions
-from src.prediction_pipeline.sourcing_data.source_weather import source_weather_data
+from src.prediction_pipeline.modeling.create_inference_dfs import visitor_predictions, get_active_model_version, inference_backend
+from src.prediction_pipeline.modeling.incremental_inference import incremental_visitor_predictions
+from src.prediction_pipeline.sourcing_data.weather_service import get_weather_service
+from src.prediction_pipeline.modeling.pipeline_profiler import profile_stage
 
 
-@st.fragment(run_every="3h")
-def run_inference(preprocessed_hourly_visitor_center_data):
+# Inference mode: 'full' recomputes every forecast hour, 'incremental' only the hours whose inputs changed since the last run
+inference_mode = 'incremental'
+
+
+def get_today_midnight_berlin():
+    """
+    Get today at 00:00 in Berlin time (CET or CEST).
+
+    Returns:
+        datetime: Today at 00:00 as a naive datetime.
+    """
+    # Set the timezone to Berlin (CET or CEST)
+    berlin_tz = pytz.timezone('Europe/Berlin')
+    
+    # Get the current time in Berlin
+    now_berlin = datetime.now(berlin_tz)
+    
+    # Replace the hour, minute, second, and microsecond with 0 to get today at 00:00
+    day_today_berlin = now_berlin.date()
+
+    # Convert day_today_berlin to datetime
+    day_today_berlin = datetime.combine(day_today_berlin, datetime.min.time())
+    
+    return day_today_berlin
+
+
+@profile_stage('run_inference')
+def compute_inference_predictions(preprocessed_hourly_visitor_center_data):
 
     """
-    Run the inference pipeline. Fetches the latest weather forecasts, preprocesses data, and makes predictions.
+    Run the inference pipeline outside of any Streamlit fragment. Fetches the latest weather forecasts, preprocesses data, and makes predictions.
 
     Args:
         preprocessed_hourly_visitor_center_data (pd.DataFrame): The preprocessed hourly visitor center data.
 
     Returns:
-        None
+        pd.DataFrame: The preprocessed visitor predictions per region for the next 7 days.
     """
 
     # get the weather data for inference
-    def get_today_midnight_berlin():
-        # Set the timezone to Berlin (CET or CEST)
-        berlin_tz = pytz.timezone('Europe/Berlin')
-        
-        # Get the current time in Berlin
-        now_berlin = datetime.now(berlin_tz)
-        
-        # Replace the hour, minute, second, and microsecond with 0 to get today at 00:00
-        day_today_berlin = now_berlin.date()
-
-        # Convert day_today_berlin to datetime
-        day_today_berlin = datetime.combine(day_today_berlin, datetime.min.time())
-        
-        return day_today_berlin
-
     today = get_today_midnight_berlin()
     start_inference_time = today - pd.Timedelta(days=10)
     end_inference_time = today + pd.Timedelta(days=7)
     print(f"Running inference part from {start_inference_time} to {end_inference_time}...")
 
-    weather_data_inference = source_weather_data(start_time=start_inference_time, end_time=end_inference_time)
+    # The weather service shares its fetch with the weather forecast of the dashboard
+    weather_data_inference = get_weather_service().get_model_features(start_inference_time, end_inference_time)
+
+    if inference_mode == 'incremental':
+        return incremental_visitor_predictions(weather_data_inference, preprocessed_hourly_visitor_center_data, start_time=today, end_time=end_inference_time)
 
-    # preprocess the inference data
-    inference_df = source_preprocess_inference_data(weather_data_inference, preprocessed_hourly_visitor_center_data, start_time=today, end_time=end_inference_time)
+    # preprocess the inference data with the feature transformer of the active models
+    model_version = get_active_model_version(inference_backend)
+    inference_df = source_preprocess_inference_data(weather_data_inference, preprocessed_hourly_visitor_center_data, start_time=today, end_time=end_inference_time, model_version=model_version)
 
     # make predictions
-    overall_visitor_predictions = visitor_predictions(inference_df) 
+    overall_visitor_predictions = visitor_predictions(inference_df, model_version)
+
+    return overall_visitor_predictions
+
+
+@st.fragment(run_every="3h")
+def run_inference(preprocessed_hourly_visitor_center_data):
+
+    """
+    Run the inference pipeline inside the Streamlit process. Fetches the latest weather forecasts, preprocesses data, and makes predictions.
+
+    The dashboard pages read the forecast published by `publish_forecast` instead; this is kept for local runs.
+
+    Args:
+        preprocessed_hourly_visitor_center_data (pd.DataFrame): The preprocessed hourly visitor center data.
+
+    Returns:
+        pd.DataFrame: The preprocessed visitor predictions per region for the next 7 days.
+    """
 
-    return overall_visitor_predictions
\ No newline at end of file
+    return compute_inference_predictions(preprocessed_hourly_visitor_center_data)
@@ -2,6 +2,8 @@ import awswrangler as wr
 import pandas as pd
 import numpy as np
 import warnings
+from src.prediction_pipeline.modeling.feature_transformer import FeatureTransformer, cyclic_periods, standardize_features
+from src.prediction_pipeline.pre_processing.column_schema import enforce_column_schema, model_flag_dtype, weekdays
 
 
 warnings.filterwarnings("ignore")
@@ -78,92 +80,6 @@ regionwise_sensor_mapping = {
     }
 }
 
-
-
-dtype_dict = {
-    'datetime64[ns]': [
-        'Time'
-    ],
-    
-    'float64': [
-        'traffic_abs',
-        'Temperature (°C)',
-        'Relative Humidity (%)',
-        'Wind Speed (km/h)',
-        'Monat',
-        'sum_IN_abs',
-        'sum_OUT_abs',
-        
-        # traffic data
-        'Falkenstein-Schwellhäusl IN',
-        'Rachel-Spiegelau IN',
-        'Nationalparkzentrum Falkenstein IN',
-        'Nationalparkzentrum Lusen IN',
-        'Lusen-Mauth-Finsterau IN',
-        'Scheuereck-Schachten-Trinkwassertalsperre IN',
-        'Falkenstein-Schwellhäusl OUT',
-        'Rachel-Spiegelau OUT',
-        'Nationalparkzentrum Falkenstein OUT',
-        'Nationalparkzentrum Lusen OUT',
-        'Lusen-Mauth-Finsterau OUT',
-        'Scheuereck-Schachten-Trinkwassertalsperre OUT',
-        'Bayerisch Eisenstein IN', 'Bayerisch Eisenstein OUT',
-        'Brechhäuslau IN', 'Brechhäuslau OUT',
-        'Deffernik IN', 'Deffernik OUT',
-        'Diensthüttenstraße IN', 'Diensthüttenstraße OUT',
-        'Felswandergebiet IN', 'Felswandergebiet OUT',
-        'Ferdinandsthal IN', 'Ferdinandsthal OUT',
-        'Fredenbrücke IN', 'Fredenbrücke OUT',
-        'Gfäll IN', 'Gfäll OUT',
-        'Gsenget IN', 'Gsenget OUT',
-        'Klingenbrunner Wald IN', 'Klingenbrunner Wald OUT',
-        'Klosterfilz IN', 'Klosterfilz OUT',
-        'Racheldiensthütte IN', 'Racheldiensthütte OUT',
-        'Sagwassersäge IN', 'Sagwassersäge OUT',
-        'Scheuereck IN', 'Scheuereck OUT',
-        'Schillerstraße IN', 'Schillerstraße OUT',
-        'Schwarzbachbrücke IN', 'Schwarzbachbrücke OUT',
-        'Falkenstein 1 IN', 'Falkenstein 1 OUT',
-        'Falkenstein 2 IN', 'Falkenstein 2 OUT',
-        'Lusen 1 IN', 'Lusen 1 OUT',
-        'Lusen 2 IN', 'Lusen 2 OUT',
-        'Lusen 3 IN', 'Lusen 3 OUT',
-        'Waldhausreibe IN', 'Waldhausreibe OUT',
-        'Waldspielgelände IN', 'Waldspielgelände OUT',
-        'Wistlberg IN', 'Wistlberg OUT',
-        'Bucina IN', 'Bucina OUT',
-        'Trinkwassertalsperre IN', 'Trinkwassertalsperre OUT',
-        
-        # Z-Score data
-        'ZScore_Daily_Max_Temperature (°C)',
-        'ZScore_Daily_Max_Relative Humidity (%)',
-        'ZScore_Daily_Max_Wind Speed (km/h)',
-        
-        # Distance to nearest holidays
-        'Distance_to_Nearest_Holiday_Bayern',
-        'Distance_to_Nearest_Holiday_CZ'
-    ],
-    
-    'category': [
-        'Wochentag',
-        'Wochenende',
-        'Jahreszeit',
-        'Laubfärbung',
-        'Feiertag_Bayern',
-        'Feiertag_CZ',
-        'HEH_geoeffnet',
-        'HZW_geoeffnet',
-        'WGM_geoeffnet',
-        'Lusenschutzhaus_geoeffnet',
-        'Racheldiensthuette_geoeffnet',
-        'Falkensteinschutzhaus_geoeffnet',
-        'Schwellhaeusl_geoeffnet',
-        'Schulferien_Bayern',
-        'Schulferien_CZ',
-        'coco_2'
-    ]
-}
-
 numeric_features_for_modelling = ['Temperature (°C)', 'Relative Humidity (%)', 'Wind Speed (km/h)', 'ZScore_Daily_Max_Temperature (°C)', 
                     'ZScore_Daily_Max_Relative Humidity (%)','ZScore_Daily_Max_Wind Speed (km/h)',
                     'Distance_to_Nearest_Holiday_Bayern','Distance_to_Nearest_Holiday_CZ','Tag_sin', 'Tag_cos', 'Monat_sin', 'Monat_cos',
@@ -181,6 +97,24 @@ target_vars_et = ['traffic_abs', 'sum_IN_abs', 'sum_OUT_abs', 'Lusen-Mauth-Finst
                'Scheuereck-Schachten-Trinkwassertalsperre IN', 'Scheuereck-Schachten-Trinkwassertalsperre OUT', 
                'Nationalparkzentrum Falkenstein IN', 'Nationalparkzentrum Falkenstein OUT']
 
+# Features transformed by process_transformations, the standardized features are defined with the feature transformer
+cyclic_features = list(cyclic_periods)
+
+# Models trained before the feature transformer was saved were trained and served on the category codes of the
+# months and of the alphabetically sorted weekdays, and on categorical flags (see to_legacy_dtypes)
+legacy_cyclic_dtypes = {
+    'Monat': pd.CategoricalDtype(list(range(1, 13))),
+    'Wochentag': pd.CategoricalDtype(sorted(weekdays))
+}
+
+# Columns that process_transformations needs to produce the features for modelling
+engineered_feature_columns = cyclic_features + standardize_features + [
+    'ZScore_Daily_Max_Temperature (°C)', 'ZScore_Daily_Max_Relative Humidity (%)', 'ZScore_Daily_Max_Wind Speed (km/h)',
+    'Jahreszeit', 'coco_2', 'Wochenende', 'Laubfärbung', 'Schulferien_Bayern', 'Schulferien_CZ', 'Feiertag_Bayern', 'Feiertag_CZ',
+    'HEH_geoeffnet', 'HZW_geoeffnet', 'WGM_geoeffnet', 'Lusenschutzhaus_geoeffnet', 'Racheldiensthuette_geoeffnet',
+    'Falkensteinschutzhaus_geoeffnet', 'Schwellhaeusl_geoeffnet'
+]
+
 coco_mapping = {
     1: [1, 2],       # Clear, Fair
     2: [3, 4, 5],    # Cloudy, Overcast, Fog
@@ -265,17 +199,16 @@ def merge_new_features(df: pd.DataFrame, df_newfeatures: pd.DataFrame) -> pd.Dat
 
     return df
 
-# Change datatypes based on dtype_dict
-def change_datatypes(df: pd.DataFrame, dtype_dict: dict) -> pd.DataFrame:
-    """Change column datatypes based on dtype_dict."""
-    for dtype, columns in dtype_dict.items():
-        df[columns] = df[columns].astype(dtype)
+# Change datatypes based on the column schema
+def change_datatypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Change the column datatypes to the ones of the column schema (see column_schema)."""
+    df = enforce_column_schema(df)
 
     # set time as the index
     df = df.set_index('Time')
     return df
 
-def apply_cliclic_tranformations(df: pd.DataFrame,cyclic_features: list) -> pd.DataFrame:
+def apply_cliclic_tranformations(df: pd.DataFrame,cyclic_features: list, max_values: dict = None) -> pd.DataFrame:
 
     # Convert categorical features to numeric if they are not already
     for feature in cyclic_features:
@@ -283,7 +216,8 @@ def apply_cliclic_tranformations(df: pd.DataFrame,cyclic_features: list) -> pd.D
             if pd.api.types.is_categorical_dtype(df[feature]):
                 df[feature] = df[feature].cat.codes  # Convert categorical to numeric codes
             
-            max_value = df[feature].max()  # Get max value for scaling
+            # Get max value for scaling, unless it was computed beforehand
+            max_value = df[feature].max() if max_values is None else max_values[feature]
             
             # Apply sine and cosine transformations
             df[f'{feature}_sin'] = np.sin(2 * np.pi * df[feature] / max_value)
@@ -296,13 +230,16 @@ def apply_cliclic_tranformations(df: pd.DataFrame,cyclic_features: list) -> pd.D
 
     return df
 
-def standardize_numeric_features(df: pd.DataFrame, standardize_features: list) -> pd.DataFrame: 
+def standardize_numeric_features(df: pd.DataFrame, standardize_features: list, mean_std_values: dict = None) -> pd.DataFrame: 
 
     # Loop through each numeric feature and apply z-score normalization
     for feature in standardize_features:
         if feature in df.columns:
-            mean_value = df[feature].mean()  # Calculate mean
-            std_value = df[feature].std()    # Calculate standard deviation
+            if mean_std_values is None:
+                mean_value = df[feature].mean()  # Calculate mean
+                std_value = df[feature].std()    # Calculate standard deviation
+            else:
+                mean_value, std_value = mean_std_values[feature]
             
             # Apply z-score normalization
             df[feature] = (df[feature] - mean_value) / std_value
@@ -311,6 +248,41 @@ def standardize_numeric_features(df: pd.DataFrame, standardize_features: list) -
 
     return df
 
+def to_legacy_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the features to the dtypes the models trained without a feature transformer were served on.
+
+    Args:
+        df (pd.DataFrame): The DataFrame with the dtypes of the column schema.
+
+    Returns:
+        pd.DataFrame: The DataFrame with the legacy categories of 'Monat' and 'Wochentag' and float64 numeric features.
+    """
+    legacy_dtypes = {column: 'float64' for column in df.select_dtypes(include=['float32', 'UInt8', 'UInt16']).columns}
+    legacy_dtypes.update({column: dtype for column, dtype in legacy_cyclic_dtypes.items() if column in df.columns})
+
+    return df.astype(legacy_dtypes)
+
+def get_transformation_statistics(df: pd.DataFrame) -> dict:
+    """Compute the statistics used by process_transformations, so they can be reused for a subset of the rows.
+
+    Args:
+        df (pd.DataFrame): The DataFrame the transformations are applied to.
+
+    Returns:
+        dict: The max value of every cyclic feature under 'max_values' and the mean and standard deviation
+            of every standardized feature under 'mean_std_values'.
+    """
+    df = to_legacy_dtypes(enforce_column_schema(df))
+
+    max_values = {}
+    for feature in cyclic_features:
+        if feature in df.columns:
+            values = df[feature].cat.codes if pd.api.types.is_categorical_dtype(df[feature]) else df[feature]
+            max_values[feature] = values.max()
+
+    mean_std_values = {feature: (df[feature].mean(), df[feature].std()) for feature in standardize_features if feature in df.columns}
+
+    return {'max_values': max_values, 'mean_std_values': mean_std_values}
 
 
        
@@ -355,17 +327,15 @@ def get_dummy_encodings(df: pd.DataFrame, columns_to_use: list) -> pd.DataFrame:
     # Return the dataframe with original and new dummy-encoded columns
     return df_copy
 
-def handle_binary_values(df: pd.DataFrame) -> pd.DataFrame:
+def handle_binary_values(df: pd.DataFrame, legacy: bool = False) -> pd.DataFrame:
 
-    boolean_columns = df.select_dtypes(include=['bool']).columns  # Select boolean columns
-    df[boolean_columns] = df[boolean_columns].astype(int)  # Convert to int
+    # Convert the flags and the dummy columns to the uint8 of the model inputs (see column_schema)
+    boolean_columns = df.select_dtypes(include=['bool', 'boolean']).columns
+    df[boolean_columns] = df[boolean_columns].astype(model_flag_dtype)
 
-    # convert the columns with True and False to 1 and 0 and convert the int64 datatype to category
-    df = df.replace({True: 1, False: 0})
-    # convert the int64 datatype to category
-    boolean_columns = df.select_dtypes(include=['int64']).columns
-    # Convert these columns to categorical
-    df[boolean_columns] = df[boolean_columns].astype('category')
+    if legacy:
+        # The models trained without a feature transformer got the flags as categories of 0 and 1
+        df[boolean_columns] = df[boolean_columns].astype('int64').astype('category')
 
     return df
 
@@ -378,13 +348,29 @@ def remove_merge_from_columns(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
-def process_transformations(df: pd.DataFrame) -> pd.DataFrame:
-    """Process the transformations on the DataFrame."""
-    df = apply_cliclic_tranformations(df, cyclic_features = ['Tag','Hour', 'Monat', 'Wochentag'])
-    df = standardize_numeric_features(df, standardize_features = ['Temperature (°C)', 'Relative Humidity (%)', 'Wind Speed (km/h)',
-                                                                  'Distance_to_Nearest_Holiday_Bayern','Distance_to_Nearest_Holiday_CZ'])
+def process_transformations(df: pd.DataFrame, statistics: dict = None, feature_transformer: FeatureTransformer = None) -> pd.DataFrame:
+    """Process the transformations on the DataFrame.
+
+    The cyclic and standardized features are transformed with the feature transformer fitted on the training
+    data. Without a transformer (models trained before it was saved), the statistics of the cyclic and
+    standardized features are computed on the DataFrame itself, unless they are given (see get_transformation_statistics).
+    The columns are cast to the column schema first, so the categories and dummy columns do not depend on the rows.
+    Without a transformer, the months, weekdays and flags keep the encodings those models were trained on (see to_legacy_dtypes).
+    """
+    df = enforce_column_schema(df)
+
+    if feature_transformer is not None:
+        df = feature_transformer.transform(df)
+    else:
+        if statistics is None:
+            statistics = {'max_values': None, 'mean_std_values': None}
+
+        df = to_legacy_dtypes(df)
+        df = apply_cliclic_tranformations(df, cyclic_features, statistics['max_values'])
+        df = standardize_numeric_features(df, standardize_features, statistics['mean_std_values'])
+
     df = get_dummy_encodings(df, columns_to_use = ['Jahreszeit', 'coco_2'])
-    df = handle_binary_values(df)
+    df = handle_binary_values(df, legacy=feature_transformer is None)
     
     return df
 
@@ -397,21 +383,45 @@ def filter_features_for_modelling(df: pd.DataFrame) -> pd.DataFrame:
 
 
 
-def get_features(with_zscores_and_nearest_holidays_df, train_start_date, train_end_date):
-    
+def get_engineered_features(with_zscores_and_nearest_holidays_df, train_start_date, train_end_date):
+    """Get the engineered features and targets of the training period, before the transformations of process_transformations.
+
+    These features do not depend on the statistics of the period, so they can be stored per hour (see feature_store).
+
+    Returns:
+        pd.DataFrame: The columns of `engineered_feature_columns` and the targets, indexed by 'Time'.
+    """
     # Filter only for certain dates
     sliced_df = with_zscores_and_nearest_holidays_df[(with_zscores_and_nearest_holidays_df['Time'] >= train_start_date) & (with_zscores_and_nearest_holidays_df['Time'] <= train_end_date)]
 
     # Further feature engineering
     removed_merged_df = remove_merge_from_columns(sliced_df)
     regionwise_df = get_regionwise_IN_and_OUT_columns(removed_merged_df)
-    changed_datatypes_df = change_datatypes(regionwise_df, dtype_dict)
-    processed_features_df = process_transformations(changed_datatypes_df)
+    changed_datatypes_df = change_datatypes(regionwise_df)
+
+    return changed_datatypes_df[engineered_feature_columns + target_vars_et]
+
+def transform_engineered_features(engineered_features_df):
+    """Fit the feature transformer on the engineered features, apply the transformations and keep the features for modelling.
+
+    Returns:
+        tuple: The features for modelling and the fitted FeatureTransformer, which is saved next to the models.
+    """
+    feature_transformer = FeatureTransformer().fit(engineered_features_df)
+    processed_features_df = process_transformations(engineered_features_df, feature_transformer=feature_transformer)
 
     # Filter only for the features for modelling
     filtered_features_df = filter_features_for_modelling(processed_features_df)
 
-    return filtered_features_df
+    return filtered_features_df, feature_transformer
 
+def get_features(with_zscores_and_nearest_holidays_df, train_start_date, train_end_date):
+    """Get the features for modelling of the training period.
+
+    Returns:
+        tuple: The features for modelling indexed by 'Time' and the FeatureTransformer fitted on them.
+    """
 
+    engineered_features_df = get_engineered_features(with_zscores_and_nearest_holidays_df, train_start_date, train_end_date)
 
+    return transform_engineered_features(engineered_features_df)
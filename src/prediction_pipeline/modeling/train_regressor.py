@@ -1,18 +1,36 @@
 import pandas as pd
-from src.prediction_pipeline.modeling.source_and_feature_selection import get_features
 from pycaret import *
 from pycaret.time_series import *
 from pycaret.regression import *
 import os
 import awswrangler as wr
 import uuid
+import numpy as np
+from sklearn.ensemble import ExtraTreesRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from src.config import aws_s3_bucket
+from src.prediction_pipeline.modeling.flat_forest import save_flat_forest, flat_model_file_extension
+from src.prediction_pipeline.modeling.model_registry import describe_model_file, create_model_manifest, publish_model_manifest
+from src.prediction_pipeline.modeling.feature_transformer import FeatureTransformer, feature_transformer_file_name
 
 
 save_path_models = 'models/models_trained'
 save_path_predictions = 'models/test_data_predictions'
 local_path = os.path.join('outputs','models_trained')
 
+# Training modes: one Extra Trees Regressor per target or one native multi-output Extra Trees Regressor for all targets
+training_modes = ['per_target', 'multi_output']
+multi_output_model_name = 'extra_trees_multi_output'
+
+# Date ranges for training and testing
+train_start = '2023-01-01'
+train_end = '2024-04-30'
+test_start = '2024-05-01'
+test_end = '2024-07-21'
+
+# Same seed as the PyCaret session so both training modes are comparable
+random_seed = 123
+
 # Define target columns
 target_vars_et  = ['traffic_abs', 'sum_IN_abs', 'sum_OUT_abs', 'Lusen-Mauth-Finsterau IN', 'Lusen-Mauth-Finsterau OUT', 
                'Nationalparkzentrum Lusen IN', 'Nationalparkzentrum Lusen OUT', 'Rachel-Spiegelau IN', 'Rachel-Spiegelau OUT', 
@@ -60,18 +78,38 @@ def save_predictions_to_aws_s3(df: pd.DataFrame, save_path_predictions: str, fil
     print(f"Predictions for test data saved in AWS S3 under {aws_s3_path}")
     return
 
-def save_models_to_aws_s3(model, save_path_models: str, model_name: str, local_path: str, uuid: str) -> None:
+def get_test_metrics(y_true: pd.Series, y_pred: pd.Series) -> dict:
+    """Compute the accuracy metrics of one target on the test data.
+
+    Args:
+        y_true (pd.Series): The true values.
+        y_pred (pd.Series): The predicted values.
+
+    Returns:
+        dict: The MAE, RMSE and R2.
+    """
+    return {
+        'MAE': float(mean_absolute_error(y_true, y_pred)),
+        'RMSE': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'R2': float(r2_score(y_true, y_pred))
+    }
+
+def save_models_to_aws_s3(model, save_path_models: str, model_name: str, local_path: str, uuid: str, export_flat_model: bool = True) -> dict:
     """Save the model to AWS S3.
 
+    Next to the pickle, the model is exported in the flat node-array format, which the inference
+    can memory-map read-only instead of unpickling a copy of the forest in every process.
+
     Args:
         model: The model to save.
         save_path_models (str): The path to the CSV files on AWS S3.
         model_name (str): The name of the model.
         local_path (str): The local path to the model.
         uuid (str): The unique identifier string.
+        export_flat_model (bool): Whether to also save the model in the flat node-array format.
 
     Returns:
-        None
+        dict: The key, checksum and size of every uploaded file by file format, for the model manifest.
     """
 
     # make the save path if it does not exist
@@ -81,27 +119,67 @@ def save_models_to_aws_s3(model, save_path_models: str, model_name: str, local_p
     save_model_path = os.path.join(local_path, model_name)
     save_model(model, save_model_path, model_only=True)
 
-    save_path_aws = f"s3://{aws_s3_bucket}/{save_path_models}/{uuid}/{model_name}.pkl"
+    save_key = f"{save_path_models}/{uuid}/{model_name}.pkl"
+    save_path_aws = f"s3://{aws_s3_bucket}/{save_key}"
 
     wr.s3.upload(f"{save_model_path}.pkl",save_path_aws)
     print(f"Model saved in AWS S3 under {save_path_aws}")
-    return
+    model_files = {'pickle': describe_model_file(f"{save_model_path}.pkl", save_key)}
 
-def train_regressor(feature_dataframe: pd.DataFrame) -> None:
+    if export_flat_model:
+        save_flat_model_path = f"{save_model_path}{flat_model_file_extension}"
+        save_flat_forest(model, save_flat_model_path)
 
-    uuid = create_uuid()
-    print(f"Training Regressor with Run ID: {uuid}")
+        save_flat_key = f"{save_path_models}/{uuid}/{model_name}{flat_model_file_extension}"
+        save_flat_path_aws = f"s3://{aws_s3_bucket}/{save_flat_key}"
+        wr.s3.upload(save_flat_model_path, save_flat_path_aws)
+        print(f"Flat model saved in AWS S3 under {save_flat_path_aws}")
+        model_files['flat'] = describe_model_file(save_flat_model_path, save_flat_key)
+
+    return model_files
+
+def save_feature_transformer_to_aws_s3(feature_transformer: FeatureTransformer, save_path_models: str, local_path: str, uuid: str) -> dict:
+    """Save the feature transformer next to the models of the training run in AWS S3.
+
+    Args:
+        feature_transformer (FeatureTransformer): The transformer fitted on the training features.
+        save_path_models (str): The path to the models on AWS S3.
+        local_path (str): The local path to the models.
+        uuid (str): The unique identifier string.
+
+    Returns:
+        dict: The key, checksum and size of the uploaded file, for the model manifest.
+    """
+    os.makedirs(local_path, exist_ok=True)
+
+    save_transformer_path = os.path.join(local_path, feature_transformer_file_name)
+    feature_transformer.save(save_transformer_path)
+
+    save_key = f"{save_path_models}/{uuid}/{feature_transformer_file_name}"
+    save_path_aws = f"s3://{aws_s3_bucket}/{save_key}"
+
+    wr.s3.upload(save_transformer_path, save_path_aws)
+    print(f"Feature transformer saved in AWS S3 under {save_path_aws}")
+
+    return describe_model_file(save_transformer_path, save_key)
+
+def train_per_target_regressors(feature_dataframe: pd.DataFrame, uuid: str) -> list:
+    """Train one Extra Trees Regressor per target variable with PyCaret and save the models and test predictions to AWS S3.
+
+    Args:
+        feature_dataframe (pd.DataFrame): The feature DataFrame with a DatetimeIndex.
+        uuid (str): The unique identifier string of the training run.
+
+    Returns:
+        list: The manifest entries of the saved models.
+    """
+    model_entries = []
 
     for target in target_vars_et:
         print(f"Training Extra Trees Regressor for {target}")
     
         # Ensure the DataFrame has a date-time index
         if isinstance(feature_dataframe.index, pd.DatetimeIndex):
-            # Define date ranges for training, testing, and unseen data
-            train_start = '2023-01-01'
-            train_end = '2024-04-30'
-            test_start = '2024-05-01'
-            test_end = '2024-07-21'
     
             # Split the data into train, test, and unseen sets based on date ranges
             df_train = feature_dataframe[numeric_features+categorical_features+[target]].loc[train_start:train_end]
@@ -115,7 +193,7 @@ def train_regressor(feature_dataframe: pd.DataFrame) -> None:
                             fold=5,
                             preprocess=False,
                             data_split_shuffle=True,
-                            session_id=123,
+                            session_id=random_seed,
                             test_data=df_test)  # Use 90% of data for training 
                 
             # Train the Extra Trees Regressor model
@@ -128,14 +206,134 @@ def train_regressor(feature_dataframe: pd.DataFrame) -> None:
             final_model = finalize_model(extra_trees_model)
             
             # save the model in aws s3
-            save_models_to_aws_s3(final_model, save_path_models, 
+            model_files = save_models_to_aws_s3(final_model, save_path_models, 
                                   f"extra_trees_{target}",local_path, uuid)
             print(f"Model with {target} saved to AWS S3")
 
+            model_entries.append({
+                'model_name': f"extra_trees_{target}",
+                'targets': [target],
+                'files': model_files,
+                'metrics': {target: get_test_metrics(predictions[target], predictions['prediction_label'])}
+            })
+
             
             # save predictions to aws s3
             file_name = f"y_test_predicted_{target}.parquet"
             save_predictions_to_aws_s3(predictions, save_path_predictions,file_name, uuid)
             print(f"Predictions with {target} saved to AWS S3")
 
-    return
\ No newline at end of file
+    return model_entries
+
+def fit_multi_output_regressor(df_train: pd.DataFrame) -> ExtraTreesRegressor:
+    """Fit one native multi-output Extra Trees Regressor over all target variables.
+
+    PyCaret only supports a single target, so the scikit-learn estimator is used directly with
+    the same defaults that PyCaret uses for 'et'.
+
+    Args:
+        df_train (pd.DataFrame): The training data with the features and all target columns.
+
+    Returns:
+        ExtraTreesRegressor: The fitted multi-output model. The order of its outputs is stored in `target_names_`.
+    """
+    model = ExtraTreesRegressor(random_state=random_seed, n_jobs=-1)
+    model.fit(df_train[numeric_features + categorical_features], df_train[target_vars_et])
+
+    # Keep the order of the outputs with the model, so inference can map the columns back to the targets
+    model.target_names_ = list(target_vars_et)
+
+    return model
+
+def train_multi_output_regressor(feature_dataframe: pd.DataFrame, uuid: str) -> list:
+    """Train one multi-output Extra Trees Regressor for all target variables and save the model and test predictions to AWS S3.
+
+    Args:
+        feature_dataframe (pd.DataFrame): The feature DataFrame with a DatetimeIndex.
+        uuid (str): The unique identifier string of the training run.
+
+    Returns:
+        list: The manifest entry of the saved model.
+    """
+    print(f"Training multi-output Extra Trees Regressor for {len(target_vars_et)} targets")
+
+    if not isinstance(feature_dataframe.index, pd.DatetimeIndex):
+        return []
+
+    # Drop rows with a missing target, as the multi-output model needs all targets per row
+    df_model = feature_dataframe[numeric_features + categorical_features + target_vars_et].dropna(subset=target_vars_et)
+    df_train = df_model.loc[train_start:train_end]
+    df_test = df_model.loc[test_start:test_end]
+
+    # Evaluate on the hold-out data
+    extra_trees_model = fit_multi_output_regressor(df_train)
+    predictions = pd.DataFrame(
+        np.asarray(extra_trees_model.predict(df_test[numeric_features + categorical_features])),
+        index=df_test.index,
+        columns=[f"prediction_{target}" for target in target_vars_et]
+    )
+    predictions = pd.concat([df_test[target_vars_et], predictions], axis=1)
+
+    # Finalize the model on the train and test data, the same way PyCaret does it
+    final_model = fit_multi_output_regressor(pd.concat([df_train, df_test]))
+
+    model_files = save_models_to_aws_s3(final_model, save_path_models, multi_output_model_name, local_path, uuid)
+    print("Multi-output model saved to AWS S3")
+
+    save_predictions_to_aws_s3(predictions, save_path_predictions, f"y_test_predicted_{multi_output_model_name}.parquet", uuid)
+    print("Predictions of the multi-output model saved to AWS S3")
+
+    model_entry = {
+        'model_name': multi_output_model_name,
+        'targets': list(target_vars_et),
+        'files': model_files,
+        'metrics': {target: get_test_metrics(predictions[target], predictions[f"prediction_{target}"]) for target in target_vars_et}
+    }
+
+    return [model_entry]
+
+def train_regressor(feature_dataframe: pd.DataFrame, training_mode: str = 'per_target', register_as_latest: bool = True,
+                    feature_transformer: FeatureTransformer = None) -> None:
+    """Train the Extra Trees Regressors for the visitor count targets and write the manifest of the training run.
+
+    Args:
+        feature_dataframe (pd.DataFrame): The feature DataFrame with a DatetimeIndex.
+        training_mode (str): 'per_target' trains one model per target variable,
+            'multi_output' trains one native multi-output model for all target variables.
+        register_as_latest (bool): Whether the inference should switch to the new models.
+        feature_transformer (FeatureTransformer): The transformer fitted on the training features (see get_features).
+            It is saved next to the models, so the inference transforms its features the same way.
+
+    Returns:
+        None
+    """
+    if training_mode not in training_modes:
+        raise ValueError(f"Unknown training mode '{training_mode}'. Choose one of {training_modes}.")
+
+    uuid = create_uuid()
+    print(f"Training Regressor with Run ID: {uuid}")
+
+    if training_mode == 'multi_output':
+        model_entries = train_multi_output_regressor(feature_dataframe, uuid)
+    else:
+        model_entries = train_per_target_regressors(feature_dataframe, uuid)
+
+    if not model_entries:
+        print("No model was trained, the training run is not registered")
+        return
+
+    feature_transformer_file = None
+    if feature_transformer is not None:
+        feature_transformer_file = save_feature_transformer_to_aws_s3(feature_transformer, save_path_models, local_path, uuid)
+
+    manifest = create_model_manifest(
+        run_id=uuid,
+        training_mode=training_mode,
+        folder_prefix=f"{save_path_models}/{uuid}/",
+        feature_schema={'numeric_features': numeric_features, 'categorical_features': categorical_features},
+        model_entries=model_entries,
+        feature_transformer_file=feature_transformer_file
+    )
+    publish_model_manifest(manifest, set_as_latest=register_as_latest)
+
+    return
@@ -0,0 +1,132 @@
+"""
+Benchmark the shared German date parser against the row-by-row regex parser that was used before in the
+preprocessing of the visitor counts, the data quality check and the data retrieval.
+
+Usage:
+- Run `python -m src.prediction_pipeline.pre_processing.benchmark_german_date_parser` from the root of the repository.
+
+Output:
+- A table with the parsing time of both parsers for several numbers of rows, and whether both parsers give
+  the same dates. The table is printed and saved under outputs/benchmarks.
+"""
+
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from src.prediction_pipeline.pre_processing.german_dates import german_month_numbers, parse_german_date_series
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+output_path = os.path.join('outputs', 'benchmarks', 'german_date_parser_benchmark.csv')
+
+# Number of rows of the benchmarked columns; the sensor exports have one row per hour since 2016
+benchmark_row_counts = [10_000, 100_000, 1_000_000, 3_000_000]
+
+random_seed = 42
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def parse_german_dates_row_by_row(dates: pd.Series) -> pd.Series:
+    """Parse German dates like the previous implementations: the regex is searched row by row with `apply`.
+
+    Args:
+        dates (pd.Series): The dates to parse.
+
+    Returns:
+        pd.Series: The parsed dates.
+    """
+    pattern = re.compile(r'(\d{1,2})\.\s*(' + '|'.join(german_month_numbers.keys()) + r')\s*(\d{4})\s*(\d{2}):(\d{2})')
+
+    def replace_month(match):
+        day = match.group(1)
+        month = german_month_numbers[match.group(2)]
+        year = match.group(3)
+        hour = match.group(4)
+        minute = match.group(5)
+        return f"{year}-{month}-{day} {hour}:{minute}:00"
+
+    dates = dates.apply(lambda x: replace_month(pattern.search(x)) if pattern.search(x) else x)
+    return pd.to_datetime(dates, errors='coerce')
+
+
+def generate_german_dates(row_count: int) -> pd.Series:
+    """Generate German dates like the ones of the sensor exports: hourly dates, each repeated for several rows.
+
+    Args:
+        row_count (int): The number of rows.
+
+    Returns:
+        pd.Series: The German dates as strings.
+    """
+    german_months = list(german_month_numbers.keys())
+    rng = np.random.default_rng(random_seed)
+
+    hours = pd.date_range('2016-01-01', '2024-07-31 23:00', freq='h')
+    hours = pd.DatetimeIndex(np.sort(rng.choice(hours, size=row_count)))
+
+    return pd.Series(
+        hours.day.astype(str) + '. ' + pd.Index([german_months[month - 1] for month in hours.month])
+        + ' ' + hours.year.astype(str) + ' ' + hours.strftime('%H:%M')
+    )
+
+
+def measure_parsing_time(parser, dates: pd.Series) -> tuple:
+    """Measure how long a parser takes for one column of dates.
+
+    Args:
+        parser (callable): The parser to measure.
+        dates (pd.Series): The dates to parse.
+
+    Returns:
+        tuple: The parsing time in seconds and the parsed dates.
+    """
+    start_time = time.perf_counter()
+    parsed_dates = parser(dates)
+    return time.perf_counter() - start_time, parsed_dates
+
+
+def run_benchmark(row_counts: list = benchmark_row_counts) -> pd.DataFrame:
+    """Benchmark both parsers for several numbers of rows.
+
+    Args:
+        row_counts (list): The numbers of rows to benchmark.
+
+    Returns:
+        pd.DataFrame: One row per number of rows.
+    """
+    results = []
+    for row_count in row_counts:
+        dates = generate_german_dates(row_count)
+
+        row_by_row_seconds, row_by_row_dates = measure_parsing_time(parse_german_dates_row_by_row, dates)
+        vectorized_seconds, vectorized_dates = measure_parsing_time(parse_german_date_series, dates)
+
+        results.append({
+            'rows': row_count,
+            'row_by_row_seconds': row_by_row_seconds,
+            'vectorized_seconds': vectorized_seconds,
+            'speedup': row_by_row_seconds / vectorized_seconds,
+            'identical_dates': row_by_row_dates.astype('datetime64[ns]').equals(vectorized_dates.astype('datetime64[ns]'))
+        })
+
+    return pd.DataFrame(results).set_index('rows')
+
+
+def main():
+
+    benchmark_df = run_benchmark()
+    print(benchmark_df)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    benchmark_df.to_csv(output_path)
+    print(f"Benchmark saved under {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import hashlib
+
+import pandas as pd
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Counts of the visitor sensors and the visitor centers. float32 keeps the missing hours as NaN and is exact for
+# whole numbers up to 16 million, far above the hourly counts
+count_dtype = 'float32'
+
+# Flags like holidays and opening days. The nullable boolean keeps the hours outside the visitor center calendar
+# missing after the join, so they are still dropped. The flags and dummy columns of the model inputs are uint8
+flag_dtype = 'boolean'
+model_flag_dtype = 'uint8'
+
+# The sensor columns are counts whatever their name: raw ('Gsenget Fußgänger IN'), merged ('Bucina MERGED IN')
+# or summed per region ('Rachel-Spiegelau IN')
+count_column_suffixes = (' IN', ' OUT')
+
+# Fixed categories, so every slice of the data has the same categories and dummy columns
+weekdays = ['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']
+seasons = ['Frühling', 'Sommer', 'Herbst', 'Winter']
+weather_condition_codes = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+
+flag_columns = [
+    'Wochenende', 'Laubfärbung', 'Schulferien_Bayern', 'Schulferien_CZ', 'Feiertag_Bayern', 'Feiertag_CZ',
+    'HEH_geoeffnet', 'HZW_geoeffnet', 'WGM_geoeffnet', 'Lusenschutzhaus_geoeffnet', 'Racheldiensthuette_geoeffnet',
+    'Falkensteinschutzhaus_geoeffnet', 'Schwellhaeusl_geoeffnet'
+]
+
+# The narrowest dtype of every column of the preprocessing stages. Columns that are not declared keep their dtype
+column_schema = {
+    'Time': 'datetime64[ns]',
+
+    # Visitor counts
+    'traffic_abs': count_dtype,
+    'sum_IN_abs': count_dtype,
+    'sum_OUT_abs': count_dtype,
+    'Besuchszahlen_HEH': count_dtype,
+    'Besuchszahlen_HZW': count_dtype,
+    'Besuchszahlen_WGM': count_dtype,
+    'Parkpl_HEH_PKW': count_dtype,
+    'Parkpl_HEH_BUS': count_dtype,
+    'Parkpl_HZW_PKW': count_dtype,
+    'Parkpl_HZW_BUS': count_dtype,
+
+    # Weather, Meteostat has one decimal
+    'Temperature (°C)': 'float32',
+    'Relative Humidity (%)': 'float32',
+    'Precipitation (mm)': 'float32',
+    'Wind Speed (km/h)': 'float32',
+    'Sunshine Duration (min)': 'float32',
+    'coco_2': pd.CategoricalDtype(weather_condition_codes),
+
+    # Weather of the visitor center data
+    'Temperatur': 'float32',
+    'Niederschlagsmenge': 'float32',
+    'Schneehoehe': 'float32',
+    'GS mit': 'float32',
+    'GS max': 'float32',
+
+    # Engineered features
+    'ZScore_Daily_Max_Temperature (°C)': 'float32',
+    'ZScore_Daily_Max_Relative Humidity (%)': 'float32',
+    'ZScore_Daily_Max_Wind Speed (km/h)': 'float32',
+    'Distance_to_Nearest_Holiday_Bayern': 'float32',
+    'Distance_to_Nearest_Holiday_CZ': 'float32',
+
+    # Calendar
+    'Tag': 'UInt8',
+    'Monat': 'UInt8',
+    'Jahr': 'UInt16',
+    'Hour': 'UInt8',
+    'Wochentag': pd.CategoricalDtype(weekdays),
+    'Jahreszeit': pd.CategoricalDtype(seasons),
+    **{column: flag_dtype for column in flag_columns}
+}
+
+# Identifies the schema, so data stored with another schema is computed again (see feature_store)
+column_schema_version = hashlib.sha256(
+    repr(sorted((column, repr(dtype)) for column, dtype in column_schema.items())).encode('utf-8')
+).hexdigest()[:12]
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_column_dtype(column):
+    """
+    Get the dtype that the schema declares for a column.
+
+    Args:
+        column: The name of the column.
+
+    Returns:
+        The dtype of the column, or None if the schema does not declare it.
+    """
+    if not isinstance(column, str):
+        return None
+
+    if column in column_schema:
+        return column_schema[column]
+
+    if column.endswith(count_column_suffixes):
+        return count_dtype
+
+    return None
+
+
+def enforce_column_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the columns of a DataFrame to the dtypes of the schema. The DataFrame is only copied if a column
+    has another dtype, and the columns that the schema does not declare are kept as they are.
+
+    Args:
+        df (pd.DataFrame): The DataFrame of a preprocessing stage.
+
+    Returns:
+        pd.DataFrame: The DataFrame with the dtypes of the schema.
+    """
+    column_dtypes = {}
+    for column in df.columns:
+        dtype = get_column_dtype(column)
+        if dtype is not None and df[column].dtype != dtype:
+            column_dtypes[column] = dtype
+
+    if not column_dtypes:
+        return df
+
+    return df.astype(column_dtypes)
@@ -4,6 +4,7 @@ import pandas as pd
 import awswrangler as wr
 import numpy as np
 from src.config import aws_s3_bucket
+from src.prediction_pipeline.pre_processing.weather_zscore_engine import add_daily_max_zscores
 
 ##############################################################################################
 
@@ -14,6 +15,12 @@ output_data_folder = "preprocessed_data"
 
 window_size = 5 # Define the window size in days that you wish to use to calculate z-scores
 
+# Holiday columns and the columns with the distance in days to their nearest holiday
+holiday_distance_columns = {
+    'Feiertag_Bayern': 'Distance_to_Nearest_Holiday_Bayern',
+    'Feiertag_CZ': 'Distance_to_Nearest_Holiday_CZ'
+}
+
 
 # Functions
 def load_csv_files_from_aws_s3(path: str, **kwargs) -> pd.DataFrame:
@@ -48,139 +55,85 @@ def slice_at_first_non_null(df):
 
     return df
 
-def add_nearest_holiday_distance(df):
+def get_nearest_holiday_distances(dates, holidays):
     """
-    Add columns to the DataFrame calculating the distance to the nearest holiday for both 'Feiertag_Bayern' and 'Feiertag_CZ'.
+    Calculate the distance in days from every date to the nearest holiday with a binary search in the sorted holidays.
 
     Args:
-        df (pd.DataFrame): DataFrame with 'Time', 'Feiertag_Bayern', and 'Feiertag_CZ' columns.
-            - 'Time': Datetime column with timestamps.
-            - 'Feiertag_Bayern': Boolean column indicating if the date is a holiday in Bayern.
-            - 'Feiertag_CZ': Boolean column indicating if the date is a holiday in CZ.
+        dates (np.ndarray): Array of dates as datetime64[D].
+        holidays (np.ndarray): Sorted array of unique holiday dates as datetime64[D].
 
     Returns:
-        pd.DataFrame: DataFrame with two new columns:
-            - 'Distance_to_Nearest_Holiday_Bayern': Distance in days to the nearest holiday in Bayern for each day/row.
-            - 'Distance_to_Nearest_Holiday_CZ': Distance in days to the nearest holiday in CZ for each day/row.
+        np.ndarray: Distance in days to the nearest holiday for every date, or NaN if no holidays are provided.
     """
+    if len(holidays) == 0:
+        return np.full(len(dates), np.nan)
 
-    # Ensure the Time column is in datetime format
-    df['Time'] = pd.to_datetime(df['Time'])
-
-    # Extract date from Time column
-    df['Date'] = df['Time'].dt.date
-
-    # Extract unique dates for holidays
-    bayern_holidays = df[df['Feiertag_Bayern']]['Date'].unique()
-    cz_holidays = df[df['Feiertag_CZ']]['Date'].unique()
-
-    # Create a DataFrame with unique dates
-    dates_df = pd.DataFrame({'Date': df['Date'].unique()})
-
+    # Index of the first holiday on or after every date; the nearest holiday is this one or the one before
+    next_index = np.searchsorted(holidays, dates)
+    next_holiday = holidays[np.minimum(next_index, len(holidays) - 1)]
+    previous_holiday = holidays[np.maximum(next_index - 1, 0)]
 
-    def get_nearest_holiday_distance(date, holidays):
-        """
-        Calculate the distance in days to the nearest holiday.
+    distance_to_next = np.abs((next_holiday - dates).astype('int64'))
+    distance_to_previous = np.abs((dates - previous_holiday).astype('int64'))
 
-        Args:
-            date (pd.Timestamp): The date for which to calculate the distance.
-            holidays (np.ndarray): Array of holiday dates.
+    return np.minimum(distance_to_next, distance_to_previous)
 
-        Returns:
-            float: Distance in days to the nearest holiday, or NaN if no holidays are provided.
-        """
-        if len(holidays) == 0:
-            return np.nan
-        nearest_holiday = min(abs((date - pd.to_datetime(holidays)).days))
-        return nearest_holiday
-
-    # Apply the function to calculate distances for both sets of holidays
-    dates_df['Distance_to_Nearest_Holiday_Bayern'] = dates_df['Date'].apply(
-        lambda x: get_nearest_holiday_distance(pd.to_datetime(x), bayern_holidays)
-    )
-    dates_df['Distance_to_Nearest_Holiday_CZ'] = dates_df['Date'].apply(
-        lambda x: get_nearest_holiday_distance(pd.to_datetime(x), cz_holidays)
-    )
-    # Merge the distances back with the original DataFrame
-    df = df.merge(dates_df, on='Date', how='left')
-   
-
-    return df
-
-def add_daily_max_values(df, columns):
+def get_holiday_distance_table(df):
     """
-    Add columns to the DataFrame that show the maximum daily value for each weather characteristic.
+    Calculate the distance to the nearest holiday in Bayern and in CZ for every date of the DataFrame.
+
+    The table only depends on the holiday calendar, so it can be computed once and looked up by date.
 
     Args:
-        df (pd.DataFrame): DataFrame with 'Time' and multiple weather-related columns.
-            - 'Time': Datetime column with timestamps.
-            - columns (list of str): List of column names to compute the daily maximum values for.
+        df (pd.DataFrame): DataFrame with 'Time', 'Feiertag_Bayern', and 'Feiertag_CZ' columns.
 
     Returns:
-        pd.DataFrame: DataFrame with new columns that contain the maximum values for each day,
-                      repeated for every hour.
+        pd.DataFrame: One row per date with the columns 'Date' and the distance columns of `holiday_distance_columns`.
     """
-    # Ensure the Time column is in datetime format
-    df['Time'] = pd.to_datetime(df['Time'])
-
-    # Extract the date from the Time column
-    df['Date'] = df['Time'].dt.date
-
-    # Create a DataFrame to store daily max values
-    daily_max_df = df.groupby('Date')[columns].max().reset_index()
-
-    # Rename columns to indicate they are daily maximum values
-    daily_max_df = daily_max_df.rename(columns={col: f'Daily_Max_{col}' for col in columns})
+    # One row per date, a date is a holiday if any of its hours is marked as holiday
+    daily_holidays = (
+        df[list(holiday_distance_columns)].eq(True)
+        .groupby(pd.to_datetime(df['Time']).dt.normalize().to_numpy()).any()
+    )
+    dates = daily_holidays.index.to_numpy().astype('datetime64[D]')
 
-    # Merge the daily max values back into the original DataFrame
-    df = df.merge(daily_max_df, on='Date', how='left')
+    holiday_distance_table = pd.DataFrame({'Date': daily_holidays.index.date})
+    for holiday_column, distance_column in holiday_distance_columns.items():
+        holidays = dates[daily_holidays[holiday_column].to_numpy()]
+        holiday_distance_table[distance_column] = get_nearest_holiday_distances(dates, holidays)
 
-    return df
+    return holiday_distance_table
 
-def add_moving_z_scores(df, columns, window_size):
+def add_nearest_holiday_distance(df, holiday_distance_table=None):
     """
-    Add moving z-score columns for weather characteristics based on their daily maximum values.
+    Add columns to the DataFrame calculating the distance to the nearest holiday for both 'Feiertag_Bayern' and 'Feiertag_CZ'.
 
     Args:
-        df (pd.DataFrame): DataFrame with 'Time' and daily maximum columns.
+        df (pd.DataFrame): DataFrame with 'Time', 'Feiertag_Bayern', and 'Feiertag_CZ' columns.
             - 'Time': Datetime column with timestamps.
-        columns (list of str): List of column names to compute the moving z-scores for.
-        window_size (int): Size of the moving window in days.
+            - 'Feiertag_Bayern': Boolean column indicating if the date is a holiday in Bayern.
+            - 'Feiertag_CZ': Boolean column indicating if the date is a holiday in CZ.
+        holiday_distance_table (pd.DataFrame): The distances returned by get_holiday_distance_table for a calendar
+            that covers the dates of the DataFrame. If None, the distances are computed from the holidays of the DataFrame.
 
     Returns:
-        pd.DataFrame: DataFrame with new columns that contain the moving z-scores for each column.
+        pd.DataFrame: DataFrame with two new columns:
+            - 'Distance_to_Nearest_Holiday_Bayern': Distance in days to the nearest holiday in Bayern for each day/row.
+            - 'Distance_to_Nearest_Holiday_CZ': Distance in days to the nearest holiday in CZ for each day/row.
     """
+
     # Ensure the Time column is in datetime format
     df['Time'] = pd.to_datetime(df['Time'])
 
-    # Extract unique dates with daily max values
-    daily_df = df[['Date'] + [f'Daily_Max_{col}' for col in columns]].drop_duplicates()
-
-    # Calculate rolling mean and standard deviation for daily max values
-    for col in columns:
-        daily_max_col = f'Daily_Max_{col}'
-
-        # Calculate rolling mean and standard deviation over the specified window size
-        daily_df[f'Rolling_Mean_{daily_max_col}'] = daily_df[daily_max_col].rolling(window=window_size, min_periods=window_size).mean()
-        daily_df[f'Rolling_Std_{daily_max_col}'] = daily_df[daily_max_col].rolling(window=window_size, min_periods=window_size).std()
-
-        # Calculate the z-score
-        daily_df[f'ZScore_{daily_max_col}'] = (
-            (daily_df[daily_max_col] - daily_df[f'Rolling_Mean_{daily_max_col}']) /
-            (daily_df[f'Rolling_Std_{daily_max_col}'] + 1e-8)  # Add a small value to prevent division by zero
-        )
-
-        # Drop the rolling mean and std columns as they are intermediate calculations
-        daily_df.drop(columns=[f'Rolling_Mean_{daily_max_col}', f'Rolling_Std_{daily_max_col}'], inplace=True)
-
-    # Merge the z-scores back into the original hourly DataFrame
-    df = df.merge(daily_df[['Date'] + [f'ZScore_Daily_Max_{col}' for col in columns]], on='Date', how='left')
+    # Extract date from Time column
+    df['Date'] = df['Time'].dt.date
 
-    # List of columns to drop (daily max columns)
-    daily_max_columns = [f'Daily_Max_{col}' for col in columns]
+    if holiday_distance_table is None:
+        holiday_distance_table = get_holiday_distance_table(df)
 
-    # Drop the daily max columns from the main DataFrame
-    df.drop(columns=daily_max_columns, inplace=True)
+    # Merge the distances back with the original DataFrame
+    df = df.merge(holiday_distance_table, on='Date', how='left')
 
     return df
 
@@ -210,9 +163,7 @@ def get_zscores_and_nearest_holidays(df,columns_for_zscores):
 
     df_holidays = add_nearest_holiday_distance(df_no_null)
 
-    df_daily_max = add_daily_max_values(df_holidays, columns_for_zscores)
-
-    df_zscores_and_nearest_holidays = add_moving_z_scores(df_daily_max, columns_for_zscores, window_size)
+    df_zscores_and_nearest_holidays = add_daily_max_zscores(df_holidays, columns_for_zscores, window_size)
 
     # Remove NaN values (as there will be NaNs in the first rows of the dataframe due to zscore being NaN)
     df_zscores_and_nearest_holidays = df_zscores_and_nearest_holidays.dropna()
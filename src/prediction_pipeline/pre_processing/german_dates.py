@@ -0,0 +1,97 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# German month names as they appear in the exported sensor data, e.g. '1. Jan. 2023 00:00'
+german_month_numbers = {
+    "Jan.": "01",
+    "Feb.": "02",
+    "März": "03",
+    "Apr.": "04",
+    "Mai": "05",
+    "Juni": "06",
+    "Juli": "07",
+    "Aug.": "08",
+    "Sep.": "09",
+    "Okt.": "10",
+    "Nov.": "11",
+    "Dez.": "12"
+}
+
+# Day, month, year, hour and minute of a German date
+german_date_pattern = (
+    r'(\d{1,2})\.\s*(' + '|'.join(re.escape(month) for month in german_month_numbers) + r')\s*(\d{4})\s*(\d{2}):(\d{2})'
+)
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def parse_german_date_series(dates: pd.Series) -> pd.Series:
+    """
+    Parse German dates like '1. Jan. 2023 00:00' with vectorized string operations.
+
+    Every distinct value is parsed only once and the results are mapped back to the rows, so the many repeated
+    dates of the sensor exports cost nothing. Values that are not German dates (e.g. ISO dates or timestamps)
+    are parsed with `pd.to_datetime`, and values that cannot be parsed become NaT.
+
+    Args:
+        dates (pd.Series): The dates to parse.
+
+    Returns:
+        pd.Series: The parsed dates with the same index and name.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates) or pd.api.types.is_numeric_dtype(dates):
+        return pd.to_datetime(dates, errors='coerce')
+
+    codes, unique_dates = pd.factorize(dates)
+    unique_dates = pd.Series(unique_dates, dtype=object)
+
+    is_string = unique_dates.map(lambda value: isinstance(value, str)).astype(bool)
+    date_parts = unique_dates[is_string].astype(str).str.extract(german_date_pattern).dropna()
+
+    parsed_dates = pd.Series(pd.NaT, index=unique_dates.index, dtype='datetime64[ns]')
+
+    if not date_parts.empty:
+        iso_dates = (
+            date_parts[2] + '-' + date_parts[1].map(german_month_numbers) + '-' + date_parts[0]
+            + ' ' + date_parts[3] + ':' + date_parts[4]
+        )
+        parsed_dates[date_parts.index] = pd.to_datetime(iso_dates, format='%Y-%m-%d %H:%M', errors='coerce')
+
+    other_dates = unique_dates.index.difference(date_parts.index)
+    if len(other_dates) > 0:
+        parsed_dates[other_dates] = pd.to_datetime(unique_dates[other_dates], format='mixed', errors='coerce')
+
+    # Missing values have the code -1, which takes the appended NaT
+    parsed_values = np.append(parsed_dates.to_numpy(), np.datetime64('NaT', 'ns'))
+
+    return pd.Series(parsed_values[codes], index=dates.index, name=dates.name)
+
+
+def parse_german_dates(
+    df: pd.DataFrame,
+    date_column_name: str
+) -> pd.DataFrame:
+    """
+    Parses German dates in the specified date column of the DataFrame, including hours and minutes if available.
+    This is the parser of the pipeline and the dashboard; the notebooks keep their older copies on purpose
+    (see docs/approach/prediction-pipeline.md).
+
+    Args:
+        df (pd.DataFrame): The DataFrame containing the date column.
+        date_column_name (str): The name of the date column.
+
+    Returns:
+        pd.DataFrame: The DataFrame with parsed German dates.
+    """
+    df[date_column_name] = parse_german_date_series(df[date_column_name])
+
+    return df
@@ -1,6 +1,8 @@
 # import libraries
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor
+from src.prediction_pipeline.sourcing_data.ingest_historic_parking_data import load_parking_history, PARKING_STORE_DIR
 
 
 #################### Start and End time of processing data from different sensors ####################
@@ -16,71 +18,93 @@ parking_sensors = ["parkplatz-graupsaege-1",
     "parkplatz-nationalparkzentrum-lusen-p2",
     "parkplatz-waldhaeuser-kirche-1",
     "parkplatz-waldhaeuser-ausblick-1",
-    "parkplatz-skisportzentrum-finsterau-1"] 
+    "parkplatz-skisportzentrum-finsterau-1"]
 
-paths_to_parking_data = [os.path.join('./outputs','parking_data_final',f'{sensors}_historical_parking_data.csv') for sensors in parking_sensors]
+parking_value_columns = ['occupancy', 'occupancy_rate', 'capacity']
 
+# Number of processes that read the sensors from the parking data store at the same time
+max_parsing_workers = min(len(parking_sensors), os.cpu_count() or 1)
 
-def fill_missing_values(data):
-    """
-    Fill missing values in the data
 
+def load_all_parking_data(sensors=parking_sensors, store_dir=PARKING_STORE_DIR, max_workers=max_parsing_workers):
     """
-    # Fill all the missing values with linear interpolation
-    data.interpolate(method='linear', inplace=True)
-    return data
-    
+    Load the data of all sensors from the parking data store into one long-format frame.
+    Every sensor is read with `load_parking_history` in its own task of a process pool.
 
-def check_missing_data_per_sensor(data,sensor):
-    """
-    Check missing data per sensor
+    Args:
+        sensors (list): The parking sensors.
+        store_dir (str): The folder of the parking data store.
+        max_workers (int): The number of worker processes, 1 reads the sensors in this process.
 
+    Returns:
+        pd.DataFrame: The data of all sensors with a categorical 'sensor' column, sorted by sensor and time.
     """
-    missing_data = data.isnull().sum()
-    print(f"Missing data for {sensor}:")
-    print('---------------------------------')
-    print(missing_data)
+    store_dirs = [store_dir] * len(sensors)
 
-    if missing_data.sum() == 0:
-        print(f"No missing data for {sensor}")
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            sensor_data = list(executor.map(load_parking_history, sensors, store_dirs))
     else:
-        data = fill_missing_values(data)
-    
+        sensor_data = [load_parking_history(sensor, store_dir) for sensor in sensors]
+
+    data = pd.concat(sensor_data, keys=sensors, names=['sensor', None]).reset_index(level='sensor')
+    data['sensor'] = pd.Categorical(data['sensor'], categories=sensors)
+
+    return data.sort_values(['sensor', 'time'], kind='stable', ignore_index=True)
+
+
+def fill_missing_values(data):
+    """
+    Fill missing values in the data with linear interpolation within each sensor, so values never leak from one sensor to the next.
+
+    Args:
+        data (pd.DataFrame): The long-format parking data sorted by sensor and time.
+
+    Returns:
+        pd.DataFrame: The data without missing values between valid values.
+    """
+    data[parking_value_columns] = data.groupby('sensor', observed=True)[parking_value_columns].transform(
+        lambda values: values.interpolate(method='linear')
+    )
     return data
 
+
 def impute_occupancy_values(data):
     """
-    Impute occupancy values where the occupancy is greater than the capacity
+    Impute occupancy values where the occupancy is greater than the capacity: the occupancy is capped at the maximum capacity of its sensor.
 
+    Args:
+        data (pd.DataFrame): The long-format parking data.
+
+    Returns:
+        pd.DataFrame: The data with the capped occupancy.
     """
-    # Impute the occupancy values where the occupancy is greater than the capacity
-    data['occupancy'] = data['occupancy'].apply(lambda x: x if x < data['capacity'].max() else data['capacity'].max())
-    print('---------------------------------')
-    print("Imputed occupancy values:")
-    print(data[data['occupancy']>data['capacity']])
+    max_capacity = data.groupby('sensor', observed=True)['capacity'].transform('max')
+    data['occupancy'] = data['occupancy'].clip(upper=max_capacity)
     return data
-    
 
-def check_data_quality(data,sensor):
+
+def get_data_quality_report(data):
     """
-    Check data quality - if the occupancy is greater than the capacity of the parking space
+    Check the data quality of all sensors in one pass: missing values, occupancy greater than the capacity
+    and occupancy rate greater than 100.
+
+    Args:
+        data (pd.DataFrame): The long-format parking data.
 
+    Returns:
+        pd.DataFrame: One row per sensor with the number of rows and of violations of every check.
     """
-    # Check if the capacity is always smaller than the occupancy
-    if data['occupancy'].max() > data['capacity'].max():
-        # remove the rows where the occupancy is greater than the capacity
-        # print the row numbers where the occupancy is greater than the capacity
-        print(f"Data quality issue for {sensor}")
-        print('---------------------------------')
-        print("The occupancy is greater than the capacity")
-        print(f"Rows where the occupancy is greater than the capacity:")
-        print(data[data['occupancy']>data['capacity']])
-        # impute_occupancy_values(data)
-    else:
-        print(f"No data quality issue for {sensor}")
-    
+    checks = data[parking_value_columns].isna().add_prefix('missing_')
+    checks['occupancy_above_capacity'] = data['occupancy'] > data.groupby('sensor', observed=True)['capacity'].transform('max')
+    checks['occupancy_rate_above_100'] = data['occupancy_rate'] > 100.00
+    checks['sensor'] = data['sensor']
+
+    report = checks.groupby('sensor', observed=False).sum()
+    report.insert(0, 'rows', data.groupby('sensor', observed=False).size())
+
+    return report
 
-    return data
 
 def save_higher_occupancy_rate(data,sensor):
     """
@@ -95,42 +119,42 @@ def save_higher_occupancy_rate(data,sensor):
     data.to_csv(save_path,index=False)
     print(f"Saved the rows where the occupancy rate is greater than 100 for {sensor}")
 
-def check_data_quality_occupancy_rate(data,sensor):
 
+def save_data_quality_issues(data):
     """
-    Check data quality - if the occupancy rate is greater than 100
+    Save the rows where the occupancy rate is greater than 100, one file per sensor with such rows.
 
+    Args:
+        data (pd.DataFrame): The long-format parking data.
     """
-    # Check if the occupancy rate is greater than 100
-    if data['occupancy_rate'].max() > 100.00:
-        print(f"Data quality issue for {sensor}")
-        print('---------------------------------')
-        print("The occupancy rate is greater than 100")
-        print(f"Rows where the occupancy rate is greater than 100:")
-        print(data[data['occupancy_rate']>100])
-        save_higher_occupancy_rate(data[data['occupancy_rate']>100],sensor)
+    higher_occupancy_rate = data[data['occupancy_rate'] > 100]
+
+    for sensor, sensor_data in higher_occupancy_rate.groupby('sensor', observed=True):
+        save_higher_occupancy_rate(sensor_data.drop(columns='sensor'), sensor)
 
-    else:
-        print(f"No data quality issue for {sensor}")
 
 def main():
     """
     Main function to run the script
 
     """
-    for sensor, path in zip(parking_sensors, paths_to_parking_data):
-        data = pd.read_csv(path)
-        data['time'] = pd.to_datetime(data['time'])
+    data = load_all_parking_data()
 
-        # Missing data for each sensor
-        print(f"Checking missing data for {sensor}....................")
-        check_missing_data_per_sensor(data,sensor)
+    # Check the data quality of all sensors before imputing
+    report = get_data_quality_report(data)
+    print("Data quality report per sensor:")
+    print('---------------------------------')
+    print(report)
 
-        # check if the capacity is always smaller than the occupancy
-        check_data_quality_occupancy_rate(data,sensor)
+    save_data_quality_issues(data)
+
+    # Impute the missing values and the occupancy values above the capacity
+    data = fill_missing_values(data)
+    data = impute_occupancy_values(data)
+
+    return data
 
 
 
 if __name__ == '__main__':
     main()
-
@@ -1,5 +1,6 @@
 import pandas as pd
 from functools import reduce
+from src.prediction_pipeline.pre_processing.column_schema import enforce_column_schema
 
 
 ###########################################################################################
@@ -47,6 +48,8 @@ def get_joined_dataframe(weather_data, visitor_count_data, visitorcenter_data) -
     Main function to run the data joining pipeline.
 
     This function loads the visitor count, visitor center and weather data, preprocesses them and joins them into one dataframe.
+    Every dataframe is cast to the column schema before the join, so the joined columns keep the narrow dtypes
+    and the flags stay nullable booleans for the hours that are missing in one of them.
 
     Returns:
         pd.DataFrame: The joined data.
@@ -55,6 +58,6 @@ def get_joined_dataframe(weather_data, visitor_count_data, visitorcenter_data) -
     for df in df_list:
         create_datetimeindex(df)
 
-    joined_data = join_dataframes(df_list)
+    joined_data = join_dataframes([enforce_column_schema(df) for df in df_list])
 
     return joined_data
@@ -14,10 +14,14 @@ Output:
 
 #import libraries
 
+import os
 import pandas as pd
-import re
 import numpy as np
 import awswrangler as wr
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.prediction_pipeline.pre_processing.german_dates import parse_german_dates
+from src.prediction_pipeline.pre_processing.column_schema import enforce_column_schema, count_dtype
 
 pd.options.mode.chained_assignment = None  
 
@@ -29,6 +33,9 @@ pd.options.mode.chained_assignment = None
 output_data_folder = "preprocessed_data"
 output_file_name = "preprocessed_visitor_sensor_data.csv"
 
+# Local Parquet file where the chunked mode writes the parsed and renamed chunks
+parsed_visitor_counts_path = os.path.join('outputs', 'visitor_counts', 'parsed_visitor_counts.parquet')
+
 
 ##############################################################################################
 
@@ -38,57 +45,6 @@ output_file_name = "preprocessed_visitor_sensor_data.csv"
     
 # Functions
 
-def parse_german_dates(
-    df: pd.DataFrame,
-    date_column_name: str
-) -> pd.DataFrame:
-    """
-    Parses German dates in the specified date column of the DataFrame using regex,
-    including hours and minutes if available.
-
-    Args:
-        df (pd.DataFrame): The DataFrame containing the date column.
-        date_column_name (str): The name of the date column.
-
-    Returns:
-        pd.DataFrame: The DataFrame with parsed German dates.
-    """
-    
-    # Define a mapping of German month names to their numeric values
-    month_map = {
-        "Jan.": "01",
-        "Feb.": "02",
-        "März": "03",
-        "Apr.": "04",
-        "Mai": "05",
-        "Juni": "06",
-        "Juli": "07",
-        "Aug.": "08",
-        "Sep.": "09",
-        "Okt.": "10",
-        "Nov.": "11",
-        "Dez.": "12"
-    }
-
-    # Create a regex pattern for replacing months and capturing time
-    pattern = re.compile(r'(\d{1,2})\.\s*(' + '|'.join(month_map.keys()) + r')\s*(\d{4})\s*(\d{2}):(\d{2})')
-
-    # Function to replace the month in the matched string and keep the time part
-    def replace_month(match):
-        day = match.group(1)
-        month = month_map[match.group(2)]
-        year = match.group(3)
-        hour = match.group(4)
-        minute = match.group(5)
-        return f"{year}-{month}-{day} {hour}:{minute}:00"
-
-    # Apply regex replacement and convert to datetime
-    df[date_column_name] = df[date_column_name].apply(lambda x: replace_month(pattern.search(x)) if pattern.search(x) else x)
-    df[date_column_name] = pd.to_datetime(df[date_column_name], errors='coerce')
-
-    return df
-
-
 def fix_columns_names(df):
     """
     Processes the given DataFrame by renaming columns, dropping specified columns, and creating a new column for Bucina_Multi IN by summing the Bucina_Multi Fahrräder IN and Bucina_Multi Fußgänger IN columns. .
@@ -440,14 +396,85 @@ def write_csv_file_to_aws_s3(df: pd.DataFrame, path: str, **kwargs) -> pd.DataFr
     wr.s3.to_csv(df, path=path, **kwargs)
     return
 
-def preprocess_visitor_count_data(visitor_counts: pd.DataFrame) -> pd.DataFrame:
+def parse_and_rename_visitor_counts(visitor_counts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parses the German dates, removes the rows before the first sensor was installed and renames the sensors.
+    Every row is processed on its own, so this works on the whole data or on chunks of it.
+
+    Args:
+        visitor_counts (pd.DataFrame): The raw visitor counts or a chunk of them.
 
+    Returns:
+        pd.DataFrame: The visitor counts with parsed times and the new sensor names.
+    """
     visitor_counts_parsed_dates = parse_german_dates(df=visitor_counts, date_column_name="Time")
     # Remove data before 2016-05-10 03:00:00 as there were no sensors installed
     df = visitor_counts_parsed_dates[visitor_counts_parsed_dates['Time'] >= "2016-05-10 03:00:00"].reset_index(drop=True)
    
     df_mapped = fix_columns_names(df)
-    
+
+    return df_mapped
+
+
+def write_visitor_count_chunks(visitor_count_chunks, output_path: str = parsed_visitor_counts_path) -> int:
+    """
+    Parses and renames the visitor counts chunk by chunk and appends every chunk to a local Parquet file,
+    so only one chunk of the raw data is in memory at a time.
+
+    The counts are written with the count dtype of the column schema, so every chunk has the same schema even if a column
+    has no missing values in it. The columns of every chunk are put in the order of the first chunk ('Time', then the sensors
+    sorted by name), since the files do not all have their columns in the same order.
+
+    Args:
+        visitor_count_chunks (iterable): The chunks of raw visitor counts, e.g. from `stream_historic_visitor_count`.
+        output_path (str): The path of the Parquet file.
+
+    Returns:
+        int: The number of rows written.
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    writer = None
+    columns = None
+    written_rows = 0
+    try:
+        for chunk in visitor_count_chunks:
+            df_chunk = parse_and_rename_visitor_counts(chunk)
+            if columns is None:
+                count_columns = sorted(df_chunk.columns.drop('Time'))
+                columns = ['Time'] + count_columns
+
+            # Align the columns by name, the schema of the Parquet file is the one of the first chunk
+            df_chunk = df_chunk.reindex(columns=columns)
+            df_chunk[count_columns] = df_chunk[count_columns].astype(count_dtype)
+
+            table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table)
+
+            written_rows += len(df_chunk)
+            print(f"{written_rows} visitor count rows written to {output_path}")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return written_rows
+
+
+def preprocess_parsed_visitor_count_data(df_mapped: pd.DataFrame) -> pd.DataFrame:
+    """
+    Runs the preprocessing steps that need all rows (time corrections, sensor replacements, outliers and traffic metrics)
+    on the parsed and renamed visitor counts.
+
+    Args:
+        df_mapped (pd.DataFrame): The output of `parse_and_rename_visitor_counts` for all rows, in the original order.
+
+    Returns:
+        pd.DataFrame: The preprocessed visitor counts.
+    """
+    df_mapped = enforce_column_schema(df_mapped)
+
     df_imputed_timestamps = correct_and_impute_times(df_mapped)
 
     df_corrected_sensors = correct_non_replaced_sensors(df_imputed_timestamps)
@@ -465,3 +492,28 @@ def preprocess_visitor_count_data(visitor_counts: pd.DataFrame) -> pd.DataFrame:
     print("\nVisitor sensors data is preprocessed and overall traffic metrics were created! \n")
 
     return df_traffic_metrics
+
+def preprocess_visitor_count_data(visitor_counts: pd.DataFrame) -> pd.DataFrame:
+
+    df_mapped = parse_and_rename_visitor_counts(visitor_counts)
+
+    return preprocess_parsed_visitor_count_data(df_mapped)
+
+def preprocess_visitor_count_data_chunked(visitor_count_chunks, output_path: str = parsed_visitor_counts_path) -> pd.DataFrame:
+    """
+    Chunked version of `preprocess_visitor_count_data`: the raw chunks are parsed and renamed one by one and written
+    to a Parquet file, so the raw text of all files is never in memory at once. The parsed counts are then read back
+    as a whole for the steps that need all rows, so the memory still grows with the number of rows.
+
+    Args:
+        visitor_count_chunks (iterable): The chunks of raw visitor counts, e.g. from `stream_historic_visitor_count`.
+        output_path (str): The path of the intermediate Parquet file.
+
+    Returns:
+        pd.DataFrame: The preprocessed visitor counts.
+    """
+    write_visitor_count_chunks(visitor_count_chunks, output_path)
+
+    df_mapped = pd.read_parquet(output_path)
+
+    return preprocess_parsed_visitor_count_data(df_mapped)
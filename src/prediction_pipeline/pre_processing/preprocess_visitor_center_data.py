@@ -6,6 +6,7 @@ import numpy as np  # Supports large, multi-dimensional arrays and matrices.
 import awswrangler as wr
 import logging
 from src.config import aws_s3_bucket
+from src.prediction_pipeline.pre_processing.column_schema import enforce_column_schema
 
 
 saved_path_visitor_center_query = f"s3://{aws_s3_bucket}/preprocessed_data/bf_preprocessed_files/visitor_centers/visitor_centers_2017_to_2024.parquet"
@@ -453,6 +454,9 @@ def process_visitor_center_data(sourced_df):
     # Before saving and returning hourly_df, we need to add the hour column
     hourly_df['Hour'] = hourly_df['Time'].dt.hour
 
+    # Store the hourly data with the dtypes of the column schema
+    hourly_df = enforce_column_schema(hourly_df)
+
     # Save to AWS
     # Save daily data to AWS for querying
     write_parquet_file_to_aws_s3(daily_df, saved_path_visitor_center_query)
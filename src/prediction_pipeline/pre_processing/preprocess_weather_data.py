@@ -1,5 +1,6 @@
 # Import necessary libraries
 import warnings
+from src.prediction_pipeline.pre_processing.column_schema import enforce_column_schema
 
 # Ignore warnings
 warnings.filterwarnings('ignore')
@@ -77,7 +78,8 @@ def process_weather_data(sourced_df):
     for the specified time period, processes the data to extract necessary weather parameters,
     and saves the processed data to a CSV file.
     """
-    sourced_df["coco_2"] = sourced_df["coco_2"].astype("category")
+    # Narrow the weather columns to float32 and the weather codes to their fixed categories
+    sourced_df = enforce_column_schema(sourced_df)
     # Get the list of columns to process
     parameters = sourced_df.columns.to_list()
 
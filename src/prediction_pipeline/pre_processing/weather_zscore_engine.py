@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Added to the rolling standard deviation to prevent a division by zero
+zscore_epsilon = 1e-8
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def get_zscore_column_names(columns: list) -> list:
+    """
+    Get the names of the z-score columns of the weather columns.
+
+    Args:
+        columns (list): The weather columns.
+
+    Returns:
+        list: The z-score columns, e.g. 'ZScore_Daily_Max_Temperature (°C)'.
+    """
+    return [f'ZScore_Daily_Max_{column}' for column in columns]
+
+
+def get_day_codes(times: pd.Series) -> tuple:
+    """
+    Get the day of every hour as an integer code into the sorted days.
+
+    Args:
+        times (pd.Series): The hours.
+
+    Returns:
+        tuple: The code of every hour (np.ndarray) and the sorted days (pd.DatetimeIndex).
+    """
+    codes, days = pd.factorize(pd.to_datetime(times).dt.floor('D'), sort=True)
+
+    return codes, pd.DatetimeIndex(days)
+
+
+def compute_daily_max(values: pd.DataFrame, codes: np.ndarray, days: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    Compute the daily max of all weather columns in one grouped step.
+
+    Args:
+        values (pd.DataFrame): The hourly values of the weather columns.
+        codes (np.ndarray): The day code of every hour.
+        days (pd.DatetimeIndex): The days of the codes.
+
+    Returns:
+        pd.DataFrame: The daily max values indexed by day.
+    """
+    daily_max = values.groupby(codes).max()
+    daily_max.index = days[daily_max.index]
+
+    return daily_max
+
+
+def compute_daily_zscores(daily_max: pd.DataFrame, window_size: int) -> pd.DataFrame:
+    """
+    Compute the z-scores of the daily max values against the rolling mean and standard deviation of the
+    last `window_size` days, for all weather columns at once.
+
+    Args:
+        daily_max (pd.DataFrame): The daily max values indexed by the sorted days.
+        window_size (int): Size of the moving window in days.
+
+    Returns:
+        pd.DataFrame: The z-scores indexed by day, NaN for the days without a full window.
+    """
+    rolling_window = daily_max.rolling(window=window_size, min_periods=window_size)
+
+    return (daily_max - rolling_window.mean()) / (rolling_window.std() + zscore_epsilon)
+
+
+def add_daily_max_zscores(df: pd.DataFrame, columns: list, window_size: int) -> pd.DataFrame:
+    """
+    Add the moving z-scores of the daily max values of the weather columns.
+
+    The daily values are computed once per day and broadcast back to the hours through the day codes,
+    so the hours keep their order and index.
+
+    Args:
+        df (pd.DataFrame): DataFrame with the 'Time' column and the weather columns.
+        columns (list of str): List of column names to compute the moving z-scores for.
+        window_size (int): Size of the moving window in days.
+
+    Returns:
+        pd.DataFrame: DataFrame with the 'Date' column and one 'ZScore_Daily_Max_<column>' column per weather column.
+    """
+    # Ensure the Time column is in datetime format
+    df['Time'] = pd.to_datetime(df['Time'])
+    df['Date'] = df['Time'].dt.date
+
+    codes, days = get_day_codes(df['Time'])
+    daily_zscores = compute_daily_zscores(compute_daily_max(df[columns], codes, days), window_size)
+
+    df[get_zscore_column_names(columns)] = daily_zscores.to_numpy()[codes]
+
+    return df
+
+
+class OnlineWeatherZScores:
+    """
+    Keeps the daily max values of the weather columns and updates the z-scores when the hours of some days
+    change, e.g. when a new weather forecast arrives.
+
+    Only the changed days and the days whose rolling window contains them are computed again. The results
+    are the same as those of `add_daily_max_zscores` on all hours.
+    """
+
+    def __init__(self, columns: list, window_size: int):
+        """
+        Args:
+            columns (list): The weather columns.
+            window_size (int): Size of the moving window in days.
+        """
+        self.columns = columns
+        self.window_size = window_size
+        self.daily_max = pd.DataFrame(columns=columns, index=pd.DatetimeIndex([]), dtype='float64')
+        self.daily_zscores = self.daily_max.copy()
+
+    def update(self, df: pd.DataFrame) -> pd.DatetimeIndex:
+        """
+        Update the daily max values with all hours of some days and compute the z-scores of the affected days again.
+
+        Args:
+            df (pd.DataFrame): All hours of the new or changed days with the 'Time' column and the weather columns.
+
+        Returns:
+            pd.DatetimeIndex: The days whose z-scores were computed again.
+        """
+        codes, days = get_day_codes(df['Time'])
+        new_daily_max = compute_daily_max(df[self.columns].astype('float64'), codes, days)
+
+        self.daily_max = pd.concat([self.daily_max.drop(index=days, errors='ignore'), new_daily_max]).sort_index()
+
+        # The z-score of a day depends on the days of its window, so the days after the first changed one are affected
+        first_position = self.daily_max.index.get_loc(days[0])
+        context_start = max(first_position - self.window_size + 1, 0)
+        affected_end = min(self.daily_max.index.get_loc(days[-1]) + self.window_size, len(self.daily_max))
+
+        context_zscores = compute_daily_zscores(self.daily_max.iloc[context_start:affected_end], self.window_size)
+        affected_zscores = context_zscores.iloc[first_position - context_start:]
+
+        self.daily_zscores = pd.concat([self.daily_zscores.drop(index=affected_zscores.index, errors='ignore'), affected_zscores]).sort_index()
+
+        return affected_zscores.index
+
+    def add_zscores(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add the current z-scores to the hours, like `add_daily_max_zscores`.
+
+        Args:
+            df (pd.DataFrame): DataFrame with the 'Time' column.
+
+        Returns:
+            pd.DataFrame: DataFrame with the 'Date' column and one 'ZScore_Daily_Max_<column>' column per weather column.
+        """
+        df['Time'] = pd.to_datetime(df['Time'])
+        df['Date'] = df['Time'].dt.date
+
+        positions = self.daily_zscores.index.get_indexer(df['Time'].dt.floor('D'))
+        zscores = np.vstack([self.daily_zscores.to_numpy(), np.full((1, len(self.columns)), np.nan)])
+
+        # Days that are not known have the position -1, which takes the appended row of NaN
+        df[get_zscore_column_names(self.columns)] = zscores[positions]
+
+        return df
@@ -0,0 +1,237 @@
+# Install libraries
+import pandas as pd
+import json
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+from src.prediction_pipeline.sourcing_data.source_historic_parking_data import (
+    get_historical_data_for_location, parking_sensors, parking_data_types
+)
+
+########################################################################################
+# Global variables
+########################################################################################
+
+# Parquet store of the historical parking data, partitioned by sensor and month:
+# <PARKING_STORE_DIR>/sensor=<location slug>/month=<YYYY-MM>/part-<uuid>.parquet
+PARKING_STORE_DIR = './outputs/parking_data_store/'
+
+# Last ingested timestamp per sensor and per metric
+INGESTION_STATE_FILE = 'ingestion_state.json'
+
+parking_metric_columns = [column_name for _, _, column_name in parking_data_types]
+
+# Time of the ingestion run that wrote a row, so the newest value wins when a time is stored more than once
+ingested_at_column = 'ingested_at'
+ingested_at_type = pa.timestamp('us', tz='UTC')
+
+########################################################################################
+# Functions
+########################################################################################
+
+def load_ingestion_state(store_dir: str = PARKING_STORE_DIR) -> dict:
+    """
+    Load the last ingested timestamp of every sensor and metric.
+
+    Args:
+        store_dir (str): The folder of the parking data store.
+
+    Returns:
+        dict: {location slug: {metric column: ISO timestamp}}, empty if nothing was ingested yet.
+    """
+    state_path = os.path.join(store_dir, INGESTION_STATE_FILE)
+    if not os.path.exists(state_path):
+        return {}
+
+    with open(state_path) as file:
+        return json.load(file)
+
+
+def save_ingestion_state(state: dict, store_dir: str = PARKING_STORE_DIR) -> None:
+    """
+    Save the last ingested timestamps. The file is replaced at once, so a crash never leaves a broken state.
+
+    Args:
+        state (dict): {location slug: {metric column: ISO timestamp}}.
+        store_dir (str): The folder of the parking data store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    state_path = os.path.join(store_dir, INGESTION_STATE_FILE)
+    temporary_path = f"{state_path}.part"
+    with open(temporary_path, 'w') as file:
+        json.dump(state, file, indent=2)
+    os.replace(temporary_path, state_path)
+
+
+def fetch_new_parking_data(location_slug: str, location_id: str, sensor_state: dict) -> pd.DataFrame:
+    """
+    Fetch the data of every metric of a sensor that is newer than its last ingested timestamp.
+
+    Args:
+        location_slug (str): The location slug of the parking sensor.
+        location_id (str): The ID of the parking sensor.
+        sensor_state (dict): {metric column: last ingested ISO timestamp} of the sensor.
+
+    Returns:
+        pd.DataFrame: The new data with a 'time' column in UTC and one column per metric. A metric
+                      without new data at a time is missing (NaN) in that row.
+    """
+    new_data = []
+    for data_type, api_suffix, column_name in parking_data_types:
+        last_time = sensor_state.get(column_name)
+        print(f"Loading {data_type} data after {last_time or 'the start of the history'} for location: {location_slug}")
+
+        parking_df = get_historical_data_for_location(
+            location_id=location_id,
+            location_slug=location_slug,
+            data_type=data_type,
+            api_endpoint_suffix=api_suffix,
+            column_name=column_name,
+            min_time=last_time
+        )
+        parking_df['time'] = pd.to_datetime(parking_df['time'], utc=True)
+
+        # The lower bound of the filter is inclusive, so drop the data that was already ingested
+        if last_time is not None:
+            parking_df = parking_df[parking_df['time'] > pd.Timestamp(last_time)]
+
+        # The API can return a time twice, keep its last value so the times are unique for the join
+        parking_df = parking_df.drop_duplicates('time', keep='last')
+
+        new_data.append(parking_df.set_index('time'))
+
+    # Outer join, so a metric that is ahead of the others does not drop their rows
+    return pd.concat(new_data, axis=1).reset_index()
+
+
+def append_to_parking_store(parking_df: pd.DataFrame, location_slug: str, store_dir: str = PARKING_STORE_DIR) -> list:
+    """
+    Append new data of a sensor to the store, as one new Parquet file per month it covers.
+    Existing files are never rewritten. Every row gets the time of the ingestion run.
+
+    Args:
+        parking_df (pd.DataFrame): The new data with a 'time' column in UTC.
+        location_slug (str): The location slug of the parking sensor.
+        store_dir (str): The folder of the parking data store.
+
+    Returns:
+        list: The paths of the written files.
+    """
+    written_paths = []
+    months = parking_df['time'].dt.strftime('%Y-%m')
+
+    parking_df = parking_df.assign(**{ingested_at_column: pd.Timestamp.now(tz='UTC').as_unit('us')})
+
+    for month, month_df in parking_df.groupby(months):
+        partition_dir = os.path.join(store_dir, f'sensor={location_slug}', f'month={month}')
+        os.makedirs(partition_dir, exist_ok=True)
+
+        output_path = os.path.join(partition_dir, f'part-{uuid.uuid4().hex}.parquet')
+        month_df.to_parquet(output_path, index=False)
+        written_paths.append(output_path)
+
+    return written_paths
+
+
+def ingest_parking_sensor(location_slug: str, location_id: str, state: dict, store_dir: str = PARKING_STORE_DIR) -> int:
+    """
+    Ingest the new data of one sensor and update its last ingested timestamps in the state.
+
+    Args:
+        location_slug (str): The location slug of the parking sensor.
+        location_id (str): The ID of the parking sensor.
+        state (dict): The ingestion state, updated in place.
+        store_dir (str): The folder of the parking data store.
+
+    Returns:
+        int: The number of new rows.
+    """
+    sensor_state = state.get(location_slug, {})
+    new_parking_df = fetch_new_parking_data(location_slug, location_id, sensor_state)
+
+    if new_parking_df.empty:
+        print(f"No new historical parking data for location: {location_slug}")
+        return 0
+
+    written_paths = append_to_parking_store(new_parking_df, location_slug, store_dir)
+    print(f"Appended {len(new_parking_df)} rows for location: {location_slug} in {len(written_paths)} files")
+
+    # The state is only moved forward once the data is written, so a failed run is fetched again
+    for column_name in parking_metric_columns:
+        metric_times = new_parking_df.loc[new_parking_df[column_name].notna(), 'time']
+        if not metric_times.empty:
+            sensor_state[column_name] = metric_times.max().isoformat()
+    state[location_slug] = sensor_state
+
+    return len(new_parking_df)
+
+
+def ingest_all_locations(parking_sensors: dict, store_dir: str = PARKING_STORE_DIR) -> dict:
+    """
+    Ingest the new historical data of all parking sensors into the store.
+
+    The state is saved after every sensor, so an interrupted run only fetches the remaining sensors again.
+
+    Args:
+        parking_sensors (dict): Dictionary containing location slugs as keys and location IDs as values.
+        store_dir (str): The folder of the parking data store.
+
+    Returns:
+        dict: The number of new rows per location slug.
+    """
+    state = load_ingestion_state(store_dir)
+
+    new_rows = {}
+    for location_slug, location_id in parking_sensors.items():
+        new_rows[location_slug] = ingest_parking_sensor(location_slug, location_id, state, store_dir)
+        save_ingestion_state(state, store_dir)
+
+    return new_rows
+
+
+def load_parking_history(location_slug: str, store_dir: str = PARKING_STORE_DIR) -> pd.DataFrame:
+    """
+    Read the complete history of a sensor from the store.
+
+    Rows of the same time from different runs (e.g. a metric that was ingested later than the others)
+    are combined into one row. For every metric, the value of the newest run wins; files written before the
+    ingestion time was stored count as the oldest.
+
+    Args:
+        location_slug (str): The location slug of the parking sensor.
+        store_dir (str): The folder of the parking data store.
+
+    Returns:
+        pd.DataFrame: The history with the columns 'time', 'occupancy', 'occupancy_rate' and 'capacity', sorted by time.
+    """
+    sensor_dir = os.path.join(store_dir, f'sensor={location_slug}')
+    if not os.path.exists(sensor_dir):
+        # Typed like a stored history, so it can be concatenated with the history of other sensors
+        empty_df = pd.DataFrame({'time': pd.Series(dtype='datetime64[us, UTC]')})
+        return empty_df.assign(**{column_name: pd.Series(dtype='float64') for column_name in parking_metric_columns})
+
+    # The files without the ingestion time get it as null
+    schema = ds.dataset(sensor_dir, format='parquet', partitioning='hive').schema
+    if ingested_at_column not in schema.names:
+        schema = schema.append(pa.field(ingested_at_column, ingested_at_type))
+
+    parking_table = ds.dataset(sensor_dir, schema=schema, format='parquet', partitioning='hive').to_table(
+        columns=['time'] + parking_metric_columns + [ingested_at_column]
+    )
+    parking_df = parking_table.to_pandas().sort_values([ingested_at_column], na_position='first', kind='stable')
+
+    # last() takes the newest value of every metric that is not missing
+    parking_df = parking_df.groupby('time', as_index=False)[parking_metric_columns].last()
+
+    return parking_df.sort_values('time', ignore_index=True)
+
+
+def main():
+
+    # Fetch the new historical data of all locations
+    ingest_all_locations(parking_sensors)
+
+if __name__ == '__main__':
+    main()
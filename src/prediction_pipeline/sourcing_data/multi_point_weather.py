@@ -0,0 +1,128 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from src.config import parking_sensor_coordinates
+from src.prediction_pipeline.sourcing_data.source_weather import START_TIME, END_TIME, LATITUDE, LONGITUDE
+from src.prediction_pipeline.sourcing_data.weather_cache import get_cached_hourly_data
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Points of the park with their coordinates (latitude, longitude): the central point used by the models so far
+# and the parking sensors, which are spread over the regions of the park
+weather_points = {"haselbach": (LATITUDE, LONGITUDE), **parking_sensor_coordinates}
+
+# Meteostat columns kept for every point
+multi_point_weather_columns = ['temp', 'rhum', 'prcp', 'wspd', 'coco']
+
+# Number of points fetched at the same time
+max_weather_workers = 8
+
+OUTPUT_PATH = os.path.join('outputs', 'weather_data', 'multi_point_weather.parquet')
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def fetch_point_weather(point_name: str, latitude: float, longitude: float, start_time, end_time, columns: list) -> pd.DataFrame:
+    """
+    Get the hourly weather of one point through the weather cache.
+
+    Args:
+        point_name (str): The name of the point.
+        latitude (float): The latitude of the point.
+        longitude (float): The longitude of the point.
+        start_time (datetime): The start of the data, taken as UTC if naive.
+        end_time (datetime): The end of the data (included), taken as UTC if naive.
+        columns (list): The Meteostat columns to keep.
+
+    Returns:
+        pd.DataFrame: The weather of the point indexed by 'time' with the columns '<column>_<point name>'.
+    """
+    point_data = get_cached_hourly_data(latitude, longitude, start_time, end_time)
+
+    return point_data.set_index('time')[columns].add_suffix(f'_{point_name}')
+
+
+def source_multi_point_weather(start_time=START_TIME, end_time=END_TIME, points: dict = weather_points,
+                               columns: list = multi_point_weather_columns, max_workers: int = max_weather_workers) -> pd.DataFrame:
+    """
+    Source the hourly weather of several points at the same time and join it into one wide table.
+
+    The points are fetched in parallel, so the latency does not grow with the number of points, and every
+    point goes through the weather cache, so only the missing hours are requested.
+
+    Args:
+        start_time (datetime): The start of the data, taken as UTC if naive.
+        end_time (datetime): The end of the data (included), taken as UTC if naive.
+        points (dict): The point names with their coordinates (latitude, longitude).
+        columns (list): The Meteostat columns to keep for every point.
+        max_workers (int): The number of points fetched at the same time.
+
+    Returns:
+        pd.DataFrame: The weather indexed by 'time' with one column per point and Meteostat column,
+                      e.g. 'temp_p-r-spiegelau-1'.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(fetch_point_weather, point_name, latitude, longitude, start_time, end_time, columns)
+            for point_name, (latitude, longitude) in points.items()
+        ]
+
+        # Keep the order of the points so that the columns are always in the same order
+        points_data = [future.result() for future in futures]
+
+    return pd.concat(points_data, axis=1).sort_index()
+
+
+def save_multi_point_weather(multi_point_weather: pd.DataFrame, output_path: str = OUTPUT_PATH) -> str:
+    """
+    Save the wide multi-point weather table as a Parquet file compressed with zstd.
+
+    Args:
+        multi_point_weather (pd.DataFrame): The weather indexed by 'time' with one column per point and Meteostat column.
+        output_path (str): The path of the Parquet file.
+
+    Returns:
+        str: The path of the Parquet file.
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    # Store the values as float32, the precision of Meteostat is one decimal
+    multi_point_weather.astype('float32').to_parquet(output_path, compression='zstd')
+
+    print(f"Weather of {multi_point_weather.shape[1]} columns and {len(multi_point_weather)} hours saved under {output_path}")
+    return output_path
+
+
+def load_multi_point_weather(output_path: str = OUTPUT_PATH, points: list = None, columns: list = None) -> pd.DataFrame:
+    """
+    Load the multi-point weather table, optionally only the columns of some points and Meteostat columns.
+    Only the selected columns are read from the file.
+
+    Args:
+        output_path (str): The path of the Parquet file.
+        points (list): The point names to load. Defaults to all points.
+        columns (list): The Meteostat columns to load. Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: The weather indexed by 'time'.
+    """
+    points = points or list(weather_points.keys())
+    columns = columns or multi_point_weather_columns
+
+    return pd.read_parquet(output_path, columns=[f'{column}_{point}' for point in points for column in columns])
+
+
+def main():
+
+    # Source the weather of all points for the training period and save it
+    multi_point_weather = source_multi_point_weather()
+    save_multi_point_weather(multi_point_weather)
+
+if __name__ == '__main__':
+    main()
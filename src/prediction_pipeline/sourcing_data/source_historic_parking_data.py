@@ -30,6 +30,13 @@ parking_sensors = {
 
 OUTPUT_DIR = './outputs/parking_data_final/'
 
+# Historical parking metrics with their API endpoint suffix and column name
+parking_data_types = [
+    ('occupancy', 'dcls_occupancy', 'occupancy'),
+    ('occupancy_rate', 'dcls_occupancy_rate', 'occupancy_rate'),
+    ('capacity', 'dcls_capacity', 'capacity')
+]
+
 ########################################################################################
 # Functions
 ########################################################################################
@@ -40,7 +47,8 @@ def get_historical_data_for_location(
     data_type: str,
     api_endpoint_suffix: str,
     column_name: str,
-    save_file_path: str = 'outputs'
+    save_file_path: str = 'outputs',
+    min_time: str = None
 ):
     """
     Fetch historical data from the BayernCloud API and save it as a CSV file.
@@ -52,6 +60,7 @@ def get_historical_data_for_location(
         api_endpoint_suffix (str): The specific suffix of the API endpoint for the data type (e.g., 'dcls_occupancy', 'dcls_occupancy_rate').
         column_name (str): The name of the column to store the fetched data in the DataFrame.
         save_file_path (str, optional): The base directory where the CSV file will be saved (default is 'outputs').
+        min_time (str, optional): Only fetch the data after this ISO timestamp (default is the complete history).
 
     Returns:
         historical_df (pd.DataFrame): A Pandas DataFrame containing the historical data for a location.
@@ -63,6 +72,8 @@ def get_historical_data_for_location(
     request_params = {
         'token': BAYERN_CLOUD_API_KEY
     }
+    if min_time is not None:
+        request_params['filter[timeseries][in][min]'] = min_time
 
     # Send the GET request to the API
     response = requests.get(API_endpoint, params=request_params)
@@ -84,15 +95,9 @@ def process_all_locations(parking_sensors):
         parking_sensors (dict): Dictionary containing location slugs as keys and location IDs as values.
     """
 
-    data_types = [
-        ('occupancy', 'dcls_occupancy', 'occupancy'),
-        ('occupancy_rate', 'dcls_occupancy_rate', 'occupancy_rate'),
-        ('capacity', 'dcls_capacity', 'capacity')
-    ]
-
     for key, value in parking_sensors.items():
         historical_data = []
-        for data_type, api_suffix, column_name in data_types:
+        for data_type, api_suffix, column_name in parking_data_types:
             print(f"Loading historical {data_type} data for location: {key} with location_id: {value}")
 
             parking_df  = get_historical_data_for_location(
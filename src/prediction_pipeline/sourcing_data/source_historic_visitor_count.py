@@ -3,6 +3,10 @@ from src.config import aws_s3_bucket
 
 raw_data_folder = "raw-data"
 visitor_counts_folder = "hourly-historic-visitor-counts-all-sensors"
+visitor_counts_path = f"s3://{aws_s3_bucket}/{raw_data_folder}/{visitor_counts_folder}/*.csv"
+
+# Number of rows read at once in the chunked mode
+visitor_count_chunk_size = 50000
 
 # needed columns across all dfs 
 common_columns = ['Time',
@@ -108,9 +112,23 @@ def source_historic_visitor_count():
 
     # Load visitor count data from AWS S3
     visitor_counts = wr.s3.read_csv(
-        path=f"s3://{aws_s3_bucket}/{raw_data_folder}/{visitor_counts_folder}/*.csv",
+        path=visitor_counts_path,
         skiprows=2,
         usecols=common_columns
     )
 
     return visitor_counts
+
+
+def stream_historic_visitor_count(chunk_size=visitor_count_chunk_size):
+    """Source historic visitor count data from AWS S3 as an iterator of chunks of rows, so the files are never loaded at once."""
+
+    # Load visitor count data from AWS S3, the chunks of every file follow each other in the same order as in source_historic_visitor_count
+    visitor_count_chunks = wr.s3.read_csv(
+        path=visitor_counts_path,
+        skiprows=2,
+        usecols=common_columns,
+        chunksize=chunk_size
+    )
+
+    return visitor_count_chunks
@@ -1,6 +1,7 @@
 import awswrangler as wr
 import pandas as pd
 from src.config import aws_s3_bucket
+from src.prediction_pipeline.pre_processing.column_schema import enforce_column_schema
 
 visitor_center_data_path = f"s3://{aws_s3_bucket}/raw-data/national-park-vacation-times-houses-opening-times-visitors.xlsx"
 
@@ -23,7 +24,7 @@ def source_visitor_center_data():
 def source_preprocessed_hourly_visitor_center_data():
 
     """
-    Load the preprocessed hourly visitor center data from AWS S3.
+    Load the preprocessed hourly visitor center data from AWS S3 with the dtypes of the column schema.
     """
 
     # Load visitor count data from AWS S3
@@ -31,4 +32,4 @@ def source_preprocessed_hourly_visitor_center_data():
         path=f"s3://{aws_s3_bucket}/preprocessed_data/visitor_centers_hourly.parquet"
     )
 
-    return preprocessed_hourly_visitor_center_data
\ No newline at end of file
+    return enforce_column_schema(preprocessed_hourly_visitor_center_data)
\ No newline at end of file
@@ -4,6 +4,8 @@ from datetime import datetime
 import pandas as pd
 from meteostat import Point, Hourly
 import streamlit as st
+from src.prediction_pipeline.modeling.pipeline_profiler import profile_stage, mark_cache_miss
+from src.prediction_pipeline.sourcing_data.weather_cache import get_cached_hourly_data
 
 
 # Ignore warnings
@@ -135,7 +137,9 @@ def process_hourly_data(data):
 
     return data
 
+@profile_stage('source_weather_data', cached=True)
 @st.cache_data(max_entries=1)
+@mark_cache_miss
 def source_weather_data(start_time, end_time):
     """
     This function creates a point over the Bavarian Forest National Park, retrieves hourly weather data
@@ -144,11 +148,8 @@ def source_weather_data(start_time, end_time):
     """
     print(f"Sourcing weather data for {start_time} to {end_time} at {datetime.now()}...")
 
-    # Create a Point object for the Bavarian Forest National Park entry
-    bavarian_forest = Point(lat=LATITUDE, lon=LONGITUDE)
-
-    # Fetch hourly data for the location
-    hourly_data = get_hourly_data(bavarian_forest, start_time, end_time)
+    # Get the hourly data for the Bavarian Forest National Park entry, only the hours that are not cached are fetched
+    hourly_data = get_cached_hourly_data(LATITUDE, LONGITUDE, start_time, end_time)
 
     # Process the hourly data to extract and format necessary weather parameters
     sourced_hourly_data = process_hourly_data(hourly_data)
@@ -0,0 +1,231 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+from meteostat import Point, Hourly
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Local folder of the weather cache, one Parquet file per location
+weather_cache_dir = os.path.join('outputs', 'weather_cache')
+
+# An hour that was fetched at least `historical_delay` after it happened is final and never fetched again.
+# All other hours (forecasts and recent observations) are fetched again once they are older than `forecast_ttl`.
+historical_delay = timedelta(days=2)
+forecast_ttl = timedelta(hours=3)
+
+# Columns of the Meteostat hourly data
+weather_value_columns = ['temp', 'dwpt', 'rhum', 'prcp', 'snow', 'wdir', 'wspd', 'wpgt', 'pres', 'tsun', 'coco']
+
+# Per row, whether Meteostat returned the hour; hours it did not return are cached as well, so they are not requested again
+returned_column = 'returned'
+fetched_at_column = 'fetched_at'
+
+# One lock per location, so different locations are fetched at the same time
+_locks_lock = threading.Lock()
+_location_locks = {}
+_memory_cache = {}
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def to_utc_hour(timestamp) -> pd.Timestamp:
+    """
+    Convert a timestamp to a naive UTC timestamp, as used by Meteostat. Naive timestamps are taken as UTC.
+
+    Args:
+        timestamp (datetime): The timestamp.
+
+    Returns:
+        pd.Timestamp: The naive UTC timestamp.
+    """
+    timestamp = pd.Timestamp(timestamp).as_unit('ns')
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+
+    return timestamp
+
+
+def get_cache_path(latitude: float, longitude: float, cache_dir: str = weather_cache_dir) -> str:
+    """
+    Get the path of the cache file of a location.
+
+    Args:
+        latitude (float): The latitude of the location.
+        longitude (float): The longitude of the location.
+        cache_dir (str): The folder of the weather cache.
+
+    Returns:
+        str: The path of the cache file.
+    """
+    return os.path.join(cache_dir, f"{latitude:.4f}_{longitude:.4f}.parquet")
+
+
+def get_location_lock(cache_path: str) -> threading.Lock:
+    """
+    Get the lock of a location.
+
+    Args:
+        cache_path (str): The path of the cache file of the location.
+
+    Returns:
+        threading.Lock: The lock of the location.
+    """
+    with _locks_lock:
+        return _location_locks.setdefault(cache_path, threading.Lock())
+
+
+def load_location_cache(cache_path: str) -> pd.DataFrame:
+    """
+    Load the cached hours of a location, from memory or from its cache file.
+
+    Args:
+        cache_path (str): The path of the cache file.
+
+    Returns:
+        pd.DataFrame: The cached hours indexed by 'time'.
+    """
+    if cache_path not in _memory_cache:
+        if os.path.exists(cache_path):
+            _memory_cache[cache_path] = pd.read_parquet(cache_path)
+        else:
+            empty_hours = pd.DatetimeIndex([], name='time')
+            location_cache = pd.DataFrame({column: pd.Series(index=empty_hours, dtype='float64') for column in weather_value_columns})
+            location_cache[returned_column] = pd.Series(index=empty_hours, dtype='bool')
+            location_cache[fetched_at_column] = pd.Series(index=empty_hours, dtype='datetime64[ns]')
+            _memory_cache[cache_path] = location_cache
+
+    return _memory_cache[cache_path]
+
+
+def save_location_cache(location_cache: pd.DataFrame, cache_path: str) -> None:
+    """
+    Save the cached hours of a location. The file is replaced at once, so a crash never leaves a broken cache.
+
+    Args:
+        location_cache (pd.DataFrame): The cached hours indexed by 'time'.
+        cache_path (str): The path of the cache file.
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+    temporary_path = f"{cache_path}.{threading.get_ident()}.part"
+    location_cache.to_parquet(temporary_path)
+    os.replace(temporary_path, cache_path)
+
+    _memory_cache[cache_path] = location_cache
+
+
+def get_valid_hours(location_cache: pd.DataFrame, now: datetime) -> pd.DatetimeIndex:
+    """
+    Get the cached hours that do not need to be fetched again.
+
+    Args:
+        location_cache (pd.DataFrame): The cached hours indexed by 'time'.
+        now (datetime): The current naive UTC time.
+
+    Returns:
+        pd.DatetimeIndex: The valid hours.
+    """
+    fetched_at = location_cache[fetched_at_column]
+    is_final = fetched_at - location_cache.index >= historical_delay
+    is_fresh = now - fetched_at < forecast_ttl
+
+    return location_cache.index[(is_final | is_fresh).to_numpy()]
+
+
+def get_missing_ranges(missing_hours: pd.DatetimeIndex) -> list:
+    """
+    Group the missing hours into contiguous ranges, so each range is fetched with one request.
+
+    Args:
+        missing_hours (pd.DatetimeIndex): The sorted missing hours.
+
+    Returns:
+        list: The (first hour, last hour) of every range.
+    """
+    if len(missing_hours) == 0:
+        return []
+
+    range_ids = (missing_hours.to_series().diff() != pd.Timedelta(hours=1)).cumsum()
+
+    return [(hours.iloc[0], hours.iloc[-1]) for _, hours in missing_hours.to_series().groupby(range_ids)]
+
+
+def fetch_hourly_range(latitude: float, longitude: float, first_hour: pd.Timestamp, last_hour: pd.Timestamp, now: datetime) -> pd.DataFrame:
+    """
+    Fetch a range of hours from Meteostat. Every hour of the range gets a row, also the ones Meteostat does not return.
+
+    Args:
+        latitude (float): The latitude of the location.
+        longitude (float): The longitude of the location.
+        first_hour (pd.Timestamp): The first hour in naive UTC.
+        last_hour (pd.Timestamp): The last hour in naive UTC.
+        now (datetime): The current naive UTC time.
+
+    Returns:
+        pd.DataFrame: The hours indexed by 'time'.
+    """
+    print(f"Fetching weather data for ({latitude:.4f}, {longitude:.4f}) from {first_hour} to {last_hour} from Meteostat...")
+
+    data = Hourly(Point(lat=latitude, lon=longitude), first_hour.to_pydatetime(), last_hour.to_pydatetime()).fetch()
+    data = data.reindex(columns=weather_value_columns)
+
+    hours = pd.date_range(first_hour, last_hour, freq='h', name='time')
+    data[returned_column] = True
+    data = data.reindex(hours)
+    data[returned_column] = data[returned_column].fillna(False).astype(bool)
+    data[fetched_at_column] = now
+
+    return data
+
+
+def get_cached_hourly_data(latitude: float, longitude: float, start_time, end_time, cache_dir: str = weather_cache_dir) -> pd.DataFrame:
+    """
+    Get the hourly weather data of a location from the cache, and fetch only the hours that are missing or expired.
+
+    Final historical hours are kept forever, forecast and recent hours are fetched again after `forecast_ttl`.
+    Overlapping windows (training, inference and the weather forecast) therefore share the same downloads.
+
+    Args:
+        latitude (float): The latitude of the location.
+        longitude (float): The longitude of the location.
+        start_time (datetime): The start of the data, taken as UTC if naive.
+        end_time (datetime): The end of the data (included), taken as UTC if naive.
+        cache_dir (str): The folder of the weather cache.
+
+    Returns:
+        pandas.DataFrame: The hourly weather data with a 'time' column and the Meteostat columns, like `Hourly.fetch`.
+    """
+    start_hour = to_utc_hour(start_time).ceil('h')
+    end_hour = to_utc_hour(end_time).floor('h')
+    requested_hours = pd.date_range(start_hour, end_hour, freq='h', name='time')
+
+    cache_path = get_cache_path(latitude, longitude, cache_dir)
+    now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+
+    with get_location_lock(cache_path):
+        location_cache = load_location_cache(cache_path)
+
+        missing_hours = requested_hours.difference(get_valid_hours(location_cache, now))
+        missing_ranges = get_missing_ranges(missing_hours)
+
+        if missing_ranges:
+            fetched_data = [fetch_hourly_range(latitude, longitude, first_hour, last_hour, now) for first_hour, last_hour in missing_ranges]
+
+            # The fetched hours replace the expired ones
+            location_cache = pd.concat([location_cache.drop(index=missing_hours, errors='ignore')] + fetched_data).sort_index()
+            save_location_cache(location_cache, cache_path)
+        else:
+            print(f"Weather data for ({latitude:.4f}, {longitude:.4f}) from {start_hour} to {end_hour} served from the cache")
+
+        data = location_cache.loc[start_hour:end_hour]
+
+    data = data[data[returned_column].astype(bool)][weather_value_columns]
+
+    return data.astype('float64').reset_index()
@@ -0,0 +1,146 @@
+import threading
+from datetime import timedelta
+
+import pandas as pd
+from src.prediction_pipeline.sourcing_data.source_weather import process_hourly_data, LATITUDE, LONGITUDE
+from src.prediction_pipeline.sourcing_data.weather_cache import get_cached_hourly_data, to_utc_hour
+from src.prediction_pipeline.modeling.pipeline_profiler import profile_stage
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# The shared window covers the weather history used by the z-scores of the inference and the forecast of the next days
+window_history_days = 11
+window_forecast_days = 8
+
+# How long the shared window is used before it is fetched again (the forecast hours of the weather cache expire after 3 hours)
+window_refresh_interval = timedelta(hours=1)
+
+# Raw Meteostat columns shown in the weather forecast of the dashboard
+display_columns = ['time', 'temp', 'rhum', 'wspd']
+
+_service_lock = threading.Lock()
+_service = None
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+class WeatherService:
+    """
+    Fetches the weather of one location once for a window that covers all consumers and gives each consumer its projection.
+
+    The inference gets the processed model features and the dashboard gets the raw display columns of the same
+    fetch, so one dashboard refresh requests and processes the weather only once. Both projections are computed
+    once per window and only sliced by time afterwards; callers must not modify them.
+    """
+
+    def __init__(self, latitude: float = LATITUDE, longitude: float = LONGITUDE, refresh_interval: timedelta = window_refresh_interval):
+        """
+        Args:
+            latitude (float): The latitude of the location.
+            longitude (float): The longitude of the location.
+            refresh_interval (timedelta): How long a window is used before it is fetched again.
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self._refresh_interval = refresh_interval
+        self._window_lock = threading.Lock()
+        self._window = None
+
+    def _get_window(self, start_hour: pd.Timestamp, end_hour: pd.Timestamp) -> dict:
+        """
+        Get the shared window and fetch it again if it is too old or does not cover the requested hours.
+
+        Args:
+            start_hour (pd.Timestamp): The first requested hour in naive UTC.
+            end_hour (pd.Timestamp): The last requested hour in naive UTC.
+
+        Returns:
+            dict: The window with the keys 'start', 'end', 'fetched_at', 'raw' and 'model_features'.
+        """
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+
+        with self._window_lock:
+            window = self._window
+            is_valid = (
+                window is not None
+                and now - window['fetched_at'] < self._refresh_interval
+                and window['start'] <= start_hour
+                and end_hour <= window['end']
+            )
+
+            if not is_valid:
+                window_start = min(now.floor('D') - timedelta(days=window_history_days), start_hour)
+                window_end = max(now.ceil('h') + timedelta(days=window_forecast_days), end_hour)
+
+                raw_data = get_cached_hourly_data(self.latitude, self.longitude, window_start, window_end)
+
+                # Both projections are indexed by time, so a consumer gets its hours with a slice
+                window = {
+                    'start': window_start,
+                    'end': window_end,
+                    'fetched_at': now,
+                    'raw': raw_data[display_columns].set_index('time', drop=False),
+                    'model_features': process_hourly_data(raw_data).set_index('Time', drop=False)
+                }
+                self._window = window
+
+        return window
+
+    @profile_stage('source_weather_data')
+    def get_model_features(self, start_time, end_time) -> pd.DataFrame:
+        """
+        Get the processed weather features of the models, like `source_weather.source_weather_data`.
+
+        Args:
+            start_time (datetime): The start of the data, taken as UTC if naive.
+            end_time (datetime): The end of the data (included), taken as UTC if naive.
+
+        Returns:
+            pd.DataFrame: The columns 'Time', 'Temperature (°C)', 'Wind Speed (km/h)', 'Relative Humidity (%)' and 'coco_2'.
+        """
+        start_hour = to_utc_hour(start_time).ceil('h')
+        end_hour = to_utc_hour(end_time).floor('h')
+
+        model_features = self._get_window(start_hour, end_hour)['model_features']
+
+        return model_features.loc[start_hour:end_hour].reset_index(drop=True)
+
+    def get_display_data(self, start_time, days: int = 7) -> pd.DataFrame:
+        """
+        Get the raw weather forecast shown in the dashboard, with the time in Europe/Berlin time.
+
+        Args:
+            start_time (datetime): The start of the forecast, taken as UTC if naive.
+            days (int): The number of forecast days.
+
+        Returns:
+            pd.DataFrame: The columns 'time', 'temp', 'rhum' and 'wspd'.
+        """
+        start_hour = to_utc_hour(start_time).ceil('h')
+        end_hour = (to_utc_hour(start_time) + timedelta(days=days)).floor('h')
+
+        display_data = self._get_window(start_hour, end_hour)['raw'].loc[start_hour:end_hour].reset_index(drop=True)
+        display_data['time'] = display_data['time'].dt.tz_localize('UTC').dt.tz_convert('Europe/Berlin')
+
+        return display_data
+
+
+def get_weather_service() -> WeatherService:
+    """
+    Get the weather service shared by the whole process.
+
+    Returns:
+        WeatherService: The weather service of the Bavarian Forest National Park.
+    """
+    global _service
+
+    with _service_lock:
+        if _service is None:
+            _service = WeatherService()
+
+    return _service
@@ -2,7 +2,9 @@
 import streamlit as st
 import pydeck as pdk
 import pandas as pd
+import plotly.express as px
 from src.streamlit_app.pages_in_dashboard.visitors.language_selection_menu import TRANSLATIONS
+from src.streamlit_app.parking_snapshot_log import get_parking_snapshot_log
 
 # TODO: Normalize the numbers to get different sized markers according to the occupancy rate of the parking sections
 def get_fixed_size():
@@ -48,6 +50,11 @@ def get_parking_section(
     """
     st.markdown(f"### {TRANSLATIONS[st.session_state.selected_language]['real_time_parking_occupancy']}")
 
+    # No sensor has a reading yet, e.g. all sensors failed since the start of the dashboard
+    if processed_parking_data.empty:
+        st.info(TRANSLATIONS[st.session_state.selected_language]['parking_no_data'])
+        return
+
     # Set a fixed size for all markers
     processed_parking_data['size'] = get_fixed_size()
     processed_parking_data['color'] = processed_parking_data['current_occupancy_rate'].apply(calculate_color)
@@ -103,3 +110,38 @@ def get_parking_section(
         col2.metric(label=TRANSLATIONS[st.session_state.selected_language]['capacity'], value=f"{selected_data['current_capacity']} 🚗")
         col3.metric(label=TRANSLATIONS[st.session_state.selected_language]['occupancy_rate'], value=f"{selected_data['current_occupancy_rate']}%")
 
+
+def get_parking_trend_section(days=7):
+    """
+    Display the occupancy rate of every parking section over the last days, read from the stored real-time readings.
+
+    Args:
+        days (int): The number of days to display.
+
+    Returns:
+        None
+    """
+    st.markdown(f"### {TRANSLATIONS[st.session_state.selected_language]['parking_occupancy_trend']}")
+
+    try:
+        parking_history = get_parking_snapshot_log().read_recent(days)
+    except Exception as e:
+        print(f"Error while reading the stored parking readings: {e}")
+        parking_history = pd.DataFrame()
+
+    if parking_history.empty:
+        st.info(TRANSLATIONS[st.session_state.selected_language]['parking_occupancy_trend_no_data'])
+        return
+
+    fig = px.line(
+        parking_history,
+        x='timestamp',
+        y='current_occupancy_rate',
+        color='location',
+        labels={
+            'timestamp': '',
+            'current_occupancy_rate': TRANSLATIONS[st.session_state.selected_language]['occupancy_rate'],
+            'location': ''
+        }
+    )
+    st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,72 @@
+import json
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from src.streamlit_app.pages_in_dashboard.visitors.language_selection_menu import TRANSLATIONS
+from src.prediction_pipeline.modeling.forecast_artifact import load_latest_forecast_profile
+from src.prediction_pipeline.modeling.pipeline_profiler import get_stage_records, to_chrome_trace
+
+# Columns of the stage records shown in the table
+profile_columns = ['stage', 'parent', 'started_at', 'wall_time_ms', 'rss_delta_mb', 'process_peak_rss_mb', 'rows', 'cache']
+
+
+def show_stage_records(records, key):
+    """
+    Show the stage records as a table and a bar chart of the wall time, with a button to download them as a Chrome trace.
+
+    Args:
+        records (list): The pipeline stage records.
+        key (str): The key of the download button.
+
+    Returns:
+        None
+    """
+    # Profiles published before a column was added show it as empty
+    profile_df = pd.DataFrame(records).reindex(columns=profile_columns)
+
+    st.dataframe(profile_df.round(1), hide_index=True, use_container_width=True)
+
+    fig = px.bar(
+        profile_df,
+        x='wall_time_ms',
+        y='stage',
+        orientation='h',
+        color='cache',
+        labels={'wall_time_ms': 'Wall time (ms)', 'stage': ''}
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.download_button(
+        label=TRANSLATIONS[st.session_state.selected_language]['download_chrome_trace'],
+        data=json.dumps(to_chrome_trace(records)),
+        file_name='inference_pipeline_trace.json',
+        mime='application/json',
+        key=key
+    )
+
+
+def get_pipeline_profile_section():
+    """
+    Display the wall time, memory, rows processed and cache hits of the stages of the latest forecast run.
+
+    Returns:
+        None
+    """
+    st.markdown(f"### {TRANSLATIONS[st.session_state.selected_language]['pipeline_profile']}")
+
+    try:
+        records = load_latest_forecast_profile()
+    except Exception as e:
+        print(f"Error while loading the profile of the latest forecast: {e}")
+        records = []
+
+    if records:
+        show_stage_records(records, key='download_forecast_trace')
+    else:
+        st.info(TRANSLATIONS[st.session_state.selected_language]['pipeline_profile_no_data'])
+
+    # Stages that ran in the dashboard process itself, e.g. when the inference runs locally
+    local_records = get_stage_records()
+    if local_records:
+        with st.expander(TRANSLATIONS[st.session_state.selected_language]['pipeline_profile_local']):
+            show_stage_records(local_records, key='download_local_trace')
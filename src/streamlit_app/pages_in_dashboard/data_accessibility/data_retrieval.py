@@ -5,6 +5,7 @@ import pandas as pd
 import awswrangler as wr
 import re
 from src.config import aws_s3_bucket
+from src.streamlit_app.parking_snapshot_log import get_parking_snapshot_log
 
 # Types of queries that the functions will use to know what data to retrieve
 
@@ -431,58 +432,49 @@ def get_parking_data_for_selected_sensor(selected_sensor):
     path = f"s3://{aws_s3_bucket}/preprocessed_data/preprocessed_parking_data/merged_parking_data/{selected_sensor}.csv"
     df = wr.s3.read_csv(path)
     df.set_index("time", inplace=True)
+
+    # Add the stored real-time readings that are newer than the historic data
+    df.index = pd.to_datetime(df.index)
+    recent_df = get_recent_parking_readings(selected_sensor, df.index.max())
+    if not recent_df.empty:
+        # The real-time readings are in German local time
+        if df.index.tz is not None:
+            recent_df.index = recent_df.index.tz_localize('Europe/Berlin', ambiguous='NaT', nonexistent='NaT').tz_convert(df.index.tz)
+        df = pd.concat([df, recent_df])
+
     return df
 
+def get_recent_parking_readings(selected_sensor, after_time):
 
-def parse_german_dates_regex(
-    df: pd.DataFrame,
-    date_column_name: str
-) -> pd.DataFrame:
-    """
-    Parses German dates in the specified date column of the DataFrame using regex,
-    including hours and minutes if available.
+    """Fetches the stored real-time readings of a parking sensor after a given time.
 
     Args:
-        df (pd.DataFrame): The DataFrame containing the date column.
-        date_column_name (str): The name of the date column.
+        selected_sensor (str): The name of the parking sensor.
+        after_time (pd.Timestamp): Only readings after this time are returned.
 
     Returns:
-        pd.DataFrame: The DataFrame with parsed German dates.
+        pandas.DataFrame: The readings indexed by 'time' with the columns
+        'occupancy', 'capacity' and 'occupancy_rate'.
     """
-    
-    # Define a mapping of German month names to their numeric values
-    month_map = {
-        "Jan.": "01",
-        "Feb.": "02",
-        "März": "03",
-        "Apr.": "04",
-        "Mai": "05",
-        "Juni": "06",
-        "Juli": "07",
-        "Aug.": "08",
-        "Sep.": "09",
-        "Okt.": "10",
-        "Nov.": "11",
-        "Dez.": "12"
-    }
-
-    # Create a regex pattern for replacing months and capturing time
-    pattern = re.compile(r'(\d{1,2})\.\s*(' + '|'.join(month_map.keys()) + r')\s*(\d{4})\s*(\d{2}):(\d{2})')
-
-    # Function to replace the month in the matched string and keep the time part
-    def replace_month(match):
-        day = match.group(1)
-        month = month_map[match.group(2)]
-        year = match.group(3)
-        hour = match.group(4)
-        minute = match.group(5)
-        return f"{year}-{month}-{day} {hour}:{minute}:00"
-
-    # Apply regex replacement and convert to datetime
-    df[date_column_name] = df[date_column_name].apply(lambda x: replace_month(pattern.search(x)) if pattern.search(x) else x)
-    df[date_column_name] = pd.to_datetime(df[date_column_name], errors='coerce')
+    if after_time.tzinfo is not None:
+        after_time = after_time.tz_convert('Europe/Berlin').tz_localize(None)
+
+    try:
+        readings_df = get_parking_snapshot_log().read(after_time.strftime('%Y-%m-%d'), pd.Timestamp.now().strftime('%Y-%m-%d'))
+    except Exception as e:
+        print(f"Error while reading the stored parking readings: {e}")
+        return pd.DataFrame()
+
+    readings_df = readings_df[(readings_df['location'] == selected_sensor) & (readings_df['timestamp'] > after_time)]
+    readings_df = readings_df.rename(columns={
+        'timestamp': 'time',
+        'current_occupancy': 'occupancy',
+        'current_capacity': 'capacity',
+        'current_occupancy_rate': 'occupancy_rate'
+    })
+
+    return readings_df.set_index('time')[['occupancy', 'capacity', 'occupancy_rate']]
 
-    return df
 
 @st.cache_data(max_entries=1)
 def get_data_from_query(selected_category,selected_query,selected_query_type, start_date, end_date, selected_sensors):
@@ -76,6 +76,13 @@ TRANSLATIONS = {
         'entrances_description': '🚪 Explore the two most popular entrances to the park.',
         'getting_there_description': '🚌 Learn about the best ways to reach the Bavarian Forest.',
         'admin_page_title': 'Bavarian Forest - Admin - Visitor Monitoring',
+        'pipeline_profile': 'Forecast Pipeline Profile',
+        'pipeline_profile_no_data': 'No profile is available for the latest forecast yet.',
+        'pipeline_profile_local': 'Stages run in this dashboard process',
+        'download_chrome_trace': 'Download as Chrome trace',
+        'parking_occupancy_trend': 'Parking Occupancy Rate of the Last 7 Days',
+        'parking_occupancy_trend_no_data': 'No parking readings have been stored yet.',
+        'parking_no_data': 'No parking data is available at the moment.',
     },
     "German": {
         'title': 'Planen Sie Ihren Besuch im Nationalpark Bayerischer Wald 🌲',
@@ -145,6 +152,13 @@ TRANSLATIONS = {
         'entrances_description': '🚪 Erkunde die beiden beliebtesten Eingänge zum Park.',
         'getting_there_description': '🚌 Erfahre mehr über die besten Möglichkeiten, den Bayerischen Wald zu erreichen.',
         'admin_page_title': 'Bayerischer Wald - Admin - Besucher Monitoring',
+        'pipeline_profile': 'Profil der Prognose-Pipeline',
+        'pipeline_profile_no_data': 'Für die letzte Prognose ist noch kein Profil verfügbar.',
+        'pipeline_profile_local': 'Schritte in diesem Dashboard-Prozess',
+        'download_chrome_trace': 'Als Chrome-Trace herunterladen',
+        'parking_occupancy_trend': 'Belegungsrate der Parkplätze der letzten 7 Tage',
+        'parking_occupancy_trend_no_data': 'Es wurden noch keine Parkdaten gespeichert.',
+        'parking_no_data': 'Derzeit sind keine Parkdaten verfügbar.',
     }
 }
 
@@ -2,10 +2,8 @@
 import streamlit as st
 import pydeck as pdk
 import pandas as pd
-import pytz
 from src.streamlit_app.source_data import source_and_preprocess_realtime_parking_data
 from src.streamlit_app.pages_in_dashboard.visitors.language_selection_menu import TRANSLATIONS
-from datetime import datetime
 
 def get_fixed_size():
     """
@@ -95,30 +93,15 @@ def get_parking_section():
 
     print("Rendering parking section for the visitor dashboard...")
 
-    def get_current_15min_interval():
-        """
-        Get the current 15-minute interval in the format "HH:MM:00".
-
-        Returns:
-            str: The current 15-minute interval in the format "HH:MM:00".
-        """
-        current_time = datetime.now(pytz.timezone('Europe/Berlin'))
-        minutes = (current_time.minute // 15) * 15
-  
-        # Replace the minute value with the truncated value and set seconds and microseconds to 0
-        timestamp_latest_parking_data_fetch = current_time.replace(minute=minutes, second=0, microsecond=0)
-
-        # If you want to format it as a string in the "%Y-%m-%d %H:%M:%S" format
-        timestamp_latest_parking_data_fetch_str = timestamp_latest_parking_data_fetch.strftime("%Y-%m-%d %H:%M:%S")
-
-        return timestamp_latest_parking_data_fetch_str
-    
-    timestamp_latest_parking_data_fetch = get_current_15min_interval()
-
-    # Source and preprocess the parking data
-    processed_parking_data = source_and_preprocess_realtime_parking_data(timestamp_latest_parking_data_fetch)
+    # Read the latest parking data published by the shared parking poller
+    processed_parking_data = source_and_preprocess_realtime_parking_data()
 
     st.markdown(f"### {TRANSLATIONS[st.session_state.selected_language]['real_time_parking_occupancy']}")
+
+    # No sensor has a reading yet, e.g. all sensors failed since the start of the dashboard
+    if processed_parking_data.empty:
+        st.info(TRANSLATIONS[st.session_state.selected_language]['parking_no_data'])
+        return
     
     # Set a fixed size for all markers
     processed_parking_data['size'] = get_fixed_size()
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pytz
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# How often the parking occupancy is fetched from the Bayern Cloud, independent of the number of sessions
+parking_poll_interval_seconds = 15 * 60
+
+# A published parking occupancy: when it was fetched (Europe/Berlin time) and the preprocessed data
+ParkingSnapshot = namedtuple('ParkingSnapshot', ['fetched_at', 'data'])
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+class ParkingOccupancyPoller:
+    """
+    Fetches the real-time parking occupancy in one background thread of the process and publishes it as a snapshot.
+
+    Every session reads the same snapshot, so the number of Bayern Cloud requests does not grow with the
+    number of visitors. A snapshot is never changed after it is published: readers that modify the data
+    must work on a copy. If a fetch fails, the previous snapshot keeps being served.
+    """
+
+    def __init__(self, fetch_parking_data, poll_interval_seconds: float = parking_poll_interval_seconds):
+        """
+        Args:
+            fetch_parking_data (callable): Returns the preprocessed real-time parking data as a DataFrame.
+            poll_interval_seconds (float): How often the parking occupancy is fetched.
+        """
+        self._fetch_parking_data = fetch_parking_data
+        self._poll_interval_seconds = poll_interval_seconds
+        self._refresh_lock = threading.Lock()
+        self._snapshot = None
+        self._thread = threading.Thread(target=self._poll_parking_data, name='parking-occupancy-poller', daemon=True)
+        self._thread.start()
+
+    def get_snapshot(self) -> ParkingSnapshot:
+        """
+        Get the latest parking occupancy. The first call waits for the first fetch.
+
+        Returns:
+            ParkingSnapshot: The time of the fetch and the preprocessed parking data.
+        """
+        if self._snapshot is None:
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self._refresh()
+
+        return self._snapshot
+
+    def refresh(self) -> None:
+        """
+        Fetch the parking occupancy and publish it as the new snapshot.
+        """
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        fetched_at = datetime.now(pytz.timezone('Europe/Berlin')).strftime("%Y-%m-%d %H:%M:%S")
+        parking_data = self._fetch_parking_data()
+
+        # Replace the whole snapshot at once, so readers get either the old or the new data
+        self._snapshot = ParkingSnapshot(fetched_at, parking_data)
+        print(f"Parking occupancy snapshot published at {fetched_at}, Europe/Berlin time.")
+
+    def _poll_parking_data(self) -> None:
+        while True:
+            time.sleep(self._poll_interval_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error while fetching the parking occupancy, keeping the previous snapshot: {e}")
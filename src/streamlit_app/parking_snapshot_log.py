@@ -0,0 +1,200 @@
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+
+import awswrangler as wr
+import pandas as pd
+from src.config import aws_s3_bucket
+
+
+############################################################################################################
+# Global variables
+############################################################################################################
+
+# Parquet dataset with the real-time parking readings, partitioned by date. A local folder can be used instead of S3.
+parking_snapshot_log_path = os.getenv(
+    'PARKING_SNAPSHOT_LOG_PATH',
+    f"s3://{aws_s3_bucket}/preprocessed_data/preprocessed_parking_data/real_time_snapshots/"
+)
+partition_columns = ['date']
+
+snapshot_log_columns = ['timestamp', 'location', 'current_occupancy', 'current_capacity', 'current_occupancy_rate']
+
+# Number of snapshots kept in memory before they are written as one batch (8 snapshots of 15 minutes = 2 hours)
+snapshot_flush_size = 8
+
+_log_lock = threading.Lock()
+_log = None
+
+
+############################################################################################################
+# Functions
+############################################################################################################
+
+def write_snapshot_batch(snapshots_df: pd.DataFrame, path: str) -> None:
+    """
+    Append a batch of parking readings to the Parquet dataset, on S3 or in a local folder.
+
+    Args:
+        snapshots_df (pd.DataFrame): The readings with the columns of `snapshot_log_columns`.
+        path (str): The folder of the dataset.
+    """
+    snapshots_df = snapshots_df.assign(date=snapshots_df['timestamp'].dt.strftime('%Y-%m-%d'))
+
+    if path.startswith('s3://'):
+        wr.s3.to_parquet(snapshots_df, path=path, dataset=True, mode='append', partition_cols=partition_columns)
+    else:
+        # Every call adds new files to the partitions, the existing files are kept
+        snapshots_df.to_parquet(path, partition_cols=partition_columns, index=False)
+
+
+def read_snapshot_batches(path: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """
+    Read the parking readings of a date range from the Parquet dataset. Only the partitions of the range are read.
+
+    Args:
+        path (str): The folder of the dataset.
+        start_date (str): The first date in the format 'YYYY-MM-DD'.
+        end_date (str): The last date in the format 'YYYY-MM-DD'.
+
+    Returns:
+        pd.DataFrame: The readings with the columns of `snapshot_log_columns`.
+    """
+    if path.startswith('s3://'):
+        try:
+            snapshots_df = wr.s3.read_parquet(
+                path,
+                dataset=True,
+                partition_filter=lambda partition: start_date <= partition['date'] <= end_date
+            )
+        except wr.exceptions.NoFilesFound:
+            return pd.DataFrame(columns=snapshot_log_columns)
+    else:
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=snapshot_log_columns)
+        snapshots_df = pd.read_parquet(path, filters=[('date', '>=', start_date), ('date', '<=', end_date)])
+
+    return snapshots_df[snapshot_log_columns]
+
+
+class ParkingSnapshotLog:
+    """
+    Keeps the real-time parking readings as a history in a columnar Parquet dataset.
+
+    The readings of `flush_size` snapshots are buffered in memory and written as one batch, so the dataset
+    grows by a few files per day instead of one file per sensor and reading. The buffered readings are
+    included when the log is read, and they are written when the process exits.
+
+    Only one process appends to the log: the forecast service (see `publish_forecast`). The dashboard
+    replicas only read it, so a reading is not stored once per replica.
+    """
+
+    def __init__(self, path: str = parking_snapshot_log_path, flush_size: int = snapshot_flush_size):
+        self.path = path
+        self._flush_size = flush_size
+        self._buffer_lock = threading.Lock()
+        self._buffer = []
+        self._last_timestamps = {}
+        atexit.register(self.flush)
+
+    def append(self, parking_data: pd.DataFrame) -> None:
+        """
+        Add the readings of one snapshot. Readings that are marked as stale, or whose timestamp did not change
+        since the last appended reading of their location, repeat an older reading and are skipped.
+
+        Args:
+            parking_data (pd.DataFrame): The preprocessed real-time parking data.
+        """
+        if 'stale' in parking_data.columns:
+            parking_data = parking_data[~parking_data['stale'].astype(bool)]
+
+        with self._buffer_lock:
+            last_timestamps = pd.to_datetime(parking_data['location'].map(self._last_timestamps))
+            parking_data = parking_data[last_timestamps.isna() | (parking_data['timestamp'] > last_timestamps)]
+
+            if parking_data.empty:
+                return
+
+            self._last_timestamps.update(parking_data.groupby('location')['timestamp'].max().to_dict())
+            self._buffer.append(parking_data[snapshot_log_columns].copy())
+            is_full = len(self._buffer) >= self._flush_size
+
+        if is_full:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered readings as one batch. If the write fails, the readings stay in the buffer.
+        """
+        with self._buffer_lock:
+            if not self._buffer:
+                return
+            pending = self._buffer
+            self._buffer = []
+
+        snapshots_df = pd.concat(pending, ignore_index=True)
+        try:
+            write_snapshot_batch(snapshots_df, self.path)
+            print(f"{len(snapshots_df)} parking readings stored successfully under {self.path}")
+        except Exception as e:
+            print(f"Error while storing the parking readings, keeping them for the next batch: {e}")
+            with self._buffer_lock:
+                self._buffer = pending + self._buffer
+
+    def read(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Read the stored and buffered parking readings of a date range.
+
+        Args:
+            start_date (str): The first date in the format 'YYYY-MM-DD'.
+            end_date (str): The last date in the format 'YYYY-MM-DD'.
+
+        Returns:
+            pd.DataFrame: The readings sorted by timestamp, with one reading per location and timestamp.
+        """
+        stored_df = read_snapshot_batches(self.path, start_date, end_date)
+
+        with self._buffer_lock:
+            buffered = list(self._buffer)
+
+        snapshots_df = pd.concat([stored_df] + buffered, ignore_index=True)
+        snapshots_df['timestamp'] = pd.to_datetime(snapshots_df['timestamp'])
+
+        in_range = snapshots_df['timestamp'].dt.strftime('%Y-%m-%d').between(start_date, end_date)
+
+        # A batch can be stored twice (e.g. a write that failed after some files were written), keep one copy
+        snapshots_df = snapshots_df[in_range].drop_duplicates(['location', 'timestamp'], keep='last')
+
+        return snapshots_df.sort_values('timestamp', ignore_index=True)
+
+    def read_recent(self, days: int = 7) -> pd.DataFrame:
+        """
+        Read the parking readings of the last days.
+
+        Args:
+            days (int): The number of days, including today.
+
+        Returns:
+            pd.DataFrame: The readings sorted by timestamp.
+        """
+        today = datetime.now()
+        start_date = (today - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+
+        return self.read(start_date, today.strftime('%Y-%m-%d'))
+
+
+def get_parking_snapshot_log() -> ParkingSnapshotLog:
+    """
+    Get the parking snapshot log shared by the whole process.
+
+    Returns:
+        ParkingSnapshotLog: The parking snapshot log.
+    """
+    global _log
+
+    with _log_lock:
+        if _log is None:
+            _log = ParkingSnapshotLog()
+
+    return _log
@@ -1,11 +1,11 @@
 import pandas as pd
 from src.streamlit_app.pre_processing.gen_config_for_visitor_sensors_and_centers import visitor_centers, visitor_sensors
 import numpy as np
-import re
 import awswrangler as wr
 import streamlit as st
 import os
 from src.config import aws_s3_bucket
+from src.prediction_pipeline.pre_processing.german_dates import parse_german_dates
 
 raw_folder = "raw-data/bf_raw_files"
 preprocessed_folder = "preprocessed_data/bf_preprocessed_files"
@@ -198,59 +198,6 @@ def convert_data_types(df, visitor_centers):
 
     return df
 
-def parse_german_dates(
-    df: pd.DataFrame,
-    date_column_name: str
-) -> pd.DataFrame:
-    """
-    Parses German dates in the specified date column of the DataFrame using regex,
-    including hours and minutes if available.
-
-    Args:
-        df (pd.DataFrame): The DataFrame containing the date column.
-        date_column_name (str): The name of the date column.
-
-    Returns:
-        pd.DataFrame: The DataFrame with parsed German dates.
-    """
-    
-    # Define a mapping of German month names to their numeric values
-    month_map = {
-        "Jan.": "01",
-        "Feb.": "02",
-        "März": "03",
-        "Apr.": "04",
-        "Mai": "05",
-        "Juni": "06",
-        "Juli": "07",
-        "Aug.": "08",
-        "Sep.": "09",
-        "Okt.": "10",
-        "Nov.": "11",
-        "Dez.": "12"
-    }
-
-    # Create a regex pattern for replacing months and capturing time
-    pattern = re.compile(r'(\d{1,2})\.\s*(' + '|'.join(month_map.keys()) + r')\s*(\d{4})\s*(\d{2}):(\d{2})')
-
-    # Function to replace the month in the matched string and keep the time part
-    def replace_month(match):
-        day = match.group(1)
-        month = month_map[match.group(2)]
-        year = match.group(3)
-        hour = match.group(4)
-        minute = match.group(5)
-        return f"{year}-{month}-{day} {hour}:{minute}:00"
-
-    # Apply regex replacement and convert to datetime
-        # Apply regex replacement and convert to datetime, only for string values
-    df[date_column_name] = df[date_column_name].apply(
-        lambda x: replace_month(pattern.search(str(x))) if isinstance(x, str) and pattern.search(str(x)) else x
-    )
-    df[date_column_name] = pd.to_datetime(df[date_column_name], errors='coerce')
-
-    return df
-
 def write_csv_file_to_aws_s3(df, path):
 
     save_path = f"s3://{aws_s3_bucket}/{path}"
@@ -2,15 +2,20 @@
 import pandas as pd
 import awswrangler as wr
 import requests
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime
 import os
-from meteostat import Hourly, Point
 import src.streamlit_app.pre_processing.process_real_time_parking_data as prtpd
 import src.streamlit_app.pre_processing.process_forecast_weather_data as prfwd
 import streamlit as st
 from src.streamlit_app.pages_in_dashboard.visitors.language_selection_menu import TRANSLATIONS
-from src.prediction_pipeline.sourcing_data.source_weather import get_hourly_data
-import pytz
+from src.streamlit_app.parking_occupancy_poller import ParkingOccupancyPoller
+from src.streamlit_app.parking_snapshot_log import get_parking_snapshot_log
+from src.prediction_pipeline.sourcing_data.weather_service import get_weather_service
+from src.config import parking_sensor_coordinates
 
 
 ########################################################################################
@@ -23,20 +28,38 @@ BAYERN_CLOUD_API_KEY = os.getenv('BAYERN_CLOUD_API_KEY')
 
 # We are not using 'parkplatz-fredenbruecke-1' and 'skiwanderzentrum-zwieslerwaldhaus-2' because of inconsistency in sending data to the cloud
 parking_sensors = {
-     "parkplatz-graupsaege-1":["e42069a6-702f-4ef4-b3b5-04e310d97ca0",(48.92414,13.44515)],
+     "parkplatz-graupsaege-1":["e42069a6-702f-4ef4-b3b5-04e310d97ca0", parking_sensor_coordinates["parkplatz-graupsaege-1"]],
      # "parkplatz-fredenbruecke-1":["fac08b6b-e9cb-40cd-a106-b9f2cbfc7447",()],
-     "p-r-spiegelau-1": ["ee0490b2-3cc5-4adb-a527-95267257598e",(48.9178,13.35544)],
+     "p-r-spiegelau-1": ["ee0490b2-3cc5-4adb-a527-95267257598e", parking_sensor_coordinates["p-r-spiegelau-1"]],
      # "skiwanderzentrum-zwieslerwaldhaus-2":[ "dd3734c2-c4fb-4e1d-a57c-9bbed8130d8f",()],
-     "parkplatz-zwieslerwaldhaus-1": [ "6c9b765e-1ff9-401d-98bc-b0302ee65c62",(49.08837,13.24707)],
+     "parkplatz-zwieslerwaldhaus-1": [ "6c9b765e-1ff9-401d-98bc-b0302ee65c62", parking_sensor_coordinates["parkplatz-zwieslerwaldhaus-1"]],
      # "parkplatz-zwieslerwaldhaus-nord-1": [ "4bbb3b5c-edc2-4b00-a923-91c1544aa29d",()],
-     "parkplatz-nationalparkzentrum-falkenstein-2" : [ "a93b64e9-35fb-4b3e-8348-81ba8f1c0d6f",(49.06042,13.23583)],
-     "scheidt-bachmann-parkplatz-1" : [ "144e1868-3051-4140-a83c-41d4b79a6d14",(48.9346,13.32418)],
-     "parkplatz-nationalparkzentrum-lusen-p2" : [ "454b0f50-130b-4c21-9db2-b163e158c847",(48.8907,13.48924)],
-     "parkplatz-waldhaeuser-kirche-1" : [ "454b0f50-130b-4c21-9db2-b163e158c847",(48.92842,13.4624,)],
-     "parkplatz-waldhaeuser-ausblick-1" : [ "a14d8ebd-9261-49f7-875b-6a924fe34990",(48.92796,13.47076)],
-     "parkplatz-skisportzentrum-finsterau-1": [ "ea474092-1064-4ae7-955e-8db099955c16",(48.94129,13.57491)],
+     "parkplatz-nationalparkzentrum-falkenstein-2" : [ "a93b64e9-35fb-4b3e-8348-81ba8f1c0d6f", parking_sensor_coordinates["parkplatz-nationalparkzentrum-falkenstein-2"]],
+     "scheidt-bachmann-parkplatz-1" : [ "144e1868-3051-4140-a83c-41d4b79a6d14", parking_sensor_coordinates["scheidt-bachmann-parkplatz-1"]],
+     "parkplatz-nationalparkzentrum-lusen-p2" : [ "454b0f50-130b-4c21-9db2-b163e158c847", parking_sensor_coordinates["parkplatz-nationalparkzentrum-lusen-p2"]],
+     "parkplatz-waldhaeuser-kirche-1" : [ "454b0f50-130b-4c21-9db2-b163e158c847", parking_sensor_coordinates["parkplatz-waldhaeuser-kirche-1"]],
+     "parkplatz-waldhaeuser-ausblick-1" : [ "a14d8ebd-9261-49f7-875b-6a924fe34990", parking_sensor_coordinates["parkplatz-waldhaeuser-ausblick-1"]],
+     "parkplatz-skisportzentrum-finsterau-1": [ "ea474092-1064-4ae7-955e-8db099955c16", parking_sensor_coordinates["parkplatz-skisportzentrum-finsterau-1"]],
 }
 
+# Timeouts (connect, read) in seconds of one request, retries with exponential backoff for failed requests
+# and the time after which the sensors that did not answer are shown with their last reading
+bayern_cloud_timeout_seconds = (3.05, 5)
+bayern_cloud_max_retries = 2
+bayern_cloud_backoff_factor = 0.5
+parking_fetch_deadline_seconds = 12
+
+# HTTP session shared by all parking requests of the process, with one pooled connection per sensor
+_bayern_cloud_session_lock = threading.Lock()
+_bayern_cloud_session = None
+
+# Columns of the occupancy data of the parking sensors, also when no sensor has a reading
+parking_data_columns = ['timestamp', 'location', 'current_occupancy', 'current_capacity', 'current_occupancy_rate', 'latitude', 'longitude', 'stale']
+
+# Last successful reading of every parking sensor, used when a sensor does not answer
+_last_parking_readings_lock = threading.Lock()
+_last_parking_readings = {}
+
 ########################################################################################
 # Weather Data Sourcing - METEOSTAT API
 ########################################################################################
@@ -56,15 +79,45 @@ LONGITUDE = 12.711573421032
 ########################################################################################
 
 
-def source_parking_data_from_cloud(location_slug: str) -> pd.DataFrame:
+def get_bayern_cloud_session() -> requests.Session:
+    """Get the HTTP session shared by all Bayern Cloud requests of the process.
+
+    The session keeps one pooled connection per parking sensor and retries failed requests
+    (connection errors, rate limits and server errors) with exponential backoff.
+
+    Returns:
+        requests.Session: The pooled session.
+    """
+    global _bayern_cloud_session
+
+    with _bayern_cloud_session_lock:
+        if _bayern_cloud_session is None:
+            retry = Retry(
+                total=bayern_cloud_max_retries,
+                backoff_factor=bayern_cloud_backoff_factor,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=['GET']
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=len(parking_sensors), max_retries=retry)
+
+            session = requests.Session()
+            session.mount('https://', adapter)
+            _bayern_cloud_session = session
+
+    return _bayern_cloud_session
+
+def source_parking_data_from_cloud(location_slug: str, session: requests.Session = None) -> pd.DataFrame:
     """Sources the current occupancy data from the Bayern Cloud API.
     
     Args:
         location_slug (str): The location slug of the parking sensor.
+        session (requests.Session): The HTTP session. Defaults to the shared Bayern Cloud session.
     
     Returns:
         parking_df_with_spatial_info (pd.DataFrame): A DataFrame containing the current occupancy data, occupancy rate, capacity and spatial coordinates.
     """
+    if session is None:
+        session = get_bayern_cloud_session()
     
     API_endpoint = f'https://data.bayerncloud.digital/api/v4/endpoints/list_occupancy/{location_slug}'
 
@@ -73,7 +126,8 @@ def source_parking_data_from_cloud(location_slug: str) -> pd.DataFrame:
     }
 
 
-    response = requests.get(API_endpoint, params=request_params)
+    response = session.get(API_endpoint, params=request_params, timeout=bayern_cloud_timeout_seconds)
+    response.raise_for_status()
     response_json = response.json()
 
     # Access the first item in the @graph list
@@ -119,44 +173,87 @@ def add_spatial_info_to_parking_sensors(parking_data_df):
 
             return parking_data_df
 
-            
-def merge_all_df_from_list(df_list):
+
+def source_all_parking_data_from_cloud() -> pd.DataFrame:
+    """Sources the current occupancy data of all parking sensors at the same time.
+
+    Every sensor is requested in its own thread over the shared session. A sensor that fails or does
+    not answer within `parking_fetch_deadline_seconds` does not block the others: its last successful
+    reading is used and marked as stale, or it is left out if there is no reading yet.
+
+    Returns:
+        pd.DataFrame: The occupancy data of all sensors with a 'stale' column, empty if no sensor has a reading.
+    """
+    session = get_bayern_cloud_session()
+
+    executor = ThreadPoolExecutor(max_workers=len(parking_sensors))
+    futures = {
+        location_slug: executor.submit(source_parking_data_from_cloud, location_slug, session)
+        for location_slug in parking_sensors.keys()
+    }
+    wait(futures.values(), timeout=parking_fetch_deadline_seconds)
+
+    # Do not wait for the sensors that are still running, their threads end with their request timeout
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    all_parking_dataframes = []
+    for location_slug, future in futures.items():
+        try:
+            if not future.done():
+                raise TimeoutError(f"no answer within {parking_fetch_deadline_seconds} seconds")
+
+            parking_df = future.result()
+            parking_df['stale'] = False
+
+            with _last_parking_readings_lock:
+                _last_parking_readings[location_slug] = parking_df
+
+        except Exception as e:
+            with _last_parking_readings_lock:
+                last_reading = _last_parking_readings.get(location_slug)
+
+            if last_reading is None:
+                print(f"Error while fetching the occupancy data for location '{location_slug}', no previous reading to show: {e}")
+                continue
+
+            print(f"Error while fetching the occupancy data for location '{location_slug}', showing the reading from {last_reading['timestamp'].iloc[0]}: {e}")
+            parking_df = last_reading.assign(stale=True)
+
+        all_parking_dataframes.append(parking_df.copy())
+
+    return merge_all_df_from_list(all_parking_dataframes, parking_data_columns)
+
+def merge_all_df_from_list(df_list, columns=None):
     """
     Merge all the dataframes in the list into a single dataframe.
 
     Args:
         df_list (list): A list of pandas DataFrames to merge.
+        columns (list): The columns of the merged DataFrame if the list is empty.
 
     Returns:
-        merged_dataframe (pd.DataFrame): The merged DataFrame.
+        merged_dataframe (pd.DataFrame): The merged DataFrame, empty with the given columns if the list is empty.
     """
+    # e.g. every parking sensor failed during a cold start
+    if not df_list:
+        return pd.DataFrame(columns=columns)
+
     # Merge all the dataframes in the list with the 'time' column as index
     merged_dataframe = pd.concat(df_list, axis=0, ignore_index=True)
     return merged_dataframe
 
 
-@st.cache_data(max_entries=1)
-def source_and_preprocess_realtime_parking_data(current_timestamp):
-
+def fetch_and_preprocess_realtime_parking_data() -> pd.DataFrame:
     """
-    Source and preprocess the real-time parking data. Returns the timestamp of when the function was run.
-
-    Args:
-        current_timestamp (datetime): The timestamp of when the function was run.
+    Source and preprocess the real-time parking data of all sensors. Runs in the background thread of the parking poller.
 
     Returns:
-        processed_parking_data (pd.DataFram): Preprocessed real-time parking data.
+        processed_parking_data (pd.DataFrame): Preprocessed real-time parking data.
     """
-    print(f"Fetching and saving real-time parking occupancy data at '{current_timestamp}'...")
-    
-    # Source the parking data from bayern cloud
-    all_parking_dataframes = []
-    for location_slug in parking_sensors.keys():
-        print(f"Fetching and saving real-time occupancy data for location '{location_slug}'...")
-        parking_df = source_parking_data_from_cloud(location_slug)
-        all_parking_dataframes.append(parking_df)
+    print("Fetching real-time parking occupancy data...")
 
-    all_parking_data = merge_all_df_from_list(all_parking_dataframes)
+    # Source the parking data of all sensors from bayern cloud at the same time
+    all_parking_data = source_all_parking_data_from_cloud()
 
     print("Parking data sourced successfully!")
 
@@ -165,14 +262,47 @@ def source_and_preprocess_realtime_parking_data(current_timestamp):
 
     print("Parking data processed and cleaned!")
 
-    # Return the timestamp in German time indicating the time zone Berlin
+    return processed_parking_data
 
-    print(f"Parking data processed and cleaned at {current_timestamp}, Europe/Berlin time.")
+def fetch_and_record_realtime_parking_data() -> pd.DataFrame:
+    """
+    Source and preprocess the real-time parking data of all sensors and add it to the parking snapshot log,
+    the history of the admin and data access pages. Runs in the forecast service, the only writer of the log.
 
-    st.write(f"{TRANSLATIONS[st.session_state.selected_language]['parking_data_last_updated']} {current_timestamp}")
+    Returns:
+        processed_parking_data (pd.DataFrame): Preprocessed real-time parking data.
+    """
+    processed_parking_data = fetch_and_preprocess_realtime_parking_data()
+
+    get_parking_snapshot_log().append(processed_parking_data)
 
     return processed_parking_data
 
+@st.cache_resource
+def get_parking_occupancy_poller() -> ParkingOccupancyPoller:
+    """
+    Get the parking poller shared by all sessions of the dashboard process.
+
+    Returns:
+        ParkingOccupancyPoller: The parking poller.
+    """
+    return ParkingOccupancyPoller(fetch_and_preprocess_realtime_parking_data)
+
+def source_and_preprocess_realtime_parking_data():
+
+    """
+    Get the latest real-time parking data published by the parking poller and show when it was fetched.
+
+    Returns:
+        processed_parking_data (pd.DataFrame): Preprocessed real-time parking data, a copy that the page can modify.
+    """
+    parking_snapshot = get_parking_occupancy_poller().get_snapshot()
+
+    st.write(f"{TRANSLATIONS[st.session_state.selected_language]['parking_data_last_updated']} {parking_snapshot.fetched_at}")
+
+    # The snapshot is shared by all sessions, so the pages work on their own copy
+    return parking_snapshot.data.copy()
+
 ########################################################################################
 # Weather functions
 ########################################################################################
@@ -189,23 +319,9 @@ def source_weather_data(start_time: datetime):
         weather_hourly (pd.DataFrame): Hourly weather data for the Bavarian Forest National Park for the next 7 days
     """
 
-    # Create a Point object for the Bavarian Forest National Park entry
-    bavarian_forest = Point(lat=LATITUDE, lon=LONGITUDE)
-
-    # Convert start_time to datetime format in utc
-    start_time = start_time.astimezone(pytz.UTC).replace(tzinfo=None)
-
-    # Add 7 days to start_time
-    end_time = start_time + timedelta(days=7)
-
-    # Fetch hourly data for the location
-    weather_hourly = get_hourly_data(bavarian_forest, start_time, end_time)
-
-    # Drop unnecessary columns
-    weather_hourly = weather_hourly.drop(columns=['dwpt', 'snow', 'wdir', 'wpgt', 'pres', 'coco','prcp', 'tsun'])
+    # Get the forecast from the weather service, which shares its fetch with the inference
+    weather_hourly = get_weather_service().get_display_data(start_time, days=7)
 
-    # Convert the 'Time' column to datetime format again in Europe/Berlin time
-    weather_hourly['time'] = pd.to_datetime(weather_hourly['time'], utc=True).dt.tz_convert('Europe/Berlin')
     return weather_hourly
 
 @st.cache_data(max_entries=1)